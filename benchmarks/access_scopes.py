@@ -0,0 +1,51 @@
+"""Cost of switching users on a project with access grants, one request per user
+
+Run with: python -m benchmarks.access_scopes
+"""
+from benchmarks.synthetic import CONNECTION_NAME, report, synthetic_models, synthetic_views, time_per_call
+from metrics_layer.core.model.project import Project
+
+DEPARTMENTS = ["sales", "finance", "marketing", "engineering", "executive"]
+
+
+def access_grant_project(n_views: int):
+    models = synthetic_models()
+    models[0]["access_grants"] = [
+        {"name": f"grant_{d}", "user_attribute": "department", "allowed_values": [d, "executive"]}
+        for d in DEPARTMENTS
+    ]
+    views = synthetic_views(n_views, n_fields=40, n_groups=max(n_views // 20, 1))
+    for i, view in enumerate(views):
+        view["required_access_grants"] = [f"grant_{DEPARTMENTS[i % len(DEPARTMENTS)]}"]
+    return Project(models=models, views=views, connection_lookup={CONNECTION_NAME: "SNOWFLAKE"})
+
+
+def main():
+    rows = []
+    for n_views in [20, 100, 400]:
+        project = access_grant_project(n_views)
+        field_name = "view_0.dimension_4"
+        # Every request comes from a different user, from one of a handful of departments
+        users = [
+            {"department": DEPARTMENTS[i % len(DEPARTMENTS)], "email": f"user_{i}@example.com"}
+            for i in range(500)
+        ]
+        calls = iter(users * 1000)
+
+        def request():
+            project.set_user(next(calls))
+            try:
+                project.get_field(field_name)
+            except Exception:
+                pass
+
+        first_pass = time_per_call(request, n_calls=len(users))
+        warm = time_per_call(request, n_calls=len(users))
+        rows.append((n_views, first_pass * 1e6, warm * 1e6))
+
+    columns = ["views", "first us", "warm us"]
+    report("set_user and get_field per request, 500 users in 5 departments", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Cost of finding the join graphs of every field, and the fields joinable to a field
+
+Run with: python -m benchmarks.field_join_graphs
+"""
+import time
+
+from benchmarks.synthetic import report, synthetic_project, time_per_call
+
+
+def main():
+    rows = []
+    for n_views in [20, 60, 120]:
+        project = synthetic_project(n_views, n_fields=20, n_groups=max(n_views // 10, 1))
+        fields = project.fields(expand_dimension_groups=True)
+        field = project.get_field("view_0.measure_1")
+        # The merged results graph is built once either way, so it's left out of the timings
+        project.join_graph.merged_results_graph(field.view.model)
+
+        start = time.perf_counter()
+        for f in fields:
+            f.join_graphs()
+        all_fields_time = time.perf_counter() - start
+
+        joinable_time = time_per_call(
+            lambda: project.joinable_fields([field], expand_dimension_groups=True), n_calls=5
+        )
+        rows.append((n_views, len(fields), all_fields_time * 1e3, joinable_time * 1e3))
+
+    columns = ["views", "fields", "all fields ms", "joinable ms"]
+    report("join_graphs for every field, then joinable_fields for one field", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Memory held by the fields of a project for several users, and how fast their sql is compiled
+
+Run with: python -m benchmarks.field_records
+"""
+from benchmarks.project_memory import measure
+from benchmarks.synthetic import report, synthetic_project, time_per_call
+
+
+def fields_for_users(project, users: list):
+    # Every user access scope builds its own views and fields
+    fields = []
+    for user in users:
+        project.set_user(user)
+        fields.extend(project.fields())
+    return fields
+
+
+def compile_sql(fields: list):
+    for field in fields:
+        if field.field_type != "dimension_group":
+            field.sql_query("SNOWFLAKE")
+
+
+def main():
+    users = [None, {"department": "sales"}, {"department": "finance"}]
+    rows = []
+    for n_views in [25, 125, 375]:
+        project = synthetic_project(n_views, n_fields=40, n_groups=max(n_views // 20, 1))
+        build_time, fields_memory = measure(lambda: fields_for_users(project, users))
+        fields = fields_for_users(project, users[:1])
+        compile_time = time_per_call(lambda: compile_sql(fields), n_calls=3)
+        n_fields = len(fields)
+        rows.append((n_fields, build_time * 1e3, fields_memory, compile_time / n_fields * 1e6))
+
+    columns = ["fields", "build ms", "fields MiB", "sql us/field"]
+    report(f"Fields built for {len(users)} users", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
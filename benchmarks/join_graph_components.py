@@ -0,0 +1,38 @@
+"""Cost of building the join graph and finding the join graphs of every view in it
+
+Run with: python -m benchmarks.join_graph_components
+"""
+import time
+
+from benchmarks.synthetic import report, synthetic_project
+
+
+def join_graph_lookups(project, view_names: list):
+    join_graph = project.join_graph
+    for view_name in view_names:
+        join_graph.join_graph_hash(view_name)
+        join_graph.weak_join_graph_hashes(view_name)
+    return join_graph
+
+
+def main():
+    rows = []
+    for n_views in [100, 250, 1000]:
+        project = synthetic_project(n_views, n_fields=4, n_groups=max(n_views // 20, 1))
+        view_names = [v["name"] for v in project._views]
+
+        start = time.perf_counter()
+        project.join_graph.graph
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        join_graph = join_graph_lookups(project, view_names)
+        lookup_time = time.perf_counter() - start
+        rows.append((n_views, len(join_graph.list_join_graphs()), build_time * 1e3, lookup_time * 1e3))
+
+    columns = ["views", "join graphs", "build ms", "all views ms"]
+    report("Join graph build, then strong and weak join graphs for every view", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
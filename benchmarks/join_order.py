@@ -0,0 +1,31 @@
+"""Cost of ordering the joins of a query whose views aren't joined in one direction
+
+Run with: python -m benchmarks.join_order
+"""
+from benchmarks.synthetic import MODEL_NAME, report, synthetic_project, time_per_call
+from metrics_layer.core.sql.query_design import MetricsLayerDesign
+
+
+def main():
+    n_views = 600
+    rows = []
+    for n_groups in [1, 10, 60]:
+        project = synthetic_project(n_views, n_fields=10, n_groups=n_groups)
+        model = project.get_model(MODEL_NAME)
+        graph = project.join_graph.graph
+        # Two views of one group that are a few joins apart, and the hub of the group
+        field_names = [f"view_{n_groups * i}.measure_1" for i in [3, 6]] + ["view_0.dimension_0"]
+        field_lookup = {f: project.get_field(f) for f in field_names}
+        design = MetricsLayerDesign(False, "SNOWFLAKE", field_lookup, model, project)
+        required_views = design.required_views()
+
+        # Plans are cached with the join graph, so this plans the joins without the cache
+        plan_time = time_per_call(lambda: design._determine_joins(required_views), n_calls=3)
+        rows.append((n_groups, graph.number_of_edges(), plan_time * 1e3))
+
+    columns = ["groups", "edges", "plan ms"]
+    report(f"Join order of 3 views on a {n_views} view join graph", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Cost of the joins each join planner picks, and how long it takes to pick them
+
+Run with: python -m benchmarks.join_planners
+"""
+from benchmarks.synthetic import MODEL_NAME, report, synthetic_project, time_per_call
+from metrics_layer.core.sql.query_design import MetricsLayerDesign
+
+
+def plan(project, model, field_lookup: dict, join_planner: str):
+    design = MetricsLayerDesign(False, "SNOWFLAKE", field_lookup, model, project, join_planner=join_planner)
+    return design._determine_joins(design.required_views())
+
+
+def main():
+    n_views, n_groups = 400, 4
+    project = synthetic_project(n_views, n_fields=10, n_groups=n_groups)
+    model = project.get_model(MODEL_NAME)
+    project.join_graph.graph
+    rows = []
+    for n_required in [2, 3, 5, 8]:
+        # Views spread out along the chain of one group, so they need views in between to join
+        field_names = [f"view_{n_groups * (1 + 7 * i)}.measure_1" for i in range(n_required)]
+        field_lookup = {f: project.get_field(f) for f in field_names}
+        row = [n_required]
+        for join_planner in ["greedy", "steiner"]:
+            joins = plan(project, model, field_lookup, join_planner)
+            plan_time = time_per_call(lambda: plan(project, model, field_lookup, join_planner), n_calls=3)
+            row.extend([len(joins), sum(j.weight for j in joins), plan_time * 1e3])
+        rows.append(tuple(row))
+
+    columns = ["views", "greedy joins", "greedy weight", "greedy ms", "steiner joins", "steiner weight"]
+    report(f"Joins picked on a {n_views} view join graph", rows, columns + ["steiner ms"])
+
+
+if __name__ == "__main__":
+    main()
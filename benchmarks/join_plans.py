@@ -0,0 +1,47 @@
+"""Cost of planning the joins of queries that keep joining the same few dozen sets of views
+
+Run with: python -m benchmarks.join_plans
+"""
+from benchmarks.synthetic import MODEL_NAME, report, synthetic_project, time_per_call
+from metrics_layer.core.sql.query_design import MetricsLayerDesign
+
+
+def view_combinations(n_views: int, n_groups: int, n_combinations: int = 30):
+    # A measure of one view, grouped by dimensions of its hub and of the view before it in its group
+    combinations = []
+    for i in range(n_combinations):
+        index = n_groups * (2 + i % (n_views // n_groups - 2)) + i % n_groups
+        hub, previous = index % n_groups, index - n_groups
+        combinations.append(
+            [f"view_{index}.measure_1", f"view_{hub}.dimension_0", f"view_{previous}.dimension_0"]
+        )
+    return combinations
+
+
+def main():
+    rows = []
+    for n_views in [100, 400, 1000]:
+        n_groups = max(n_views // 20, 1)
+        project = synthetic_project(n_views, n_fields=10, n_groups=n_groups)
+        model = project.get_model(MODEL_NAME)
+        project.join_graph.graph
+        combinations = view_combinations(n_views, n_groups)
+        field_lookups = [{f: project.get_field(f) for f in fields} for fields in combinations]
+        designs = iter(field_lookups * 1000)
+
+        def plan_query():
+            # Every query has its own design
+            design = MetricsLayerDesign(False, "SNOWFLAKE", next(designs), model, project)
+            design.joins()
+            design.functional_pk()
+
+        first_pass = time_per_call(plan_query, n_calls=len(combinations))
+        warm = time_per_call(plan_query, n_calls=len(combinations) * 5)
+        rows.append((n_views, len(combinations), first_pass * 1e3, warm * 1e3))
+
+    columns = ["views", "view sets", "first ms", "warm ms"]
+    report("Joins and functional primary key per query, same sets of views", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
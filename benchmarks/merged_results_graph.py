@@ -0,0 +1,31 @@
+"""Cost of building the merged results graph as the number of join groups grows
+
+Run with: python -m benchmarks.merged_results_graph
+"""
+import time
+
+from benchmarks.synthetic import MODEL_NAME, report, synthetic_project
+
+
+def main():
+    rows = []
+    # Every synthetic view is a join graph of its own, so the join graphs grow with the views
+    for n_views in [15, 30, 60, 120]:
+        project = synthetic_project(n_views, n_fields=12, n_groups=max(n_views // 10, 1))
+        model = project.get_model(MODEL_NAME)
+        # The fields and the join graph are built first, so only the merged results graph is timed
+        project.fields(model=model, expand_dimension_groups=True)
+        project.join_graph.graph
+
+        start = time.perf_counter()
+        graph = project.join_graph.merged_results_graph(model)
+        build_time = time.perf_counter() - start
+        n_join_graphs = len(project.join_graph.list_join_graphs())
+        rows.append((n_join_graphs, graph.number_of_edges(), build_time * 1e3))
+
+    columns = ["join graphs", "edges", "build ms"]
+    report("Merged results graph build", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Memory held by one project per branch, with and without a registry sharing what the branches have in common
+
+Run with: python -m benchmarks.project_branches
+"""
+from benchmarks.project_memory import measure
+from benchmarks.synthetic import CONNECTION_NAME, report, synthetic_models, synthetic_views
+from metrics_layer.core.model.project import Project
+from metrics_layer.core.model.project_registry import ProjectRegistry
+
+
+def branch_views(n_views: int, branch: int):
+    # Every branch is parsed on its own and changes one field of one view
+    views = synthetic_views(n_views, n_fields=40, n_groups=max(n_views // 20, 1))
+    changed = views[branch % n_views]["fields"][-1]
+    changed["description"] = f"Changed on branch {branch}"
+    return views
+
+
+def load_branches(n_views: int, n_branches: int, registry: ProjectRegistry = None):
+    projects = []
+    for branch in range(n_branches):
+        kwargs = {"connection_lookup": {CONNECTION_NAME: "SNOWFLAKE"}}
+        views = branch_views(n_views, branch)
+        if registry is not None:
+            project = registry.build_project(synthetic_models(), views, **kwargs)
+        else:
+            project = Project(models=synthetic_models(), views=views, **kwargs)
+        project.fields()
+        project.join_graph.graph
+        projects.append(project)
+    return projects
+
+
+def main():
+    n_views = 200
+    load_branches(5, 1)
+    rows = []
+    for n_branches in [1, 5, 20]:
+        plain_time, plain_memory = measure(lambda: load_branches(n_views, n_branches))
+        shared_time, shared_memory = measure(lambda: load_branches(n_views, n_branches, ProjectRegistry()))
+        rows.append((n_branches, plain_time * 1e3, plain_memory, shared_time * 1e3, shared_memory))
+
+    columns = ["branches", "plain ms", "plain MiB", "registry ms", "registry MiB"]
+    report(f"Loading one project per branch, {n_views} views each", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
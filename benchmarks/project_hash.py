@@ -0,0 +1,29 @@
+"""Hash cost of a project, field and model as the project grows
+
+Run with: python -m benchmarks.project_hash
+"""
+from benchmarks.synthetic import MODEL_NAME, report, synthetic_project, time_per_call
+
+
+def main():
+    rows = []
+    for n_views in [10, 100, 400]:
+        project = synthetic_project(n_views, n_fields=40)
+        # The first hash computes the content digest, every later one reuses it
+        first_hash = time_per_call(lambda: hash(project), n_calls=1)
+
+        field = project.get_field("view_0.id")
+        model = project.get_model(MODEL_NAME)
+        project_hash = time_per_call(lambda: hash(project), n_calls=10_000)
+        field_hash = time_per_call(lambda: hash(field), n_calls=10_000)
+        model_hash = time_per_call(lambda: hash(model), n_calls=10_000)
+        n_fields = len(project.fields())
+        timings = [first_hash, project_hash, field_hash, model_hash]
+        rows.append((n_views, n_fields, *[t * 1e6 for t in timings]))
+
+    columns = ["views", "fields", "first hash us", "project us", "field us", "model us"]
+    report("Hash cost per call (microseconds)", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Memory and time to build a project and all of its fields, next to what a deepcopy of the views costs
+
+Run with: python -m benchmarks.project_memory
+"""
+import time
+import tracemalloc
+from copy import deepcopy
+
+from benchmarks.synthetic import CONNECTION_NAME, report, synthetic_models, synthetic_views
+from metrics_layer.core.model.project import Project
+
+
+def measure(func):
+    # Returns the seconds taken and the MiB still held by the result
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, current / 2**20
+
+
+def build(views: list):
+    project = Project(
+        models=synthetic_models(), views=views, connection_lookup={CONNECTION_NAME: "SNOWFLAKE"}
+    )
+    project.fields()
+    project.join_graph
+    return project
+
+
+def main():
+    # Import everything a build needs, so it isn't counted against the first size
+    build(synthetic_views(5))
+    rows = []
+    for n_views in [100, 400, 1000]:
+        views = synthetic_views(n_views, n_fields=40, n_groups=max(n_views // 20, 1))
+        n_fields = sum(len(v["fields"]) for v in views)
+        build_time, build_memory = measure(lambda: build(views))
+        # What building the project used to pay up front, before any field was created
+        copy_time, copy_memory = measure(lambda: deepcopy(views))
+        rows.append((n_views, n_fields, build_time * 1e3, build_memory, copy_time * 1e3, copy_memory))
+
+    columns = ["views", "fields", "build ms", "build MiB", "deepcopy ms", "deepcopy MiB"]
+    report("Project build with all fields and the join graph", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
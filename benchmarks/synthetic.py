@@ -0,0 +1,92 @@
+import time
+
+from metrics_layer.core.model.project import Project
+
+MODEL_NAME = "bench_model"
+CONNECTION_NAME = "bench_connection"
+
+
+def synthetic_models():
+    return [{"version": 1, "type": "model", "name": MODEL_NAME, "connection": CONNECTION_NAME}]
+
+
+def synthetic_view(index: int, n_fields: int = 10, n_groups: int = 1):
+    # Every view in a group references the first view in the group (the hub) and the view before it
+    view_name = f"view_{index}"
+    group = index % n_groups
+    hub_index, previous_index = group, index - n_groups
+    identifiers = [{"name": f"{view_name}_id", "type": "primary", "sql": "${id}"}]
+    if index != hub_index:
+        identifiers.append({"name": f"view_{hub_index}_id", "type": "foreign", "sql": "${hub_id}"})
+    if previous_index > hub_index:
+        previous_identifier = f"view_{previous_index}_id"
+        identifiers.append({"name": previous_identifier, "type": "foreign", "sql": "${previous_id}"})
+
+    fields = [
+        {"name": "id", "field_type": "dimension", "primary_key": "yes", "sql": "${TABLE}.id"},
+        {"name": "hub_id", "field_type": "dimension", "type": "string", "sql": "${TABLE}.hub_id"},
+        {"name": "previous_id", "field_type": "dimension", "type": "string", "sql": "${TABLE}.previous_id"},
+        {
+            "name": "created",
+            "field_type": "dimension_group",
+            "type": "time",
+            "timeframes": ["raw", "date", "week", "month", "year"],
+            "sql": "${TABLE}.created_at",
+        },
+    ]
+    for i in range(max(n_fields - len(fields), 0)):
+        if i % 2 == 0:
+            fields.append(
+                {
+                    "name": f"dimension_{i}",
+                    "field_type": "dimension",
+                    "type": "string",
+                    "sql": f"${{TABLE}}.d{i}",
+                }
+            )
+        else:
+            fields.append(
+                {
+                    "name": f"measure_{i}",
+                    "field_type": "measure",
+                    "type": "sum",
+                    "sql": f"${{TABLE}}.m{i}",
+                    "canon_date": "created",
+                }
+            )
+    return {
+        "version": 1,
+        "type": "view",
+        "name": view_name,
+        "model_name": MODEL_NAME,
+        "sql_table_name": f"analytics.{view_name}",
+        "default_date": "created",
+        "identifiers": identifiers,
+        "fields": fields,
+    }
+
+
+def synthetic_views(n_views: int, n_fields: int = 10, n_groups: int = 1):
+    return [synthetic_view(i, n_fields=n_fields, n_groups=n_groups) for i in range(n_views)]
+
+
+def synthetic_project(n_views: int, n_fields: int = 10, n_groups: int = 1):
+    return Project(
+        models=synthetic_models(),
+        views=synthetic_views(n_views, n_fields=n_fields, n_groups=n_groups),
+        connection_lookup={CONNECTION_NAME: "SNOWFLAKE"},
+    )
+
+
+def time_per_call(func, n_calls: int = 1000):
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        func()
+    return (time.perf_counter() - start) / n_calls
+
+
+def report(title: str, rows: list, columns: list):
+    print(f"\n{title}")
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print(" | ".join(f"{v:>14.6g}" if isinstance(v, float) else f"{v:>14}" for v in row))
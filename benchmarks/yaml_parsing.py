@@ -0,0 +1,58 @@
+"""Parse time of a generated repo with 5k yaml files, serially and in a process pool
+
+Run with: python -m benchmarks.yaml_parsing
+"""
+import os
+import tempfile
+import time
+
+import yaml
+
+from benchmarks.synthetic import report, synthetic_models, synthetic_view
+from metrics_layer.core.parse import project_reader_base
+from metrics_layer.core.parse.github_repo import LocalRepo
+from metrics_layer.core.parse.project_reader_metrics_layer import MetricsLayerProjectReader
+
+
+def write_repo(folder: str, n_views: int):
+    os.makedirs(os.path.join(folder, "models"))
+    os.makedirs(os.path.join(folder, "views"))
+    with open(os.path.join(folder, "zenlytic_project.yml"), "w") as f:
+        yaml.safe_dump({"name": "bench", "model-paths": ["models"], "view-paths": ["views"]}, f)
+    for model in synthetic_models():
+        with open(os.path.join(folder, "models", f"{model['name']}.yml"), "w") as f:
+            yaml.safe_dump(model, f)
+    for i in range(n_views):
+        with open(os.path.join(folder, "views", f"view_{i}.yml"), "w") as f:
+            yaml.safe_dump(synthetic_view(i, n_fields=20, n_groups=10), f)
+
+
+def time_load(folder: str, workers: int = None):
+    reader = MetricsLayerProjectReader(LocalRepo(folder))
+    start = time.perf_counter()
+    reader.load(workers=workers)
+    elapsed = time.perf_counter() - start
+    slowest = max(reader.file_timings.values())
+    return elapsed, slowest
+
+
+def main(n_views: int = 5000):
+    with tempfile.TemporaryDirectory() as folder:
+        write_repo(folder, n_views)
+
+        rows = []
+        c_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        project_reader_base.YAML_LOADER = yaml.SafeLoader
+        rows.append(("python", "serial", *time_load(folder)))
+        project_reader_base.YAML_LOADER = None
+
+        rows.append((c_loader.__name__, "serial", *time_load(folder)))
+        for workers in sorted({2, 4, os.cpu_count() or 1} - {1}):
+            rows.append((c_loader.__name__, f"{workers} workers", *time_load(folder, workers=workers)))
+
+    columns = ["loader", "mode", "total s", "slowest file s"]
+    report(f"Parse time for {n_views + 1} yaml files", rows, columns)
+
+
+if __name__ == "__main__":
+    main()
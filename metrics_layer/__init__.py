@@ -1,9 +1,17 @@
-from metrics_layer.cli import cli_group  # noqa
 from metrics_layer.core import MetricsLayerConnection  # noqa
 
-try:
-    import importlib.metadata as importlib_metadata
-except ModuleNotFoundError:
-    import importlib_metadata
 
-__version__ = importlib_metadata.version(__name__)
+def __getattr__(name: str):
+    # The CLI and the package metadata are only loaded when they're asked for, to keep imports fast
+    if name == "cli_group":
+        from metrics_layer.cli import cli_group
+
+        return cli_group
+    if name == "__version__":
+        try:
+            import importlib.metadata as importlib_metadata
+        except ModuleNotFoundError:
+            import importlib_metadata
+
+        return importlib_metadata.version(__name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
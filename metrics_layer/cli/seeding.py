@@ -1,6 +1,5 @@
 import os
 import re
-import pandas as pd
 from metrics_layer.core.model.definitions import Definitions
 from typing import List
 
@@ -158,6 +157,8 @@ class SeedMetricsLayer:
         }
 
     def seed(self, auto_tag_searchable_fields: bool = False):
+        import pandas as pd
+
         from metrics_layer.core.parse import ProjectDumper, ProjectLoader
 
         if self.connection.type not in Definitions.supported_warehouses:
@@ -198,11 +199,15 @@ class SeedMetricsLayer:
         for i, table_name in enumerate(tables):
             column_df = data[data["TABLE_NAME"].str.lower() == table_name.lower()].copy()
             if not table_data.empty:
-                table_comment = table_data[table_data["TABLE_NAME"].str.lower() == table_name.lower()][
-                    "COMMENT"
-                ].values[0]
+                table_row = table_data[table_data["TABLE_NAME"].str.lower() == table_name.lower()]
+                table_comment = table_row["COMMENT"].values[0]
+                # The row count is a hint for planning joins, where the warehouse reports it
+                if "TABLE_ROW_COUNT" in table_row and pd.notnull(table_row["TABLE_ROW_COUNT"].values[0]):
+                    row_count = int(table_row["TABLE_ROW_COUNT"].values[0])
+                else:
+                    row_count = None
             else:
-                table_comment = None
+                table_comment, row_count = None, None
             schema_name = column_df["TABLE_SCHEMA"].values[0]
             view = self.make_view(
                 column_df,
@@ -210,6 +215,7 @@ class SeedMetricsLayer:
                 table_name,
                 schema_name,
                 table_comment,
+                row_count=row_count,
                 auto_tag_searchable_fields=auto_tag_searchable_fields,
             )
             if self.table:
@@ -264,6 +270,7 @@ class SeedMetricsLayer:
         table_name: str,
         schema_name: str,
         table_comment: str = None,
+        row_count: int = None,
         auto_tag_searchable_fields: bool = True,
     ):
         view_name = self.clean_name(table_name)
@@ -302,6 +309,8 @@ class SeedMetricsLayer:
         }
         if table_comment:
             view["description"] = table_comment
+        if row_count is not None:
+            view["row_count"] = row_count
         if view["default_date"] is None:
             view.pop("default_date")
         return view
@@ -1,2 +1,3 @@
 from .definitions import Definitions  # noqa
 from .project import Project  # noqa
+from .project_registry import ProjectRegistry  # noqa
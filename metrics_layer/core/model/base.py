@@ -1,9 +1,12 @@
 import re
 
 NAME_REGEX = re.compile(r"([A-Za-z0-9\_]+)")
+FIELD_REFERENCE_REGEX = re.compile(r"\$\{(.*?)\}", re.MULTILINE)
 
 
 class MetricsLayerBase:
+    __slots__ = ("_definition",)
+
     def __init__(self, definition: dict = {}) -> None:
         self._definition = definition
 
@@ -43,7 +46,8 @@ class MetricsLayerBase:
 
 
 class SQLReplacement:
+    __slots__ = ()
+
     @staticmethod
     def fields_to_replace(text: str):
-        matches = re.finditer(r"\$\{(.*?)\}", text, re.MULTILINE)
-        return [match.group(1) for match in matches]
+        return FIELD_REFERENCE_REGEX.findall(text)
@@ -2,7 +2,6 @@ from copy import deepcopy
 
 from metrics_layer.core.exceptions import QueryError
 from .base import MetricsLayerBase
-from .filter import Filter
 
 
 class DashboardLayouts:
@@ -54,6 +53,8 @@ class DashboardElement(MetricsLayerBase):
         return self.filters
 
     def parsed_filters(self, json_safe=False):
+        from .filter import Filter
+
         to_add = {"week_start_day": self.get_model().week_start_day, "timezone": self.project.timezone}
         return [f for raw in self._raw_filters() for f in Filter({**raw, **to_add}).filter_dict(json_safe)]
 
@@ -143,6 +144,8 @@ class Dashboard(MetricsLayerBase):
         return self.filters
 
     def parsed_filters(self, json_safe=False):
+        from .filter import Filter
+
         all_filters = []
         info = {"timezone": self.project.timezone}
         week_start_days = set(e.get_model().week_start_day for e in self.elements())
@@ -1,13 +1,8 @@
-import functools
-import hashlib
 import re
-from copy import deepcopy
-from pypika.terms import LiteralValue
 
 from metrics_layer.core.exceptions import AccessDeniedOrDoesNotExistException, QueryError
 from .base import MetricsLayerBase, SQLReplacement
 from .definitions import Definitions
-from .filter import Filter
 from .set import Set
 
 SQL_KEYWORDS = {"order", "group", "by", "as", "from", "select", "on", "with"}
@@ -73,40 +68,40 @@ VALID_VALUE_FORMAT_NAMES = [
 
 
 class Field(MetricsLayerBase, SQLReplacement):
+    # Projects hold many thousands of fields, so they don't get an instance __dict__.
+    # Everything else is read from the definition
+    __slots__ = ("view", "dimension_group", "_join_graphs")
+
+    defaults = {"type": "string", "primary_key": "no", "datatype": "timestamp"}
+    default_intervals = ["second", "minute", "hour", "day", "week", "month", "quarter", "year"]
+
     def __init__(self, definition: dict = {}, view=None) -> None:
-        self.defaults = {"type": "string", "primary_key": "no", "datatype": "timestamp"}
-        self.default_intervals = ["second", "minute", "hour", "day", "week", "month", "quarter", "year"]
+        # The definition is shared with the view and the project, so it's only copied when it has to change
+        changes = {}
 
         # Always lowercase names and make exception for the None case in the
         # event of this being used by a filter and not having a name.
-        if definition["name"] is not None:
-            definition["name"] = definition["name"].lower()
-
-        # Remove the label prefix if it's null
-        if "label_prefix" in definition and definition["label_prefix"] is None:
-            definition.pop("label_prefix")
-
-        if "primary_key" in definition and isinstance(definition["primary_key"], bool):
-            definition["primary_key"] = "yes" if definition["primary_key"] else "no"
+        if definition["name"] is not None and definition["name"] != definition["name"].lower():
+            changes["name"] = definition["name"].lower()
 
-        if "hidden" in definition and isinstance(definition["hidden"], bool):
-            definition["hidden"] = "yes" if definition["hidden"] else "no"
+        for key in ["primary_key", "hidden"]:
+            if key in definition and isinstance(definition[key], bool):
+                changes[key] = "yes" if definition[key] else "no"
 
-        if (
-            "sql" not in definition
-            and definition.get("field_type") == "measure"
-            and definition.get("type") == "count"
-        ):
-            definition["primary_key_count"] = True
+        # Remove the label prefix if it's null
+        null_label_prefix = "label_prefix" in definition and definition["label_prefix"] is None
+        if changes or null_label_prefix:
+            definition = {**definition, **changes}
+            if null_label_prefix:
+                definition.pop("label_prefix")
 
         self.view = view
+        self._join_graphs = {}
         self.validate(definition)
         super().__init__(definition)
 
     def __hash__(self) -> int:
-        result = hashlib.md5(self.id().encode("utf-8"))
-        id_int = int(result.hexdigest(), base=16)
-        return hash(self.view.project) + id_int
+        return hash((hash(self.view.project), self.id()))
 
     def __eq__(self, other):
         if isinstance(other, str):
@@ -119,9 +114,17 @@ class Field(MetricsLayerBase, SQLReplacement):
             alias = alias.upper()
         return f"{self.view.name}.{alias}"
 
+    @property
+    def primary_key_count(self):
+        return (
+            "sql" not in self._definition
+            and self._definition.get("field_type") == "measure"
+            and self._definition.get("type") == "count"
+        )
+
     @property
     def sql(self):
-        definition = deepcopy(self._definition)
+        definition = {**self._definition}
         if "sql" not in definition and "case" in definition:
             definition["sql"] = self._translate_looker_case_to_sql(definition["case"])
 
@@ -136,13 +139,18 @@ class Field(MetricsLayerBase, SQLReplacement):
                 definition["sql"] = "*"
 
         if "sql" in definition and (self.filters or self.non_additive_dimension):
+            # Filters are compiled with pypika, which is only imported once a filtered field is used
+            from pypika.terms import LiteralValue
+
+            from .filter import Filter
+
             if definition["sql"] == "*":
                 raise QueryError(
                     "To apply filters to a count measure you must have the primary_key specified "
                     "for the view. You can do this by adding the tag 'primary_key: yes' to the "
                     "necessary dimension"
                 )
-            filters_to_apply = definition.get("filters", [])
+            filters_to_apply = list(definition.get("filters", []))
 
             if non_additive_dimension := self.non_additive_dimension:
                 filters_to_apply += [
@@ -264,6 +272,8 @@ class Field(MetricsLayerBase, SQLReplacement):
     def non_additive_dimension(self):
         non_additive_dimension = self._definition.get("non_additive_dimension")
         if non_additive_dimension:
+            # The definition is shared with every view the field is in, so qualify the names on a copy
+            non_additive_dimension = {**non_additive_dimension}
             if "." not in non_additive_dimension["name"]:
                 qualified_name = f"{self.view.name}.{non_additive_dimension['name']}"
                 non_additive_dimension["name"] = qualified_name
@@ -342,7 +352,7 @@ class Field(MetricsLayerBase, SQLReplacement):
         return type_lookup[self.type](sql, query_type, functional_pk, alias_only)
 
     def strict_replaced_query(self):
-        clean_sql = deepcopy(self.sql)
+        clean_sql = self.sql
         fields_to_replace = self.fields_to_replace(clean_sql)
         for to_replace in fields_to_replace:
             if to_replace == "TABLE":
@@ -380,6 +390,8 @@ class Field(MetricsLayerBase, SQLReplacement):
 
     def _get_sql_distinct_key(self, sql_distinct_key: str, query_type: str, alias_only: bool):
         if self.filters:
+            from .filter import Filter
+
             clean_sql_distinct_key = Filter.translate_looker_filters_to_sql(sql_distinct_key, self.filters)
         else:
             clean_sql_distinct_key = sql_distinct_key
@@ -562,7 +574,7 @@ class Field(MetricsLayerBase, SQLReplacement):
 
     def _number_aggregate_sql(self, sql: str, query_type: str, functional_pk: str, alias_only: bool):
         if isinstance(sql, list):
-            replaced = deepcopy(self.sql)
+            replaced = self.sql
             for field_name in self.fields_to_replace(self.sql):
                 proper_to_replace = "${" + field_name + "}"
                 if field_name == "TABLE":
@@ -609,11 +621,11 @@ class Field(MetricsLayerBase, SQLReplacement):
 
     def to_dict(self, query_type: str = None):
         output = {**self._definition}
-        output["sql_raw"] = deepcopy(self.sql)
+        output["sql_raw"] = self.sql
         if output["field_type"] == "measure" and output["type"] == "number":
             output["sql"] = self.get_referenced_sql_query()
         elif output["field_type"] == "dimension_group" and self.dimension_group is None:
-            output["sql"] = deepcopy(self.sql)
+            output["sql"] = self.sql
         elif query_type:
             output["sql"] = self.sql_query(query_type)
         return output
@@ -1132,7 +1144,7 @@ class Field(MetricsLayerBase, SQLReplacement):
         return clean_sql
 
     def replace_fields(self, sql, query_type, view_name=None, alias_only=False):
-        clean_sql = deepcopy(sql)
+        clean_sql = sql
         view_name = self.view.name if not view_name else view_name
         fields_to_replace = self.fields_to_replace(sql)
         for to_replace in fields_to_replace:
@@ -1198,7 +1210,7 @@ class Field(MetricsLayerBase, SQLReplacement):
         return case_sql + "end"
 
     def _clean_sql_for_case(self, sql: str):
-        clean_sql = deepcopy(sql)
+        clean_sql = sql
         for to_replace in self.fields_to_replace(sql):
             if to_replace != "TABLE":
                 clean_sql = clean_sql.replace("${" + to_replace + "}", "${" + to_replace.lower() + "}")
@@ -1257,21 +1269,38 @@ class Field(MetricsLayerBase, SQLReplacement):
         digit_first_char = name[0] in {"0", "1", "2", "3", "4", "5", "6", "7", "8", "9"}
         return name_is_keyword or digit_first_char
 
-    @functools.lru_cache(maxsize=None)
     def join_graphs(self):
-        if self.view.model is None:
+        # Kept on the field, so a module level cache doesn't keep every project's fields alive.
+        # It's keyed by the id, because the dimension group of a field can be set after it's made
+        field_id = self.id()
+        if field_id not in self._join_graphs:
+            # The join graphs of all the fields are worked out at once, the first time any are needed
+            model = self._join_graphs_model()
+            join_graphs = self.view.project.join_graph.field_join_graphs(model).get(field_id)
+            if join_graphs is None:
+                join_graphs = self._build_join_graphs()
+            self._join_graphs[field_id] = list(join_graphs)
+        return self._join_graphs[field_id]
+
+    def _join_graphs_model(self):
+        model = self.view.model
+        if model is None:
             raise QueryError(
                 f"Could not find a model in view {self.view.name}, "
                 "please pass the model or set the model_name argument in the view"
             )
+        return model
 
+    def _build_join_graphs(self, extended: list = None):
+        model = self._join_graphs_model()
         base = self.view.project.join_graph.weak_join_graph_hashes(self.view.name)
 
         if self.is_cumulative():
             return base
 
-        edges = self.view.project.join_graph.merged_results_graph(self.view.model).in_edges(self.id())
-        extended = [f"merged_result_{mr}" for mr, _ in edges]
+        if extended is None:
+            edges = self.view.project.join_graph.merged_results_graph(model).in_edges(self.id())
+            extended = [f"merged_result_{mr}" for mr, _ in edges]
         if self.is_merged_result:
             return extended
         return list(sorted(base + extended))
@@ -1,4 +1,5 @@
 import re
+import threading
 from datetime import datetime
 from enum import Enum
 
@@ -12,6 +13,9 @@ from metrics_layer.core.exceptions import QueryError
 
 from .base import MetricsLayerBase
 
+# pendulum's week start day is process wide, so setting it, parsing and resetting it again happen together
+_week_start_day_lock = threading.Lock()
+
 
 class LiteralValueCriterion(Criterion):
     def __init__(self, sql_query: str, alias: str = None) -> None:
@@ -149,6 +153,15 @@ class Filter(MetricsLayerBase):
         pendulum.week_starts_at(Filter.week_start_day_default)
         pendulum.week_ends_at(Filter.week_end_day_default)
 
+    @staticmethod
+    def parse_date_condition_for_week(date_condition: str, week_start_day: str, tz: str) -> list:
+        with _week_start_day_lock:
+            Filter._set_week_start_day(week_start_day)
+            try:
+                return Filter.parse_date_condition(date_condition, tz=tz)
+            finally:
+                Filter._reset_week_start_day()
+
     @staticmethod
     def _end_date(lag: int, date_part: str, tz: str):
         plural_date_part = FilterInterval.plural(date_part)
@@ -327,9 +340,7 @@ class Filter(MetricsLayerBase):
             ">": MetricsLayerFilterExpressionType.GreaterThan,
             "<": MetricsLayerFilterExpressionType.LessThan,
         }
-        Filter._set_week_start_day(week_start_day)
-        date_condition = Filter.parse_date_condition(value, tz=tz)
-        Filter._reset_week_start_day()
+        date_condition = Filter.parse_date_condition_for_week(value, week_start_day, tz=tz)
 
         first_word = str(value).split(" ")[0]
         first_two_words = " ".join(str(value).split(" ")[:2])
@@ -1,13 +1,17 @@
-import networkx
+import heapq
+import threading
 from itertools import combinations, product
 
 from metrics_layer.core.model.definitions import Definitions
 from metrics_layer.core.exceptions import AccessDeniedOrDoesNotExistException, QueryError
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from copy import deepcopy
 from .base import SQLReplacement
 from .join import Join
 
+# How many sets of views keep their join plan cached at once
+JOIN_PLAN_CACHE_SIZE = 1024
+
 
 class IdentifierTypes:
     primary = "primary"
@@ -20,10 +24,18 @@ class JoinGraph(SQLReplacement):
         self.project = project
         self._join_preference = ["one_to_one", "many_to_one", "one_to_many", "many_to_many"]
         self._merged_result_graph = None
+        # Field id -> the join graphs the field is in
+        self._field_join_graphs = None
         self._graph = None
         self._field_memo = {}
-        self._weak_graph_memo = {}
-        self._strong_graph_memo = {}
+        # View name -> the join graph it's in, and every join graph it can be reached from.
+        # Both are computed for all views at once, when the graph is built
+        self._join_graph_hash_map = None
+        self._weak_join_graph_hashes_map = None
+        # (model name, required views) -> the joins for them, and their functional primary key
+        self._join_plans = OrderedDict()
+        # Queries compile on several threads at once (query_many, aget_sql_query) and share the plans
+        self._join_plans_lock = threading.Lock()
 
     def subgraph(self, view_names: list):
         return self.graph.subgraph(view_names)
@@ -35,41 +47,62 @@ class JoinGraph(SQLReplacement):
         return self._graph
 
     def list_join_graphs(self):
-        graph = self.project.join_graph.graph
-        sorted_components = self._strongly_connected_components(graph)
-        return [f"subquery_{i}" for i, _ in enumerate(sorted_components)]
+        return [f"subquery_{i}" for i in range(len(set(self.join_graph_hash_map.values())))]
 
-    def join_graph_hash(self, view_name: str) -> str:
-        if view_name not in self._strong_graph_memo:
-            graph = self.project.join_graph.graph
-            sorted_components = self._strongly_connected_components(graph)
+    @property
+    def join_graph_hash_map(self):
+        if self._join_graph_hash_map is None:
+            self._build_join_graph_hash_maps(self.graph)
+        return self._join_graph_hash_map
 
-            sorted_comps = enumerate(sorted_components)
-            graph_hash = next((f"subquery_{i}" for i, comps in sorted_comps if view_name in comps), None)
-            if graph_hash is None:
-                raise QueryError(
-                    f"View name {view_name} not found in any joinable part of your data model. "
-                    "Please make sure this is the right name for the view."
-                )
+    @property
+    def weak_join_graph_hashes_map(self):
+        if self._weak_join_graph_hashes_map is None:
+            self._build_join_graph_hash_maps(self.graph)
+        return self._weak_join_graph_hashes_map
 
-            self._strong_graph_memo[view_name] = graph_hash
-        return self._strong_graph_memo[view_name]
+    def join_graph_hash(self, view_name: str) -> str:
+        graph_hash = self.join_graph_hash_map.get(view_name)
+        if graph_hash is None:
+            raise QueryError(
+                f"View name {view_name} not found in any joinable part of your data model. "
+                "Please make sure this is the right name for the view."
+            )
+        return graph_hash
 
     def weak_join_graph_hashes(self, view_name: str) -> list:
-        if view_name not in self._weak_graph_memo:
-            graph = self.project.join_graph.graph
-            sorted_components = self._strongly_connected_components(graph)
+        return self.weak_join_graph_hashes_map.get(view_name, [])
 
-            join_graph_hashes = []
-            for i, components in enumerate(sorted_components):
-                subgraph_nodes = self._subgraph_nodes_from_components(graph, components)
-                if view_name in subgraph_nodes:
-                    join_graph_hashes.append(f"subquery_{i}")
+    def _build_join_graph_hash_maps(self, graph):
+        import networkx
 
-            self._weak_graph_memo[view_name] = join_graph_hashes
-        return self._weak_graph_memo[view_name]
+        sorted_components = self._strongly_connected_components(graph)
+        join_graph_hash_map = {}
+        for i, components in enumerate(sorted_components):
+            for view_name in components:
+                join_graph_hash_map[view_name] = f"subquery_{i}"
+
+        # A view can be reached from its own component and every component upstream of it. The components
+        # form a DAG, so what each one reaches is its own views plus what its successors reach
+        condensed = networkx.condensation(graph, scc=[set(c) for c in sorted_components])
+        reachable = {}
+        for node in reversed(list(networkx.topological_sort(condensed))):
+            reached = set(condensed.nodes[node]["members"])
+            for successor in condensed.successors(node):
+                reached |= reachable[successor]
+            reachable[node] = reached
+
+        weak_join_graph_hashes_map = defaultdict(list)
+        for i in range(len(sorted_components)):
+            for view_name in reachable[i]:
+                weak_join_graph_hashes_map[view_name].append(f"subquery_{i}")
+
+        self._join_graph_hash_map = join_graph_hash_map
+        self._weak_join_graph_hashes_map = dict(weak_join_graph_hashes_map)
 
     def _strongly_connected_components(self, graph):
+        import networkx
+
         components = networkx.strongly_connected_components(graph)
         # Sort the sub-components graphs alphabetically
         sorted_sub_components = [list(sorted(c)) for c in components]
@@ -77,11 +110,19 @@ class JoinGraph(SQLReplacement):
         sorted_components = sorted(sorted_sub_components, key=lambda x: (len(x), x[0]), reverse=True)
         return sorted_components
 
-    @staticmethod
-    def _subgraph_nodes_from_components(graph, components):
-        edges = networkx.edge_dfs(graph, source=components)
-        all_edges = list(edges) + [list(components)]
-        return list(set(node for edge in all_edges for node in edge))
+    def join_plan(self, model_name: str, required_views: list, join_planner: str = "greedy"):
+        # The plan for a set of views only changes when the graph does, so it lives as long as the graph
+        key = (model_name, frozenset(required_views), join_planner)
+        with self._join_plans_lock:
+            if key in self._join_plans:
+                self._join_plans.move_to_end(key)
+                return self._join_plans[key]
+
+            plan = {}
+            self._join_plans[key] = plan
+            if len(self._join_plans) > JOIN_PLAN_CACHE_SIZE:
+                self._join_plans.popitem(last=False)
+            return plan
 
     def ordered_joins(self, view_pairs: list):
         joins = []
@@ -111,9 +152,12 @@ class JoinGraph(SQLReplacement):
         return Join(join_definition, project=self.project)
 
     def build(self):
+        import networkx
+
         graph = networkx.DiGraph()
         identifier_map, primary_keys = self._identifier_map()
         self.composite_keys = self._composite_keys(primary_keys)
+        self.table_sizes = {}
         reference_map = self._reference_map()
         views_seen = set()
         for view in self.project.views():
@@ -124,6 +168,8 @@ class JoinGraph(SQLReplacement):
                     "will create a view under its that name and the name must be unique)."
                 )
             views_seen.add(view.name)
+            if view.row_count:
+                self.table_sizes[view.name] = view.row_count
             graph.add_node(view.name)
             if view.name in reference_map:
                 # Add all explicit "join" type references
@@ -163,54 +209,106 @@ class JoinGraph(SQLReplacement):
                             graph.add_edge(view.name, join_view_name, **join_info)
 
         # print(networkx.to_dict_of_dicts(graph))
+        self._graph = graph
+        self._build_join_graph_hash_maps(graph)
         return graph
 
+    def copy_for(self, project, keep_merged_results: bool = True):
+        # The graph only depends on the views' names and identifiers, so a new version of the
+        # project with the same identifiers can use it without building it again
+        join_graph = JoinGraph(project)
+        join_graph._graph = self._graph
+        join_graph.composite_keys = self.composite_keys
+        join_graph.table_sizes = self.table_sizes
+        # The maps are never changed after they're built, so they're shared instead of copied
+        join_graph._join_graph_hash_map = self._join_graph_hash_map
+        join_graph._weak_join_graph_hashes_map = self._weak_join_graph_hashes_map
+        if keep_merged_results:
+            join_graph._merged_result_graph = self._merged_result_graph
+            join_graph._field_join_graphs = self._field_join_graphs
+        return join_graph
+
     def merged_results_graph(self, model):
         if self._merged_result_graph is None:
             self._merged_result_graph = self._build_merged_results_graph(model)
         return self._merged_result_graph
 
+    def field_join_graphs(self, model):
+        if self._field_join_graphs is None:
+            self._build_field_join_graphs(model)
+        return self._field_join_graphs
+
+    def _build_field_join_graphs(self, model):
+        # Every field is assigned its join graphs in one pass over the project's fields
+        merged_results = self.merged_results_graph(model).pred
+        fields = self.project.fields(model=model, expand_dimension_groups=True)
+        dimension_groups = [f for f in self.project.fields(model=model) if f.field_type == "dimension_group"]
+        field_join_graphs = {}
+        for field in fields + dimension_groups:
+            field_id = field.id()
+            extended = [f"merged_result_{mr}" for mr in merged_results.get(field_id, ())]
+            try:
+                field_join_graphs[field_id] = tuple(field._build_join_graphs(extended))
+            except (AccessDeniedOrDoesNotExistException, QueryError):
+                # Fields that can't be resolved are left to raise when they're asked for on their own
+                continue
+        self._field_join_graphs = field_join_graphs
+
     def _build_merged_results_graph(self, model):
+        import networkx
+
+        self._field_memo = {}
         with_dates = [
             field
             for field in self.project.fields(model=model)
             if field.canon_date and field.field_type == "measure"
         ]
         mappings = model.get_mappings(dimensions_only=True)
+        # The canon dates of the measures, and the fields of the views, are looked up once
+        # for the whole graph instead of once for every pair of join graphs
+        canon_dates = self._canon_dates_by_join_graph(with_dates)
+        fields_by_view = defaultdict(list)
+        for field in self.project.fields(model=model, expand_dimension_groups=True):
+            fields_by_view[field.view.name].append(field.id())
 
         # Merged result shared date and field mapping
         graph = networkx.DiGraph()
 
-        existing_root_nodes, join_group_hashes = self._add_canon_dates_to_merged_result(
-            graph, with_dates, join_root=Definitions.canon_date_join_graph_root
+        all_canon_dates = list(heapq.merge(*canon_dates.values()))
+        existing_root_nodes = self._add_canon_dates_to_merged_result(
+            graph, all_canon_dates, join_root=Definitions.canon_date_join_graph_root
         )
         self._add_mappings_to_merged_result(
             graph,
             mappings,
-            must_exist_in=join_group_hashes,
+            must_exist_in=canon_dates,
             root_nodes=existing_root_nodes,
             measures_only=True,
         )
 
-        ordered_hashes = sorted(list(join_group_hashes))
-        for join_group_hash_1, join_group_hash_2 in combinations(ordered_hashes, 2):
+        # The views that can be reached from both join graphs in each pair, in project order
+        pair_views = defaultdict(list)
+        for view in self.project.views(model=model):
+            join_hashes = sorted(h for h in self.weak_join_graph_hashes(view.name) if h in canon_dates)
+            for pair in combinations(join_hashes, 2):
+                pair_views[pair].append(view.name)
+
+        for join_group_hash_1, join_group_hash_2 in combinations(sorted(canon_dates), 2):
             join_root = join_group_hash_1 + "_" + join_group_hash_2
 
             pair = [join_group_hash_1, join_group_hash_2]
-            existing_sub_root_nodes, _ = self._add_canon_dates_to_merged_result(
-                graph, with_dates, join_root, use_condition=True, must_be_in=pair
+            pair_canon_dates = heapq.merge(canon_dates[join_group_hash_1], canon_dates[join_group_hash_2])
+            existing_sub_root_nodes = self._add_canon_dates_to_merged_result(
+                graph, pair_canon_dates, join_root
             )
 
             # Add any fields that accessible via a join to both join_group_hash_1 and join_group_hash_2
-            for view in self.project.views(model=model):
-                join_hashes = self.project.join_graph.weak_join_graph_hashes(view.name)
-                if all(join_hash in join_hashes for join_hash in pair):
-                    view_fields = self.project.fields(
-                        view_name=view.name, model=model, expand_dimension_groups=True
-                    )
-                    for field in view_fields:
-                        for node in existing_sub_root_nodes:
-                            graph.add_edge(node, field.id())
+            graph.add_edges_from(
+                (node, field_id)
+                for view_name in pair_views[(join_group_hash_1, join_group_hash_2)]
+                for field_id in fields_by_view[view_name]
+                for node in existing_sub_root_nodes
+            )
 
             self._add_mappings_to_merged_result(
                 graph, mappings, must_exist_in=pair, root_nodes=existing_sub_root_nodes
@@ -218,29 +316,34 @@ class JoinGraph(SQLReplacement):
 
         return graph
 
-    def _add_canon_dates_to_merged_result(
-        self, graph, measures: list, join_root: str, use_condition: bool = False, must_be_in: list = []
-    ):
-        self._field_memo = {}
-        existing_root_nodes, join_group_hashes = set(), set()
-        for measure in measures:
-            join_hash = self.project.join_graph.join_graph_hash(measure.view.name)
-            join_group_hashes.add(join_hash)
-            if not use_condition or (use_condition and join_hash in must_be_in):
-                measure_id = measure.id()
-                try:
-                    canon_date = self._get_field_with_memo(measure.canon_date, by_name=True)
-                    for timeframe in canon_date.timeframes:
-                        canon_date.dimension_group = timeframe
-                        root_node_name = join_root + "_" + timeframe
-                        graph.add_edges_from(
-                            [(root_node_name, canon_date.id()), (root_node_name, measure_id)]
-                        )
-                        existing_root_nodes.add(root_node_name)
-                except AccessDeniedOrDoesNotExistException:
-                    # In the event that the canon_date doesn't exist anymore, don't break everything
-                    pass
-        return sorted(list(existing_root_nodes)), join_group_hashes
+    def _canon_dates_by_join_graph(self, measures: list):
+        # Join graph -> (position, measure id, canon date ids by timeframe) for its measures in order
+        canon_dates = defaultdict(list)
+        for i, measure in enumerate(measures):
+            join_hash = self.join_graph_hash(measure.view.name)
+            try:
+                canon_date = self._get_field_with_memo(measure.canon_date, by_name=True)
+                # The canon date is shared, so we build the ids instead of setting the timeframe on it
+                canon_date_ids = [
+                    (timeframe, f"{canon_date.view.name}.{canon_date.name}_{timeframe}")
+                    for timeframe in canon_date.timeframes
+                ]
+            except AccessDeniedOrDoesNotExistException:
+                # In the event that the canon_date doesn't exist anymore, don't break everything
+                canon_date_ids = []
+            canon_dates[join_hash].append((i, measure.id(), canon_date_ids))
+        return canon_dates
+
+    @staticmethod
+    def _add_canon_dates_to_merged_result(graph, canon_dates, join_root: str):
+        existing_root_nodes, edges = set(), []
+        for _, measure_id, canon_date_ids in canon_dates:
+            for timeframe, canon_date_id in canon_date_ids:
+                root_node_name = join_root + "_" + timeframe
+                edges.extend([(root_node_name, canon_date_id), (root_node_name, measure_id)])
+                existing_root_nodes.add(root_node_name)
+        graph.add_edges_from(edges)
+        return sorted(list(existing_root_nodes))
 
     def _add_mappings_to_merged_result(
         self, graph, mappings: dict, must_exist_in: list, root_nodes: list, measures_only: bool = False
@@ -258,14 +361,14 @@ class JoinGraph(SQLReplacement):
                     graph.add_edges_from([(node, from_), (node, to_)])
 
     def _get_field_with_memo(self, field_name: str, by_name: bool = False):
-        if field_name not in self._field_memo:
+        if (field_name, by_name) not in self._field_memo:
             if by_name:
                 field = self.project.get_field_by_name(field_name)
             else:
                 field = self.project.get_field(field_name)
-            self._field_memo[field_name] = field
+            self._field_memo[(field_name, by_name)] = field
         else:
-            field = self._field_memo[field_name]
+            field = self._field_memo[(field_name, by_name)]
         return field
 
     def _identifier_map(self):
@@ -301,10 +404,10 @@ class JoinGraph(SQLReplacement):
         for view in self.project.views():
             for identifier in view.identifiers:
                 if identifier["type"] == IdentifierTypes.join:
-                    join_identifier = deepcopy(identifier)
-                    join_identifier["relationship"] = self._invert_relationship(
-                        join_identifier["relationship"]
-                    )
+                    join_identifier = {
+                        **identifier,
+                        "relationship": self._invert_relationship(identifier["relationship"]),
+                    }
                     # We need to invert the join here because this is the inverse
                     # direction of how the join was defined
                     result[view.name][identifier["reference"]] = self._verify_identifier_join(identifier)
@@ -340,12 +443,14 @@ class JoinGraph(SQLReplacement):
         return clause
 
     def _verify_identifier_join(self, join: dict):
-        clean_join = deepcopy(join)
-        clean_join["type"] = join.get("type", "left_outer")
-        clean_join["relationship"] = join.get("relationship", "many_to_one")
-        clean_join["sql_on"] = join["sql_on"]
-        clean_join["weight"] = self._edge_weight(clean_join["relationship"])
-        return clean_join
+        relationship = join.get("relationship", "many_to_one")
+        return {
+            **join,
+            "type": join.get("type", "left_outer"),
+            "relationship": relationship,
+            "sql_on": join["sql_on"],
+            "weight": self._edge_weight(relationship),
+        }
 
     @staticmethod
     def _derive_relationship(identifier, join_identifier):
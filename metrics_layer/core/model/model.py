@@ -1,4 +1,3 @@
-from copy import deepcopy
 from collections import Counter
 
 from .base import MetricsLayerBase
@@ -35,6 +34,14 @@ class Model(MetricsLayerBase):
         self.validate(definition)
         super().__init__(definition)
 
+    def __hash__(self) -> int:
+        return hash((hash(self.project), self.name))
+
+    def __eq__(self, other):
+        if not isinstance(other, Model):
+            return False
+        return self.name == other.name and self.project is other.project
+
     def validate(self, definition: dict):
         required_keys = ["name", "connection"]
         for k in required_keys:
@@ -47,7 +54,7 @@ class Model(MetricsLayerBase):
 
     @property
     def mappings(self):
-        mappings = deepcopy(self._definition.get("mappings", {}))
+        mappings = {**self._definition.get("mappings", {})}
 
         for date_mapping in self.special_mapping_values:
             if date_mapping in mappings:
@@ -1,7 +1,6 @@
-import functools
+import hashlib
 import json
-from collections import Counter
-from copy import deepcopy
+from collections import Counter, OrderedDict, defaultdict
 
 from metrics_layer.core.exceptions import AccessDeniedOrDoesNotExistException, QueryError
 from .dashboard import Dashboard
@@ -10,6 +9,9 @@ from .field import Field
 from .model import AccessGrant, Model
 from .view import View
 
+# How many distinct access scopes keep their access decisions, views and fields cached at once
+ACCESS_SCOPE_CACHE_SIZE = 128
+
 
 class Project:
     """
@@ -33,39 +35,108 @@ class Project:
         self.manifest = manifest
         self.manifest_exists = manifest and manifest.exists()
         self._user = None
+        self._user_digest = None
+        self._access_scope = None
+        # Access scope -> grant name -> whether the scope is granted it, least recently used first
+        self._access_decisions = OrderedDict()
+        self._access_grant_index = None
+        self._access_grant_attributes = []
+        self._content_digest = None
+        self._identity_key = None
+        self._identity_hash = None
         self._connection_schema = None
         self._timezone = None
         self._join_graph = None
+        self._join_digest = None
+        self._view_registry = {}
+        self._field_indexes = {}
+        # Set when the project is built by a ProjectRegistry, which shares join graphs between projects
+        self.registry = None
+        # The cache belongs to the project, so it doesn't keep every project that was ever built alive
+        self._fields_cache = {}
 
     def __repr__(self):
         text = "models" if len(self._models) != 1 else "model"
         return f"<Project {len(self._models)} {text} user={self._user}>"
 
     def __hash__(self):
-        user_str = "" if not self._user else json.dumps(self._user, sort_keys=True)
-        return self._content_hash + hash(user_str)
+        if self._identity_hash is None:
+            self._identity_hash = hash(self.identity_key)
+        return self._identity_hash
 
-    def refresh_cache(self):
-        # Clear LRU Caches
-        self.fields.cache_clear()
-        self.get_field.cache_clear()
-        self.get_field_by_name.cache_clear()
-        self.get_field_by_tag.cache_clear()
+    @property
+    def identity_key(self):
+        # The identity key only changes when the project content or the user changes
+        if self._identity_key is None:
+            # Queries can use any user attribute (access filters), so the whole user is part of the key
+            if self._user_digest is None:
+                self._user_digest = "" if not self._user else self._digest(self._user)
+            self._identity_key = (self.content_digest, self._user_digest)
+        return self._identity_key
+
+    @property
+    def content_digest(self):
+        if self._content_digest is None:
+            content = [self._models, self._views, self._dashboards, self.connection_lookup, self.looker_env]
+            self._content_digest = self._digest(content)
+        return self._content_digest
+
+    @property
+    def join_digest(self):
+        # The join graph depends only on the models, how the views join and which views the user can see
+        if self._join_digest is None:
+            join_keys = ["name", "model_name", "identifiers", "required_access_grants", "row_count"]
+            views = [{k: v.get(k) for k in join_keys} for v in self._views]
+            self._join_digest = self._digest([self._models, views])
+        return self._digest([self._join_digest, self._access_scope])
+
+    def _record_mutation(self, *change):
+        # Roll the change into the content digest instead of serializing the whole project again
+        self._content_digest = self._digest([self.content_digest, *change])
+        self._identity_key, self._identity_hash = None, None
 
+    @staticmethod
+    def _digest(value):
+        value_str = json.dumps(value, sort_keys=True, default=str)
+        return hashlib.md5(value_str.encode("utf-8")).hexdigest()
+
+    def refresh_cache(self):
         # Clear physical caches
+        self._fields_cache = {}
         self._join_graph = None
-
-    @functools.cached_property
-    def _content_hash(self):
-        model_str = json.dumps(self._models, sort_keys=True)
-        view_str = json.dumps(self._views, sort_keys=True)
-        dash_str = json.dumps(self._dashboards, sort_keys=True)
-        conn_str = json.dumps(self.connection_lookup, sort_keys=True)
-        string_to_hash = model_str + view_str + dash_str + conn_str + str(self.looker_env)
-        return hash(string_to_hash)
+        self._join_digest = None
+        self._view_registry = {}
+        self._field_indexes = {}
+        self._access_decisions = OrderedDict()
+        self._access_grant_index = None
+
+    def inherit_caches(self, previous, changes: set):
+        # Keep the caches of the previous version of the project that the changes can't have touched.
+        # The changes are "models", "dashboards", "identifiers" (how views join) and "fields" (the rest)
+        if "models" in changes or "identifiers" in changes or previous._join_graph is None:
+            return
+        # The views and field indexes are always rebuilt, because the views point back to their project
+        # and read its user, timezone and other settings from it
+        self._join_graph = previous._join_graph.copy_for(self, keep_merged_results="fields" not in changes)
 
     def set_user(self, user: dict):
         self._user = user
+        self._user_digest = None
+        self._access_scope = self._access_scope_for(user)
+        self._identity_key, self._identity_hash = None, None
+
+    def _access_scope_for(self, user: dict):
+        # Users with the same values for the attributes access grants check can see exactly the same
+        # views and fields, so they share one access scope and everything cached for it
+        if user is None:
+            return None
+        self._access_grants_by_name()
+        scope = tuple(user.get(attribute) for attribute in self._access_grant_attributes)
+        try:
+            hash(scope)
+        except TypeError:
+            scope = self._digest(scope)
+        return scope
 
     def set_connection_schema(self, schema: str):
         self._connection_schema = schema
@@ -83,7 +154,12 @@ class Project:
             )
         # If the field already exists, then do not add it
         if not any(f["name"].lower() == field["name"].lower() for f in view["fields"]):
-            view["fields"].append(field)
+            # The fields list can be shared with other views and projects, so replace it instead of appending
+            view["fields"] = [*view["fields"], field]
+        self._record_mutation("add_field", view_name, field)
+        # The views and field indexes always have to be rebuilt, even when the rest of the cache is kept
+        self._view_registry = {}
+        self._field_indexes = {}
         if refresh_cache:
             self.refresh_cache()
 
@@ -91,7 +167,11 @@ class Project:
         view = next((v for v in self._views if v["name"] == view_name), None)
         if view is None:
             raise AccessDeniedOrDoesNotExistException(f"Could not find a view matching the name {view_name}")
-        view["fields"] = [f for f in view["fields"] if f["name"] != field_name]
+        # Field names are only lowercased on the Field, the definition keeps the name as written
+        view["fields"] = [f for f in view["fields"] if f["name"].lower() != field_name.lower()]
+        self._record_mutation("remove_field", view_name, field_name)
+        self._view_registry = {}
+        self._field_indexes = {}
         if refresh_cache:
             self.refresh_cache()
 
@@ -107,14 +187,19 @@ class Project:
     @property
     def join_graph(self):
         if self._join_graph is None:
-            graph = JoinGraph(self)
-            graph.build()
-            self._join_graph = graph
+            if self.registry is not None:
+                self._join_graph = self.registry.join_graph(self)
+            else:
+                graph = JoinGraph(self)
+                graph.build()
+                self._join_graph = graph
         return self._join_graph
 
     def _handle_join_as_duplication(self, views: list):
         join_as_to_create = {}
-        copied_views = deepcopy(views)
+        # Only the top level of each view is copied. Nothing below it is ever changed in place,
+        # so the field and identifier definitions are shared instead of copied
+        copied_views = [{**v} for v in views]
         for v in copied_views:
             for identifier in v.get("identifiers", []):
                 if "join_as" in identifier and identifier["type"] == "primary":
@@ -237,11 +322,20 @@ class Project:
     def access_grants(self):
         return [AccessGrant(g) for m in self.models() for g in m.access_grants]
 
+    def _access_grants_by_name(self):
+        if self._access_grant_index is None:
+            access_grant_index = {}
+            for grant in self.access_grants():
+                access_grant_index.setdefault(grant.name, grant)
+            self._access_grant_index = access_grant_index
+            self._access_grant_attributes = sorted({g.user_attribute for g in access_grant_index.values()})
+        return self._access_grant_index
+
     def get_access_grant(self, grant_name: str):
-        try:
-            return next((ag for ag in self.access_grants() if ag.name == grant_name))
-        except StopIteration:
+        grant = self._access_grants_by_name().get(grant_name)
+        if grant is None:
             raise QueryError(f"Could not find the access grant {grant_name} in your project.")
+        return grant
 
     def can_access_dashboard(self, dashboard: Dashboard):
         return self._can_access_object(dashboard)
@@ -256,21 +350,38 @@ class Project:
     def _can_access_object(self, obj):
         if self._user is not None:
             if obj.required_access_grants:
-                decisions = []
+                decisions = self._scope_access_decisions()
                 for grant_name in obj.required_access_grants:
-                    grant = self.get_access_grant(grant_name)
-                    user_attribute_value = self._user.get(grant.user_attribute)
-
-                    if user_attribute_value is None:
-                        decision = True
-                    else:
-                        decision = user_attribute_value in grant.allowed_values
-                    decisions.append(decision)
-
+                    if grant_name not in decisions:
+                        # Raises the error for a grant that doesn't exist
+                        self.get_access_grant(grant_name)
                 # We use all here because the condition between access conditions is AND
-                return all(decisions)
+                return all(decisions[grant_name] for grant_name in obj.required_access_grants)
         return True
 
+    def _scope_access_decisions(self):
+        scope = self._access_scope
+        if scope in self._access_decisions:
+            self._access_decisions.move_to_end(scope)
+            return self._access_decisions[scope]
+
+        decisions = {}
+        for grant_name, grant in self._access_grants_by_name().items():
+            user_attribute_value = self._user.get(grant.user_attribute)
+            if user_attribute_value is None:
+                decisions[grant_name] = True
+            else:
+                decisions[grant_name] = user_attribute_value in grant.allowed_values
+        self._access_decisions[scope] = decisions
+
+        if len(self._access_decisions) > ACCESS_SCOPE_CACHE_SIZE:
+            evicted, _ = self._access_decisions.popitem(last=False)
+            # The views and fields of the evicted scope go with it, so many users don't grow the caches
+            self._view_registry = {k: v for k, v in self._view_registry.items() if k[1] != evicted}
+            self._field_indexes = {k: v for k, v in self._field_indexes.items() if k[1] != evicted}
+            self._fields_cache = {k: v for k, v in self._fields_cache.items() if k[1] != evicted}
+        return decisions
+
     def _all_views(self, model):
         views = []
         for v in self._views:
@@ -279,18 +390,30 @@ class Project:
                 views.append(view)
         return views
 
+    def _registered_views(self, model: Model = None):
+        # Views (and the fields they hold) are built once per model and user access scope
+        registry_key = (model.name if model else None, self._access_scope)
+        if registry_key not in self._view_registry:
+            views = self._all_views(model)
+            views_by_name = {}
+            for view in views:
+                views_by_name.setdefault(view.name, view)
+            self._view_registry[registry_key] = (views, views_by_name)
+        return self._view_registry[registry_key]
+
     def views(self, model: Model = None) -> list:
-        return self._all_views(model)
+        views, _ = self._registered_views(model)
+        return list(views)
 
     def get_view(self, view_name: str, model: Model = None) -> View:
-        try:
-            return next((v for v in self.views(model=model) if v.name == view_name))
-        except StopIteration:
+        _, views_by_name = self._registered_views(model)
+        if view_name not in views_by_name:
             raise AccessDeniedOrDoesNotExistException(
                 f"Could not find or you do not have access to view {view_name}",
                 object_name=view_name,
                 object_type="view",
             )
+        return views_by_name[view_name]
 
     def sets(self, view_name: str = None):
         if view_name:
@@ -313,7 +436,6 @@ class Project:
             sets = self.sets()
         return next((s for s in sets if s.name == set_name), None)
 
-    @functools.lru_cache(maxsize=None)
     def fields(
         self,
         view_name: str = None,
@@ -321,10 +443,22 @@ class Project:
         expand_dimension_groups: bool = False,
         model: Model = None,
     ) -> list:
-        if view_name is None:
-            return self._all_fields(show_hidden, expand_dimension_groups, model)
-        else:
-            return self._view_fields(view_name, show_hidden, expand_dimension_groups, model)
+        # Keyed by the model name, because a model hashes with the project and so with the whole user
+        key = (
+            self.content_digest,
+            self._access_scope,
+            view_name,
+            show_hidden,
+            expand_dimension_groups,
+            model.name if model else None,
+        )
+        if key not in self._fields_cache:
+            if view_name is None:
+                fields = self._all_fields(show_hidden, expand_dimension_groups, model)
+            else:
+                fields = self._view_fields(view_name, show_hidden, expand_dimension_groups, model)
+            self._fields_cache[key] = fields
+        return self._fields_cache[key]
 
     def _all_fields(self, show_hidden: bool, expand_dimension_groups: bool, model: Model):
         return [f for v in self.views(model=model) for f in v.fields(show_hidden, expand_dimension_groups)]
@@ -347,16 +481,26 @@ class Project:
         for field in field_list:
             join_graph_options.update(field.join_graphs())
 
-        all_fields = self.fields(expand_dimension_groups=expand_dimension_groups)
-        field_options = [f for f in all_fields if any(j in join_graph_options for j in f.join_graphs())]
+        if not join_graph_options:
+            return []
+
+        # The join graphs of all the fields are looked up at once, and compared with one set operation each
+        field_join_graphs = self.join_graph.field_join_graphs(field_list[0].view.model)
+        field_options = []
+        for field in self.fields(expand_dimension_groups=expand_dimension_groups):
+            join_graphs = field_join_graphs.get(field.id())
+            if join_graphs is None:
+                join_graphs = field.join_graphs()
+            if not join_graph_options.isdisjoint(join_graphs):
+                field_options.append(field)
         return field_options
 
-    @functools.lru_cache(maxsize=None)
     def get_field(self, field_name: str, view_name: str = None, model: Model = None) -> Field:
         field_name, view_name = self._parse_field_and_view_name(field_name, view_name)
 
-        fields = self.fields(view_name=view_name, expand_dimension_groups=True, model=model)
-        matching_fields = [f for f in fields if f.equal(field_name)]
+        index = self._field_index(model)
+        self._verify_view_in_index(index, view_name, model)
+        matching_fields = index["aliases"].get((view_name, field_name), [])
         return self._matching_field_handler(matching_fields, field_name, view_name)
 
     def get_mapped_field(self, field_name: str, model: Model = None):
@@ -366,24 +510,60 @@ class Project:
                 return {"name": field_name.lower(), **field_data}
         return None
 
-    @functools.lru_cache(maxsize=None)
     def get_field_by_name(self, field_name: str, view_name: str = None, model: Model = None):
         field_name, view_name = self._parse_field_and_view_name(field_name, view_name)
-        fields = self.fields(view_name=view_name, expand_dimension_groups=False, model=model)
-        matching_fields = [f for f in fields if f.name == field_name]
+
+        index = self._field_index(model)
+        self._verify_view_in_index(index, view_name, model)
+        matching_fields = index["names"].get((view_name, field_name), [])
         return self._matching_field_handler(matching_fields, field_name, view_name)
 
-    @functools.lru_cache(maxsize=None)
     def get_field_by_tag(
         self, tag_name: str, view_name: str = None, join_graphs: tuple = None, model: Model = None
     ):
         tag_options = {tag_name, f"{tag_name}s"} if tag_name[-1] != "s" else {tag_name, tag_name[:-1]}
-        fields = self.fields(view_name=view_name, expand_dimension_groups=True, model=model)
-        matching_fields = [f for f in fields if f.tags and any(t in tag_options for t in f.tags)]
+
+        index = self._field_index(model)
+        self._verify_view_in_index(index, view_name, model)
+        # Keep the fields in project order, and only include a field once even if it has both tags
+        tagged_fields = {}
+        for tag in tag_options:
+            for position, field in index["tags"].get(tag, []):
+                if view_name is None or field.view.name == view_name:
+                    tagged_fields[position] = field
+        matching_fields = [tagged_fields[position] for position in sorted(tagged_fields)]
         if join_graphs:
             matching_fields = [f for f in matching_fields if any(j in f.join_graphs() for j in join_graphs)]
         return self._matching_field_handler(matching_fields, tag_name, view_name)
 
+    def _field_index(self, model: Model = None):
+        # Indexes are built once per model and user access scope, and dropped when the fields change
+        index_key = (model.name if model else None, self._access_scope)
+        if index_key not in self._field_indexes:
+            self._field_indexes[index_key] = self._build_field_index(model)
+        return self._field_indexes[index_key]
+
+    def _build_field_index(self, model: Model = None):
+        aliases, names, tags = defaultdict(list), defaultdict(list), defaultdict(list)
+        for position, field in enumerate(self.fields(expand_dimension_groups=True, model=model)):
+            alias = field.alias()
+            aliases[(None, alias)].append(field)
+            aliases[(field.view.name, alias)].append(field)
+            for tag in field.tags or []:
+                tags[tag].append((position, field))
+
+        for field in self.fields(expand_dimension_groups=False, model=model):
+            names[(None, field.name)].append(field)
+            names[(field.view.name, field.name)].append(field)
+
+        view_names = {v.name for v in self.views(model=model)}
+        return {"views": view_names, "aliases": dict(aliases), "names": dict(names), "tags": dict(tags)}
+
+    def _verify_view_in_index(self, index: dict, view_name: str, model: Model = None):
+        # This raises the same access error as looking up a view that does not exist
+        if view_name is not None and view_name not in index["views"]:
+            self.get_view(view_name, model=model)
+
     def does_field_exist(self, field_name: str, view_name: str = None, model: Model = None):
         try:
             self.get_field(field_name, view_name, model)
@@ -0,0 +1,80 @@
+import threading
+import weakref
+from collections import Counter
+
+from .join_graph import JoinGraph
+from .project import Project
+
+
+class ProjectRegistry:
+    """
+    Shares identical definitions and join graphs between the projects of many branches
+    """
+
+    def __init__(self) -> None:
+        # Content digest -> the one copy of a definition every project with that content uses
+        self._definitions = {}
+        # Join digest -> join graph without a project, for projects whose views join the same way
+        self._join_graphs = {}
+        self._references = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def definition_count(self):
+        return len(self._definitions)
+
+    def build_project(self, models: list, views: list, dashboards: list = [], **kwargs):
+        with self._lock:
+            digests = Counter()
+            models = [self._intern(m, Project._digest(m), digests) for m in models]
+            views = [self._intern_view(v, digests) for v in views]
+            dashboards = [self._intern(d, Project._digest(d), digests) for d in dashboards]
+
+        project = Project(models=models, views=views, dashboards=dashboards, **kwargs)
+        project.registry = self
+        # Definitions no project uses anymore are dropped, so memory follows the branches still loaded
+        weakref.finalize(project, self._release, digests)
+        return project
+
+    def join_graph(self, project: Project):
+        join_digest = project.join_digest
+        with self._lock:
+            shared = self._join_graphs.get(join_digest)
+        if shared is None:
+            graph = JoinGraph(project)
+            graph.graph
+            with self._lock:
+                shared = self._join_graphs.setdefault(join_digest, graph.copy_for(None))
+        with self._lock:
+            self._references[join_digest] += 1
+        weakref.finalize(project, self._release, Counter([join_digest]))
+        # The merged results graph depends on the fields too, so every project builds its own
+        return shared.copy_for(project, keep_merged_results=False)
+
+    def _intern_view(self, view: dict, digests: Counter):
+        # Views are interned field by field, so a view with one changed field shares the rest
+        if "fields" not in view:
+            return self._intern(view, Project._digest(view), digests)
+        fields, field_digests = [], []
+        for field in view["fields"]:
+            field_digest = Project._digest(field)
+            fields.append(self._intern(field, field_digest, digests))
+            field_digests.append(field_digest)
+        # The fields are already digested, so the view is digested with theirs instead of again in full
+        view_digest = Project._digest({**view, "fields": field_digests})
+        return self._intern({**view, "fields": fields}, view_digest, digests)
+
+    def _intern(self, definition: dict, digest: str, digests: Counter):
+        definition = self._definitions.setdefault(digest, definition)
+        self._references[digest] += 1
+        digests[digest] += 1
+        return definition
+
+    def _release(self, digests: Counter):
+        with self._lock:
+            for digest, count in digests.items():
+                self._references[digest] -= count
+                if self._references[digest] <= 0:
+                    del self._references[digest]
+                    self._definitions.pop(digest, None)
+                    self._join_graphs.pop(digest, None)
@@ -8,10 +8,12 @@ from .set import Set
 
 
 class View(MetricsLayerBase):
+    __slots__ = ("project", "__all_fields")
+
     def __init__(self, definition: dict = {}, project=None) -> None:
         if "sets" not in definition:
             definition["sets"] = []
-        self.__all_fields = None
+        self.__all_fields = {}
         self.project = project
         self.validate(definition)
         super().__init__(definition)
@@ -101,6 +103,12 @@ class View(MetricsLayerBase):
             )
             field_errors += [primary_key_error]
 
+        if self.row_count is not None and (not isinstance(self.row_count, int) or self.row_count < 0):
+            field_errors.append(
+                f"The view {self.name} has a row_count of {self.row_count}, "
+                "the row_count must be a whole number of rows that is not negative"
+            )
+
         if self.access_filters is not None and isinstance(self.access_filters, dict):
             access_filter_error = (
                 f"The view {self.name} has an access filter that is incorrectly specified as a "
@@ -132,9 +140,10 @@ class View(MetricsLayerBase):
         return result
 
     def fields(self, show_hidden: bool = True, expand_dimension_groups: bool = False) -> list:
-        if not self.__all_fields:
-            self.__all_fields = self._all_fields(expand_dimension_groups=expand_dimension_groups)
-        all_fields = self.__all_fields
+        if expand_dimension_groups not in self.__all_fields:
+            all_fields = self._all_fields(expand_dimension_groups=expand_dimension_groups)
+            self.__all_fields[expand_dimension_groups] = all_fields
+        all_fields = self.__all_fields[expand_dimension_groups]
         if show_hidden:
             return all_fields
         return [field for field in all_fields if field.hidden == "no" or not field.hidden]
@@ -142,18 +151,22 @@ class View(MetricsLayerBase):
     def _all_fields(self, expand_dimension_groups: bool):
         fields = []
         for f in self._definition.get("fields", []):
-            f["label_prefix"] = self.field_prefix
-            field = Field(f, view=self)
+            # Field definitions can be shared with other views, so only copy them to set a different prefix
+            definition = f
+            if f.get("label_prefix") != self.field_prefix:
+                definition = {**f, "label_prefix": self.field_prefix}
+            field = Field(definition, view=self)
             if self.project.can_access_field(field):
                 if expand_dimension_groups and field.field_type == "dimension_group":
                     if field.timeframes:
                         for timeframe in field.timeframes:
                             additional = {"hidden": "yes"} if timeframe == "raw" else {}
-                            fields.append(Field({**f, **additional, "dimension_group": timeframe}, view=self))
+                            expanded = {**definition, **additional, "dimension_group": timeframe}
+                            fields.append(Field(expanded, view=self))
 
                     elif field.intervals:
                         for interval in field.intervals:
-                            fields.append(Field({**f, "dimension_group": f"{interval}s"}, view=self))
+                            fields.append(Field({**definition, "dimension_group": f"{interval}s"}, view=self))
                 else:
                     fields.append(field)
         return fields
@@ -4,3 +4,5 @@ from .github_repo import *  # noqa
 from .project_dumper import *  # noqa
 from .project_reader_metricflow import *  # noqa
 from .project_reader_metrics_layer import *  # noqa
+from .project_snapshot import *  # noqa
+from .project_watcher import *  # noqa
@@ -26,6 +26,11 @@ class BaseConnection:
     def __repr__(self):
         return f"<{self.__class__.__name__} name={self.name}>"
 
+    def identity(self):
+        if callable(getattr(self, "to_dict", None)):
+            return self.to_dict()
+        return {"name": self.name, "type": self.type}
+
 
 class SnowflakeConnection(BaseConnection):
     def __init__(
@@ -210,12 +215,13 @@ class PostgresConnection(RedshiftConnection):
 
 
 class DuckDBConnection(RedshiftConnection):
+    # A local database file (or in memory database) doesn't need a host or credentials
     def __init__(
         self,
         name: str,
-        host: str,
-        user: str,
-        password: str,
+        host: str = None,
+        user: str = None,
+        password: str = None,
         port: int = 5432,
         database: str = None,
         schema: str = None,
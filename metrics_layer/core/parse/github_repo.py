@@ -1,10 +1,8 @@
+import hashlib
 import os
 import shutil
 from glob import glob
 import pathlib
-import yaml
-
-import git
 
 from metrics_layer.core import utils
 
@@ -37,6 +35,20 @@ class BaseRepo:
     def fetch(self):
         raise NotImplementedError()
 
+    def snapshot_key(self):
+        return self.folder
+
+    def commit(self, private_key: str = None):
+        # The commit the project would be loaded from, None if it can't be known without reading files
+        return None
+
+    def file_fingerprints(self, file_names: list):
+        fingerprints = {}
+        for fn in file_names:
+            stat = os.stat(fn)
+            fingerprints[fn] = f"{stat.st_mtime_ns}:{stat.st_size}"
+        return fingerprints
+
     def get_dbt_path(self):
         pattern = "dbt_project.yml"
         in_root = list(glob(f"{self.folder}/{pattern}"))
@@ -49,6 +61,8 @@ class BaseRepo:
 
     @staticmethod
     def read_yaml_file(path: str):
+        import yaml
+
         with open(path, "r") as f:
             yaml_dict = yaml.safe_load(f)
         return yaml_dict
@@ -77,9 +91,14 @@ class LocalRepo(BaseRepo):
     def delete(self):
         pass
 
+    def snapshot_key(self):
+        return os.path.abspath(self.folder)
+
 
 class GithubRepo(BaseRepo):
-    def __init__(self, repo_url: str, branch: str, repo_type: str = None, private_key=None) -> None:
+    def __init__(
+        self, repo_url: str, branch: str, repo_type: str = None, private_key=None, mirror_dir: str = None
+    ) -> None:
         self.repo_url = repo_url
         self.is_ssh = repo_url.startswith("git@")
         self.repo_type = repo_type
@@ -89,18 +108,68 @@ class GithubRepo(BaseRepo):
         self.dbt_path = None
         self.branch = branch
         self.branch_options = []
+        # With a mirror directory, a bare mirror of the repo is kept there and updated with a fetch
+        self.mirror_dir = mirror_dir
 
     def fetch(self, private_key: str = None):
         self.git_repo, branch_options, self._file_path = self.fetch_github_repo(private_key)
         self.dbt_path = self.get_dbt_path()
         self.branch_options = branch_options
 
+    def snapshot_key(self):
+        return f"{self.repo_url}@{self.branch}"
+
+    def commit(self, private_key: str = None):
+        if getattr(self, "git_repo", None) is not None:
+            return self.git_repo.head.commit.hexsha
+        return self.remote_commit(private_key)
+
+    def remote_commit(self, private_key: str = None):
+        import git
+
+        # Asking the remote for the head of the branch is much cheaper than cloning it
+        git_env, file_path = {}, None
+        if self.is_ssh:
+            if private_key is None:
+                return None
+            file_path = self._write_private_key(private_key)
+            git_env = self._private_key_git_ssh_env(file_path)
+        try:
+            git_cmd = git.cmd.Git()
+            with git_cmd.custom_environment(**git_env):
+                raw = git_cmd.ls_remote(self.repo_url, f"refs/heads/{self.branch}")
+        except git.GitCommandError as e:
+            print(f"Exception getting the remote commit: {e}")
+            return None
+        finally:
+            if file_path:
+                os.remove(file_path)
+        return raw.split()[0] if raw else None
+
+    def file_fingerprints(self, file_names: list):
+        # A fresh clone has new mtimes on every file, so use the git blob hashes instead
+        blob_hashes = {}
+        for line in self.git_repo.git.ls_files("-s").split("\n"):
+            if "\t" in line:
+                info, path = line.split("\t", 1)
+                full_path = os.path.normpath(os.path.join(self.git_repo.working_tree_dir, path))
+                blob_hashes[full_path] = info.split()[1]
+
+        untracked = [fn for fn in file_names if os.path.normpath(fn) not in blob_hashes]
+        fingerprints = super().file_fingerprints(untracked)
+        for fn in file_names:
+            if os.path.normpath(fn) in blob_hashes:
+                fingerprints[fn] = blob_hashes[os.path.normpath(fn)]
+        return fingerprints
+
     def delete(self, folder: str = None):
         if folder is None:
             folder = self.folder
 
         if os.path.exists(folder) and os.path.isdir(folder):
             shutil.rmtree(folder)
+        if folder == self.folder:
+            self.git_repo = None
 
     def create_branch(self, branch_name: str, private_key: str = None):
         self._ssh_wrapped(self.__create_branch, branch_name=branch_name, private_key=private_key)
@@ -168,7 +237,13 @@ class GithubRepo(BaseRepo):
         else:
             func(**kwargs)
 
+    def mirror_path(self):
+        mirror_name = hashlib.md5(self.repo_url.encode("utf-8")).hexdigest()
+        return os.path.join(self.mirror_dir, f"{mirror_name}.git")
+
     def fetch_github_repo(self, private_key: str):
+        if self.mirror_dir:
+            return self._fetch_github_repo_mirror(private_key)
         if self.is_ssh:
             if private_key is None:
                 raise ValueError("Private key is required for SSH mode of connection to Github.")
@@ -184,6 +259,8 @@ class GithubRepo(BaseRepo):
 
     @staticmethod
     def _fetch_github_repo_https(repo_url: str, repo_destination: str, branch: str):
+        import git
+
         if os.path.exists(repo_destination) and os.path.isdir(repo_destination):
             shutil.rmtree(repo_destination)
         repo = git.Repo.clone_from(repo_url, to_path=repo_destination, branch=branch)
@@ -192,6 +269,8 @@ class GithubRepo(BaseRepo):
 
     @staticmethod
     def _fetch_github_repo_ssh(repo_url: str, repo_destination: str, branch: str, private_key: str):
+        import git
+
         file_path = GithubRepo._write_private_key(private_key)
         git_env = GithubRepo._private_key_git_ssh_env(file_path)
 
@@ -208,6 +287,94 @@ class GithubRepo(BaseRepo):
 
         return repo, branch_options, file_path
 
+    def _fetch_github_repo_mirror(self, private_key: str):
+        git_env, file_path = {}, None
+        if self.is_ssh:
+            if private_key is None:
+                raise ValueError("Private key is required for SSH mode of connection to Github.")
+            file_path = self._write_private_key(private_key)
+            git_env = self._private_key_git_ssh_env(file_path)
+
+        try:
+            mirror = self._update_mirror(git_env)
+            repo = self._checkout_from_mirror(mirror)
+            branch_options = self._parse_ls_remote(mirror.git.ls_remote("--heads", mirror.git_dir))
+        finally:
+            if file_path:
+                os.remove(file_path)
+        return repo, branch_options, file_path
+
+    def _update_mirror(self, git_env: dict):
+        import git
+
+        mirror_path = self.mirror_path()
+        if os.path.isdir(mirror_path):
+            mirror = git.Repo(mirror_path)
+            with mirror.git.custom_environment(**git_env):
+                mirror.git.fetch("--prune", "origin")
+            return mirror
+
+        # Clone next to the final path and move it into place, so a failed clone is never reused
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        temp_path = f"{mirror_path}.{utils.generate_uuid()}.tmp"
+        try:
+            mirror = git.Repo.clone_from(self.repo_url, to_path=temp_path, bare=True, env=git_env)
+            mirror.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+            os.rename(temp_path, mirror_path)
+        except OSError:
+            # Another process created the mirror first
+            if not os.path.isdir(mirror_path):
+                raise
+        finally:
+            if os.path.exists(temp_path):
+                shutil.rmtree(temp_path)
+        return git.Repo(mirror_path)
+
+    def _checkout_from_mirror(self, mirror):
+        import git
+
+        if os.path.exists(self.repo_destination) and os.path.isdir(self.repo_destination):
+            shutil.rmtree(self.repo_destination)
+
+        # The checkout borrows the mirror's objects instead of copying them, and only the
+        # project's folders are written out when zenlytic_project.yml lists them
+        repo = git.Repo.clone_from(
+            mirror.git_dir, to_path=self.repo_destination, branch=self.branch, shared=True, no_checkout=True
+        )
+        repo.git.remote("set-url", "origin", self.repo_url)
+        sparse_folders = self._sparse_folders(mirror)
+        if sparse_folders:
+            repo.git.sparse_checkout("init", "--cone")
+            repo.git.sparse_checkout("set", *sparse_folders)
+        repo.git.checkout(self.branch)
+        return repo
+
+    def _sparse_folders(self, mirror):
+        import git
+        import yaml
+
+        zenlytic_project = None
+        for file_name in ["zenlytic_project.yml", "zenlytic_project.yaml"]:
+            try:
+                zenlytic_project = yaml.safe_load(mirror.git.show(f"{self.branch}:{file_name}"))
+                break
+            except git.GitCommandError:
+                continue
+        if not isinstance(zenlytic_project, dict):
+            return None
+        if zenlytic_project.get("mode", "metrics_layer") != "metrics_layer":
+            return None
+
+        folders = []
+        for key in ["model-paths", "view-paths", "dashboard-paths"]:
+            for path in zenlytic_project.get(key, []):
+                folder = os.path.normpath(path)
+                # Anything outside of the repo (or the repo root itself) needs the full checkout
+                if os.path.isabs(folder) or folder == "." or folder.startswith(".."):
+                    return None
+                folders.append(folder)
+        return folders
+
     @staticmethod
     def _private_key_git_ssh_env(file_path: str):
         return {"GIT_SSH_COMMAND": f"ssh -o StrictHostKeyChecking=no -i {file_path}"}
@@ -1,51 +1,68 @@
+from collections import defaultdict
+
 from metrics_layer.core.exceptions import QueryError
 
 
 class Manifest:
     def __init__(self, definition: dict):
         self._definition = definition
+        self._index = None
 
     def exists(self):
         return self._definition is not None and self._definition != {}
 
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index
+
+    def _build_index(self):
+        # The first node wins every lookup, the same as scanning the nodes in order would
+        names, models = {}, []
+        by_schema, by_alias, by_schema_alias = defaultdict(list), defaultdict(list), defaultdict(list)
+        for key, node in self._definition["nodes"].items():
+            names.setdefault(key.split(".")[-1], node)
+            if node.get("resource_type") == "model":
+                models.append(node)
+                by_schema[node["schema"]].append(node)
+                by_alias[node["alias"]].append(node)
+                by_schema_alias[(node["schema"], node["alias"])].append(node)
+        return {
+            "names": names,
+            "models": models,
+            "schemas": dict(by_schema),
+            "aliases": dict(by_alias),
+            "schema_aliases": dict(by_schema_alias),
+        }
+
     def get_model(self, model_name: str):
-        return next(
-            (
-                v
-                for v in self._definition["nodes"].values()
-                if v["resource_type"] == "model" and v["alias"] == model_name
-            ),
-            None,
-        )
+        matching = self.index["aliases"].get(model_name)
+        return matching[0] if matching else None
 
     def models(self, schema: str = None, table: str = None):
-        tables = []
-        for v in self._definition["nodes"].values():
-            is_model = v["resource_type"] == "model"
-
-            # All tables in the whole database
-            if is_model and schema is None and table is None:
-                tables.append(self._node_to_table(v))
-            # All tables in the schema with not table specified
-            elif is_model and v["schema"] == schema and table is None:
-                tables.append(self._node_to_table(v))
-            # All tables matching the given table with not schema specified
-            elif is_model and schema is None and v["alias"] == table:
-                tables.append(self._node_to_table(v))
-            # All tables matching the given table and schema specified
-            elif is_model and v["schema"] == schema and v["alias"] == table:
-                tables.append(self._node_to_table(v))
-
-        return tables
+        # All tables in the whole database
+        if schema is None and table is None:
+            nodes = self.index["models"]
+        # All tables in the schema with not table specified
+        elif table is None:
+            nodes = self.index["schemas"].get(schema, [])
+        # All tables matching the given table with not schema specified
+        elif schema is None:
+            nodes = self.index["aliases"].get(table, [])
+        # All tables matching the given table and schema specified
+        else:
+            nodes = self.index["schema_aliases"].get((schema, table), [])
+        return [self._node_to_table(v) for v in nodes]
 
     def _resolve_node(self, name: str):
-        key = next((k for k in self._definition["nodes"].keys() if name == k.split(".")[-1]), None)
-        if key is None:
+        node = self.index["names"].get(name)
+        if node is None:
             raise QueryError(
                 f"Could not find the ref {name} in the co-located dbt project."
                 " Please check the name in your dbt project."
             )
-        return self._definition["nodes"][key]
+        return node
 
     def resolve_name(self, name: str, schema_override=None):
         node = self._resolve_node(name)
@@ -1,5 +1,4 @@
 import os
-from ruamel.yaml.comments import CommentedMap, CommentedSeq
 
 from metrics_layer.core.parse.project_reader_base import ProjectReaderBase
 
@@ -29,6 +28,8 @@ class ProjectDumper(ProjectReaderBase):
             self.dump_yaml_file(self._sort_view(view), file_path)
 
     def _sort_view(self, view: dict):
+        from ruamel.yaml.comments import CommentedMap
+
         view_key_order = [
             "version",
             "type",
@@ -37,6 +38,7 @@ class ProjectDumper(ProjectReaderBase):
             "description",
             "model_name",
             "sql_table_name",
+            "row_count",
             "default_date",
             "row_label",
             "extends",
@@ -57,6 +59,8 @@ class ProjectDumper(ProjectReaderBase):
         return new_view
 
     def _sort_fields(self, fields: list):
+        from ruamel.yaml.comments import CommentedSeq
+
         sort_key = ["dimension", "dimension_group", "measure"]
         sorted_fields = sorted(
             fields, key=lambda x: (sort_key.index(x["field_type"]), -1 if "id" in x["name"] else 0)
@@ -67,6 +71,8 @@ class ProjectDumper(ProjectReaderBase):
         return result_seq
 
     def _sort_field(self, field: dict):
+        from ruamel.yaml.comments import CommentedMap
+
         field_key_order = [
             "name",
             "field_type",
@@ -98,6 +104,8 @@ class ProjectDumper(ProjectReaderBase):
         return new_field
 
     def _sort_model(self, model: dict):
+        from ruamel.yaml.comments import CommentedMap
+
         model_key_order = [
             "version",
             "type",
@@ -1,10 +1,12 @@
 import os
 
 from metrics_layer.core.model.project import Project
+from metrics_layer.core.model.project_registry import ProjectRegistry
 from metrics_layer.core.parse.connections import connection_class_lookup, BaseConnection
 
 from .github_repo import GithubRepo, LocalRepo
 from .manifest import Manifest
+from .project_snapshot import ProjectSnapshotCache
 from .project_reader_base import ProjectReaderBase
 from .project_reader_metricflow import MetricflowProjectReader
 from .project_reader_metrics_layer import MetricsLayerProjectReader
@@ -15,12 +17,28 @@ class ConfigError(Exception):
 
 
 class ProjectLoader:
-    def __init__(self, location: str, branch: str = "master", connections: list = [], **kwargs):
+    def __init__(
+        self,
+        location: str,
+        branch: str = "master",
+        connections: list = [],
+        snapshot_cache: ProjectSnapshotCache = None,
+        parse_workers: int = None,
+        mirror_dir: str = None,
+        project_registry: ProjectRegistry = None,
+        **kwargs,
+    ):
         self.kwargs = kwargs
+        self.snapshot_cache = snapshot_cache
+        self.parse_workers = parse_workers
+        self.mirror_dir = mirror_dir
+        self.project_registry = project_registry
         self.repo = self._get_repo(location, branch, kwargs)
         self._raw_connections = connections
         self._project = None
         self._user = None
+        # Relative path -> (fingerprint, parsed yaml) of the files the current project was built from
+        self._file_cache = None
 
     def load(self, private_key: str = None):
         self._connections = self.load_connections(self._raw_connections)
@@ -42,35 +60,107 @@ class ProjectLoader:
         return self.repo.branch_options
 
     def _load_project(self, private_key):
+        snapshot = self.snapshot_cache.read(self.repo) if self.snapshot_cache else None
+
+        # When the commit hasn't moved we don't need to fetch or read anything
+        snapshot_commit = snapshot["commit"] if snapshot else None
+        if snapshot_commit is not None and snapshot_commit == self.repo.commit(private_key):
+            self.repo.branch_options = snapshot["branch_options"]
+            models, views, dashboards = snapshot["models"], snapshot["views"], snapshot["dashboards"]
+            self._file_cache = snapshot["files"]
+            return self._build_project(models, views, dashboards, snapshot["manifest"])
+
         self.repo.fetch(private_key=private_key)
         repo_type = self.repo.get_repo_type()
         if repo_type == "metricflow":
             reader = MetricflowProjectReader(repo=self.repo)
+            models, views, dashboards = reader.load()
         elif repo_type == "metrics_layer":
             reader = MetricsLayerProjectReader(self.repo)
+            file_cache = None
+            if self.snapshot_cache:
+                file_cache = snapshot["files"] if snapshot else {}
+            elif isinstance(self.repo, LocalRepo):
+                # Keep the parsed files of local projects, so reload_changed only reads edited files
+                file_cache = {}
+            models, views, dashboards = reader.load(file_cache=file_cache, workers=self.parse_workers)
+            self._file_cache = reader.file_cache
         else:
             raise TypeError(f"Unknown repo type: {repo_type}, valid types are 'metrics_layer', 'metricflow'")
 
-        models, views, dashboards = reader.load()
+        if self.snapshot_cache:
+            self.snapshot_cache.write(
+                self.repo,
+                commit=self.repo.commit(private_key),
+                files=reader.file_cache if reader.file_cache else {},
+                models=models,
+                views=views,
+                dashboards=dashboards,
+                manifest=reader.manifest,
+                branch_options=self.repo.branch_options,
+            )
 
         self.repo.delete()
+        return self._build_project(models, views, dashboards, reader.manifest)
+
+    def reload_changed(self):
+        # Read only the files that changed since the last load and build a new project from them,
+        # keeping the caches the change can't affect. Returns None when nothing changed.
+        if self._project is None or self._file_cache is None or not isinstance(self.repo, LocalRepo):
+            raise ConfigError("Only a loaded, local metrics_layer project can be reloaded incrementally")
+
+        reader = MetricsLayerProjectReader(self.repo)
+        models, views, dashboards = reader.load(file_cache=self._file_cache)
+        changes = self._file_changes(self._file_cache, reader.file_cache)
+        self._file_cache = reader.file_cache
+        if not changes:
+            return None
 
+        project = self._build_project(models, views, dashboards, reader.manifest)
+        project.inherit_caches(self._project, changes)
+        self._project = project
+        return project
+
+    @staticmethod
+    def _file_changes(old_files: dict, new_files: dict):
+        changes = set()
+        for path in set(old_files) | set(new_files):
+            old_fingerprint, old = old_files.get(path, (None, {}))
+            new_fingerprint, new = new_files.get(path, (None, {}))
+            if old_fingerprint == new_fingerprint or old == new:
+                continue
+            for yaml_type in {old.get("type"), new.get("type")}:
+                if yaml_type == "view":
+                    join_keys = ["name", "identifiers", "required_access_grants", "row_count"]
+                    same_joins = all(old.get(k) == new.get(k) for k in join_keys)
+                    changes.add("fields" if same_joins else "identifiers")
+                elif yaml_type in {"model", "dashboard"}:
+                    changes.add(f"{yaml_type}s")
+        return changes
+
+    def _build_project(self, models: list, views: list, dashboards: list, manifest: dict):
+        connection_lookup = {c.name: c.type for c in self._connections}
+        if self.project_registry is not None:
+            # Branches of the same repo share whatever definitions they have in common
+            return self.project_registry.build_project(
+                models, views, dashboards, connection_lookup=connection_lookup, manifest=Manifest(manifest)
+            )
         project = Project(
             models=models,
             views=views,
             dashboards=dashboards,
-            connection_lookup={c.name: c.type for c in self._connections},
-            manifest=Manifest(reader.manifest),
+            connection_lookup=connection_lookup,
+            manifest=Manifest(manifest),
         )
         return project
 
     def _get_repo(self, location: str, branch: str, kwargs: dict):
         # Config is passed explicitly: this gets first priority
         if location is not None:
-            return self._get_repo_from_location(location, branch, kwargs)
+            return self._get_repo_from_location(location, branch, kwargs, self.mirror_dir)
 
         # Next look for environment variables
-        repo = self._get_repo_from_environment(kwargs)
+        repo = self._get_repo_from_environment(kwargs, self.mirror_dir)
         if repo:
             return repo
 
@@ -82,13 +172,13 @@ class ProjectLoader:
         )
 
     @staticmethod
-    def _get_repo_from_location(location: str, branch: str, kwargs: dict):
+    def _get_repo_from_location(location: str, branch: str, kwargs: dict, mirror_dir: str = None):
         if ProjectLoader._is_local(location):
             return LocalRepo(repo_path=location, **kwargs)
-        return GithubRepo(repo_url=location, branch=branch, **kwargs)
+        return GithubRepo(repo_url=location, branch=branch, mirror_dir=mirror_dir, **kwargs)
 
     @staticmethod
-    def _get_repo_from_environment(kwargs: dict):
+    def _get_repo_from_environment(kwargs: dict, mirror_dir: str = None):
         prefix = "METRICS_LAYER"
         location = os.getenv(f"{prefix}_LOCATION")
         branch = os.getenv(f"{prefix}_BRANCH", "master")
@@ -98,13 +188,16 @@ class ProjectLoader:
 
         if ProjectLoader._is_local(location):
             return LocalRepo(repo_path=location, repo_type=repo_type, **kwargs)
-        return GithubRepo(repo_url=location, branch=branch, repo_type=repo_type, **kwargs)
+        return GithubRepo(
+            repo_url=location, branch=branch, repo_type=repo_type, mirror_dir=mirror_dir, **kwargs
+        )
 
     @staticmethod
     def _is_local(location: str):
         is_http = "http://" in location.lower() or "https://" in location.lower()
         is_ssh = location.lower().startswith("git@")
-        return not (is_http or is_ssh)
+        is_file_url = location.lower().startswith("file://")
+        return not (is_http or is_ssh or is_file_url)
 
     @staticmethod
     def load_connections(connections: list):
@@ -1,10 +1,30 @@
 import os
+import sys
+import time
 
-import ruamel.yaml
-import yaml
+from .github_repo import BaseRepo
 
+# The yaml loader to use, when it's not set the libyaml loader is used if it's installed,
+# because it's several times faster than the pure python one
+YAML_LOADER = None
 
-from .github_repo import BaseRepo
+# Strings up to this length are interned as they're read, so the keys and common values
+# ("dimension", "string", "yes") repeated across thousands of fields are only stored once
+INTERN_MAX_LENGTH = 64
+_interning_loaders = {}
+
+
+def interning_loader(base):
+    if base not in _interning_loaders:
+
+        def construct_str(loader, node):
+            value = loader.construct_scalar(node)
+            return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+
+        loader = type(f"Interning{base.__name__}", (base,), {})
+        loader.add_constructor("tag:yaml.org,2002:str", construct_str)
+        _interning_loaders[base] = loader
+    return _interning_loaders[base]
 
 
 class ProjectReaderBase:
@@ -15,6 +35,8 @@ class ProjectReaderBase:
         self.unloaded = True
         self.has_dbt_project = False
         self.manifest = {}
+        self.file_cache = None
+        self.file_timings = {}
         self._models = []
         self._views = []
         self._dashboards = []
@@ -64,12 +86,23 @@ class ProjectReaderBase:
 
     @staticmethod
     def read_yaml_file(path: str):
+        import yaml
+
+        loader = interning_loader(YAML_LOADER or getattr(yaml, "CSafeLoader", yaml.SafeLoader))
         with open(path, "r") as f:
-            yaml_dict = yaml.safe_load(f)
+            yaml_dict = yaml.load(f, Loader=loader)
         return yaml_dict
 
+    @staticmethod
+    def timed_read_yaml_file(path: str):
+        start = time.perf_counter()
+        yaml_dict = ProjectReaderBase.read_yaml_file(path)
+        return yaml_dict, time.perf_counter() - start
+
     @staticmethod
     def dump_yaml_file(data: dict, path: str):
+        import ruamel.yaml
+
         with open(path, "w") as f:
             ruamel.yaml.dump(data, f, Dumper=ruamel.yaml.RoundTripDumper)
 
@@ -1,13 +1,14 @@
-from metricflow_to_zenlytic.metricflow_to_zenlytic import (
-    load_mf_project,
-    convert_mf_project_to_zenlytic_project,
-)
 from .project_reader_base import ProjectReaderBase
 from metrics_layer.core.exceptions import QueryError
 
 
 class MetricflowProjectReader(ProjectReaderBase):
     def load(self) -> None:
+        from metricflow_to_zenlytic.metricflow_to_zenlytic import (
+            load_mf_project,
+            convert_mf_project_to_zenlytic_project,
+        )
+
         if self.dbt_project is None:
             raise QueryError("No dbt project found")
 
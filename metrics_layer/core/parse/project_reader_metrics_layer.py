@@ -1,10 +1,12 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from .project_reader_base import ProjectReaderBase
 
 
 class MetricsLayerProjectReader(ProjectReaderBase):
-    def load(self) -> None:
+    def load(self, file_cache: dict = None, workers: int = None) -> None:
         models, views, dashboards = [], [], []
 
         model_folders = self.get_folders("model-paths")
@@ -14,8 +16,22 @@ class MetricsLayerProjectReader(ProjectReaderBase):
 
         file_names = self.search_for_yaml_files(all_folders)
 
+        # With a file cache (relative path -> (fingerprint, parsed yaml)) only changed files are read
+        cached_files = {}
+        if file_cache is not None:
+            fingerprints = self.repo.file_fingerprints(file_names)
+            for fn in file_names:
+                cached = file_cache.get(os.path.relpath(fn, self.repo.folder))
+                if cached is not None and cached[0] == fingerprints[fn]:
+                    cached_files[fn] = cached[1]
+            self.file_cache = {}
+
+        parsed_files = self.read_yaml_files([fn for fn in file_names if fn not in cached_files], workers)
+
         for fn in file_names:
-            yaml_dict = self.read_yaml_file(fn)
+            yaml_dict = cached_files[fn] if fn in cached_files else parsed_files[fn]
+            if file_cache is not None:
+                self.file_cache[os.path.relpath(fn, self.repo.folder)] = (fingerprints[fn], yaml_dict)
 
             # Handle keyerror
             if "type" not in yaml_dict and "zenlytic_project" not in fn:
@@ -34,9 +50,31 @@ class MetricsLayerProjectReader(ProjectReaderBase):
 
         return models, views, dashboards
 
+    def read_yaml_files(self, file_names: list, workers: int = None):
+        self.file_timings = {}
+        if workers is None or workers <= 1 or len(file_names) <= 1:
+            parsed_files = {}
+            for fn in file_names:
+                start = time.perf_counter()
+                parsed_files[fn] = self.read_yaml_file(fn)
+                self.file_timings[fn] = time.perf_counter() - start
+            return parsed_files
+
+        # Parsing is CPU bound, so it needs processes rather than threads to run in parallel
+        chunksize = max(1, len(file_names) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self.timed_read_yaml_file, file_names, chunksize=chunksize))
+
+        parsed_files = {}
+        for fn, (yaml_dict, seconds) in zip(file_names, results):
+            parsed_files[fn] = yaml_dict
+            self.file_timings[fn] = seconds
+        return parsed_files
+
     def search_for_yaml_files(self, folders: list):
         file_names = self.repo.search("*.yml", folders) + self.repo.search("*.yaml", folders)
-        return list(set(file_names))
+        # Sorted so the project always lists its models, views and dashboards in the same order
+        return sorted(set(file_names))
 
     def get_folders(self, key: str, default: str = None, raise_errors: bool = True):
         if not self.zenlytic_project:
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import pickle
+
+from .github_repo import BaseRepo
+
+# Bump this when the layout of the snapshot changes, so stale snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+
+class ProjectSnapshotCache:
+    def __init__(self, cache_dir: str = None) -> None:
+        if cache_dir is None:
+            default_dir = os.path.join(os.path.expanduser("~"), ".cache", "metrics_layer", "snapshots")
+            cache_dir = os.getenv("METRICS_LAYER_SNAPSHOT_DIR", default_dir)
+        self.cache_dir = cache_dir
+
+    def snapshot_path(self, repo: BaseRepo):
+        repo_key = hashlib.md5(repo.snapshot_key().encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{repo_key}.pickle")
+
+    def read(self, repo: BaseRepo):
+        try:
+            with open(self.snapshot_path(repo), "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"WARNING: ignoring unreadable project snapshot: {e}")
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def write(
+        self,
+        repo: BaseRepo,
+        commit: str,
+        files: dict,
+        models: list,
+        views: list,
+        dashboards: list,
+        manifest: dict,
+        branch_options: list,
+    ):
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "repo": repo.snapshot_key(),
+            "commit": commit,
+            # Relative path -> (fingerprint, parsed yaml) for every file that was read
+            "files": files,
+            "models": models,
+            "views": views,
+            "dashboards": dashboards,
+            "manifest": manifest,
+            "branch_options": branch_options,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.snapshot_path(repo)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def delete(self, repo: BaseRepo):
+        try:
+            os.remove(self.snapshot_path(repo))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,45 @@
+import threading
+
+
+class ProjectWatcher:
+    def __init__(self, reload, interval: float = 1.0) -> None:
+        # reload checks the project files and returns whether a new project was swapped in
+        self.reload = reload
+        self.interval = interval
+        self.reloads = 0
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics_layer_watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def poll(self):
+        try:
+            changed = self.reload()
+        except Exception as e:
+            # Files are often saved halfway through an edit, so keep the current project and try again later
+            self.last_error = e
+            print(f"WARNING: could not reload the project: {e}")
+            return False
+        self.last_error = None
+        if changed:
+            self.reloads += 1
+        return bool(changed)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
@@ -0,0 +1,116 @@
+import json
+
+from metrics_layer.core.exceptions import QueryError
+
+
+class DashboardQueryGroup:
+    def __init__(self, model_name: str, dimensions: list, where: list) -> None:
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.where = where
+        # Position of each element on the dashboard, its element and the metrics it selects
+        self.element_indexes = []
+        self.elements = []
+        self.element_metrics = []
+
+    @property
+    def metrics(self):
+        metrics = []
+        for element_metrics in self.element_metrics:
+            metrics.extend(m for m in element_metrics if m not in metrics)
+        return metrics
+
+    def request(self):
+        return {
+            "metrics": self.metrics,
+            "dimensions": self.dimensions,
+            "where": self.where,
+            "model_name": self.model_name,
+        }
+
+
+class DashboardQueryPlanner:
+    def __init__(self, dashboard, project) -> None:
+        self.dashboard = dashboard
+        self.project = project
+        # Position of each element that couldn't be planned -> its request and the error it raised
+        self.element_errors = {}
+
+    def element_request(self, element):
+        return {
+            "metrics": element.metrics,
+            "dimensions": element.slice_by,
+            "where": self.dashboard.parsed_filters(json_safe=True) + element.parsed_filters(json_safe=True),
+            "model_name": element.model,
+        }
+
+    def plan(self):
+        # Elements can share a query when the extra metrics can't change which views get joined,
+        # so they need the same model, slice by, filters and set of views behind their metrics
+        groups, self.element_errors = {}, {}
+        for i, element in enumerate(self.dashboard.elements()):
+            request = None
+            try:
+                request = self.element_request(element)
+                key = json.dumps(
+                    [
+                        request["model_name"],
+                        sorted(request["dimensions"]),
+                        sorted(json.dumps(w, sort_keys=True, default=str) for w in request["where"]),
+                        sorted(self._metric_views(request["metrics"], request["model_name"])),
+                    ]
+                )
+            except Exception as e:
+                # A broken element only fails its own result, the rest of the dashboard still runs.
+                # The filters can be what's broken, so they're left out of the request in that case
+                if request is None:
+                    request = {
+                        "metrics": element.metrics,
+                        "dimensions": element.slice_by,
+                        "model_name": element.model,
+                    }
+                self.element_errors[i] = (request, e)
+                continue
+            if key not in groups:
+                model_name, dimensions, where = request["model_name"], request["dimensions"], request["where"]
+                groups[key] = DashboardQueryGroup(model_name, dimensions, where)
+            groups[key].element_indexes.append(i)
+            groups[key].elements.append(element)
+            groups[key].element_metrics.append(request["metrics"])
+        return list(groups.values())
+
+    def split(self, group: DashboardQueryGroup, df):
+        columns = {c.lower(): c for c in df.columns}
+        results = []
+        for element, element_metrics in zip(group.elements, group.element_metrics):
+            element_columns = []
+            for field_name in element.slice_by + element_metrics:
+                alias = self._column_alias(field_name, group.model_name)
+                if alias not in columns:
+                    raise QueryError(
+                        f"Could not find the column for {field_name} in the dashboard query result"
+                    )
+                element_columns.append(columns[alias])
+
+            # The shared query is ordered by the group's first metric, so each element is put back in the
+            # order it gets on its own: its first metric descending, or with no metrics its first dimension
+            element_df = df[element_columns]
+            if element_metrics:
+                sort_column = element_columns[len(element.slice_by)]
+                element_df = element_df.sort_values(sort_column, ascending=False, kind="mergesort")
+            elif element_columns:
+                element_df = element_df.sort_values(element_columns[0], kind="mergesort")
+            results.append(element_df.reset_index(drop=True))
+        return results
+
+    def _metric_views(self, metrics: list, model_name: str):
+        views = set()
+        for metric in metrics:
+            field = self.project.get_field(metric, model=self.project.get_model(model_name))
+            referenced = field.get_referenced_sql_query(strings_only=False) or []
+            views.update(f.view.name for f in [field] + referenced)
+        return views
+
+    def _column_alias(self, field_name: str, model_name: str):
+        field = self.project.get_field(field_name, model=self.project.get_model(model_name))
+        return field.alias(with_view=True).lower()
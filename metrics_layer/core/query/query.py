@@ -1,18 +1,40 @@
-import sqlparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from metrics_layer.core.convert import MQLConverter
-from metrics_layer.core.parse import ProjectLoader
+from metrics_layer.core.model.project_registry import ProjectRegistry
+from metrics_layer.core.parse import ProjectLoader, ProjectSnapshotCache, ProjectWatcher
 from metrics_layer.core.parse.connections import BaseConnection
-from metrics_layer.core.sql import QueryRunner, SQLQueryResolver
 from metrics_layer.core.sql.query_errors import ParseError
+from metrics_layer.core.sql.result_cache import ResultCache, ResultCacheModes
 from metrics_layer.core.exceptions import QueryError
+from .dashboard_planner import DashboardQueryPlanner
+from .sql_cache import SQLCache
 
 
 class DBConnectionError(Exception):
     pass
 
 
+class QueryResult:
+    def __init__(self, request: dict) -> None:
+        self.request = request
+        self.query = None
+        self.df = None
+        self.error = None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"<QueryResult {status}>"
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
 class MetricsLayerConnection:
+    query_arguments = {"metrics", "dimensions", "funnel", "where", "having", "order_by", "sql"}
+
     def __init__(
         self,
         location: str = None,
@@ -20,12 +42,29 @@ class MetricsLayerConnection:
         project=None,
         connections: list = [],
         user: dict = None,
+        sql_cache: SQLCache = None,
+        result_cache: ResultCache = None,
+        max_workers: int = 8,
+        snapshot_cache: ProjectSnapshotCache = None,
+        parse_workers: int = None,
+        mirror_dir: str = None,
+        project_registry: ProjectRegistry = None,
         **kwargs,
     ):
         self.location, self.branch, self._raw_connections = location, branch, connections
         self.kwargs = kwargs
+        self.sql_cache = sql_cache
+        self.result_cache = result_cache
+        self.max_workers = max_workers
+        self._executor = None
+        self.snapshot_cache = snapshot_cache
+        self.parse_workers = parse_workers
+        self.mirror_dir = mirror_dir
+        self.project_registry = project_registry
         self._user = user
         self.branch_options = None
+        self._loader = None
+        self._watcher = None
         self._project = None
         if project is not None:
             self._project_passed = True
@@ -39,7 +78,15 @@ class MetricsLayerConnection:
 
     def load(self, private_key: str = None):
         if self.location is not None:
-            self._loader = ProjectLoader(self.location, self.branch, self._raw_connections)
+            self._loader = ProjectLoader(
+                self.location,
+                self.branch,
+                self._raw_connections,
+                snapshot_cache=self.snapshot_cache,
+                parse_workers=self.parse_workers,
+                mirror_dir=self.mirror_dir,
+                project_registry=self.project_registry,
+            )
             self._project = self._loader.load(private_key=private_key)
             self._project.set_user(self._user)
             self.branch_options = self._loader.get_branch_options()
@@ -52,6 +99,35 @@ class MetricsLayerConnection:
                 "(a path or a github url) or a project object."
             )
 
+    def reload_changed(self):
+        # Queries that are already running keep using the project they started with
+        if self._loader is None:
+            raise QueryError("You must call the load() method with a location before reloading the project.")
+        project = self._loader.reload_changed()
+        if project is None:
+            return False
+        # Settings made on the project at runtime aren't in the yaml, so they carry over
+        previous = self._project
+        project.set_user(self._user)
+        project.set_timezone(previous._timezone)
+        project.set_connection_schema(previous._connection_schema)
+        self._project = project
+        return True
+
+    def watch(self, interval: float = 1.0):
+        # Poll the project files in the background and swap in a new project when they change
+        if self._loader is None:
+            raise QueryError("You must call the load() method with a location before watching the project.")
+        if self._watcher is None:
+            self._watcher = ProjectWatcher(self.reload_changed, interval=interval)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
     @property
     def profiles_path(self):
         return ProjectLoader.profiles_path()
@@ -62,6 +138,15 @@ class MetricsLayerConnection:
             raise QueryError("You must call the load() method before accessing the project.")
         return self._project
 
+    @property
+    def executor(self):
+        # The async methods run the blocking compile and warehouse calls on this bounded pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="metrics_layer"
+            )
+        return self._executor
+
     def get_branch_options(self):
         if self.branch_options is None:
             raise QueryError("You must call the load() method before accessing the branch options.")
@@ -120,26 +205,31 @@ class MetricsLayerConnection:
         sql: str = None,
         **kwargs,
     ):
-        if sql:
-            converter = MQLConverter(
-                sql, project=self.project, connections=self.connections, **{**self.kwargs, **kwargs}
-            )
-            connection = converter.connection
-            query = converter.get_query()
-        else:
-            resolver = SQLQueryResolver(
+        # Read the project once, so the query matches the cache key even if the project is swapped
+        project = self.project
+        cache_key = None
+        if self.sql_cache is not None:
+            cache_key = self.sql_cache.key(
+                project,
+                self._raw_connections,
+                sql=sql,
                 metrics=metrics,
                 dimensions=dimensions,
                 funnel=funnel,
                 where=where,
                 having=having,
                 order_by=order_by,
-                project=self.project,
-                connections=self.connections,
                 **{**self.kwargs, **kwargs},
             )
-            connection = resolver.connection
-            query = resolver.get_query()
+            cached = self.sql_cache.get(cache_key)
+        if cache_key is not None and cached is not None:
+            query, connection, query_kind = cached
+        else:
+            query, connection, query_kind = self._compile_sql_query(
+                project, metrics, dimensions, funnel, where, having, order_by, sql, **kwargs
+            )
+            if cache_key is not None:
+                self.sql_cache.set(cache_key, (query, connection, query_kind))
 
         if kwargs.get("pretty", False):
             query = self.pretty_sql(query)
@@ -148,12 +238,176 @@ class MetricsLayerConnection:
             return query, connection
 
         if kwargs.get("return_query_kind", False):
-            return query, resolver.query_kind
+            return query, query_kind
         return query
 
-    def run_query(self, query: str, connection: BaseConnection, **kwargs):
+    def _compile_sql_query(
+        self, project, metrics, dimensions, funnel, where, having, order_by, sql, **kwargs
+    ):
+        # The SQL generation pulls in pypika, sqlparse and networkx, so it's only imported when it's used
+        from metrics_layer.core.convert import MQLConverter
+        from metrics_layer.core.sql import SQLQueryResolver
+
+        if sql:
+            converter = MQLConverter(
+                sql, project=project, connections=self.connections, **{**self.kwargs, **kwargs}
+            )
+            connection = converter.connection
+            return converter.get_query(), connection, None
+
+        resolver = SQLQueryResolver(
+            metrics=metrics,
+            dimensions=dimensions,
+            funnel=funnel,
+            where=where,
+            having=having,
+            order_by=order_by,
+            project=project,
+            connections=self.connections,
+            **{**self.kwargs, **kwargs},
+        )
+        connection = resolver.connection
+        query = resolver.get_query()
+        return query, connection, resolver.query_kind
+
+    def query_many(self, requests: list, max_concurrency: int = 4, **kwargs):
+        results = [QueryResult(request) for request in requests]
+
+        # Compile in order on this thread, so every request shares the project's cached join graphs
+        batches = {}
+        for result in results:
+            try:
+                result.query, connection = self.get_sql_query(
+                    **{**kwargs, **result.request}, return_connection=True
+                )
+            except Exception as e:
+                result.error = e
+                continue
+            connection_key = json.dumps(connection.identity(), sort_keys=True, default=str)
+            # Requests only share a run when they also run the same way (cache mode, timeout, raw cursor)
+            run_options = {k: v for k, v in result.request.items() if k not in self.query_arguments}
+            run_key = json.dumps(run_options, sort_keys=True, default=str)
+            batches.setdefault((result.query, connection_key, run_key), (connection, []))[1].append(result)
+
+        def run_batch(connection, batch: list):
+            run_options = {k: v for k, v in batch[0].request.items() if k not in self.query_arguments}
+            return self.run_query(
+                batch[0].query, connection, **{"use_connection_pool": True, **kwargs, **run_options}
+            )
+
+        # Identical queries only run once, and every request gets its own copy of the result
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {executor.submit(run_batch, c, batch): batch for c, batch in batches.values()}
+            for future, batch in futures.items():
+                try:
+                    df = future.result()
+                except Exception as e:
+                    for result in batch:
+                        result.error = e
+                    continue
+                for i, result in enumerate(batch):
+                    result.df = df if i == 0 else df.copy()
+        return results
+
+    def query_dashboard(self, dashboard_name: str, max_concurrency: int = 4, **kwargs):
+        planner = DashboardQueryPlanner(self.get_dashboard(dashboard_name), self.project)
+        groups = planner.plan()
+        group_results = self.query_many([g.request() for g in groups], max_concurrency, **kwargs)
+
+        results = {}
+        for group, group_result in zip(groups, group_results):
+            error, element_dfs = group_result.error, [None] * len(group.elements)
+            if group_result.ok:
+                try:
+                    element_dfs = planner.split(group, group_result.df)
+                except QueryError as e:
+                    error = e
+            for i, element, df in zip(group.element_indexes, group.elements, element_dfs):
+                result = QueryResult(planner.element_request(element))
+                result.query, result.df, result.error = group_result.query, df, error
+                results[i] = result
+
+        for i, (request, error) in planner.element_errors.items():
+            results[i] = QueryResult(request)
+            results[i].error = error
+        return [results[i] for i in sorted(results)]
+
+    async def aquery(
+        self,
+        metrics: list = [],
+        dimensions: list = [],
+        funnel: dict = {},
+        where: list = [],
+        having: list = [],
+        order_by: list = [],
+        sql: str = None,
+        **kwargs,
+    ):
+        query, connection = await self.aget_sql_query(
+            sql=sql,
+            metrics=metrics,
+            dimensions=dimensions,
+            funnel=funnel,
+            where=where,
+            having=having,
+            order_by=order_by,
+            **{**self.kwargs, **kwargs},
+            return_connection=True,
+        )
+        df = await self.arun_query(query, connection, **kwargs)
+        return df
+
+    async def aget_sql_query(self, *args, **kwargs):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.get_sql_query, *args, **kwargs))
+
+    async def arun_query(self, query: str, connection: BaseConnection, **kwargs):
+        import asyncio
+
+        from metrics_layer.core.sql import QueryRunner
+
         runner = QueryRunner(query, connection)
-        df = runner.run_query(**{**self.kwargs, **kwargs})
+        runner.cancellable = True
+        timeout = {**self.kwargs, **kwargs}.get("timeout", 180)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, partial(self._run_query, runner, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Stopping the coroutine doesn't stop the worker thread, so abort the statement itself
+            await loop.run_in_executor(None, runner.cancel)
+            raise
+
+    def run_query(self, query: str, connection: BaseConnection, **kwargs):
+        from metrics_layer.core.sql import QueryRunner
+
+        return self._run_query(QueryRunner(query, connection), **kwargs)
+
+    def _run_query(self, runner, **kwargs):
+        query, connection = runner.query, runner.connection
+        run_kwargs = {**self.kwargs, **kwargs}
+        cache_mode = run_kwargs.get("cache", ResultCacheModes.use)
+        if cache_mode not in ResultCacheModes.all():
+            raise QueryError(f"Unknown cache option {cache_mode}, options are {ResultCacheModes.all()}")
+
+        # Raw cursors can't be cached, so they always go to the warehouse
+        use_cache = self.result_cache is not None and not run_kwargs.get("raw_cursor", False)
+        use_cache = use_cache and cache_mode != ResultCacheModes.bypass
+        if use_cache and cache_mode == ResultCacheModes.use:
+            df = self.result_cache.get(query, connection)
+            if df is not None:
+                return df
+
+        df = runner.run_query(**run_kwargs)
+        if use_cache:
+            # The query already ran, so a result that can't be cached is still returned
+            try:
+                self.result_cache.set(query, connection, df)
+            except Exception as e:
+                print(f"WARNING: could not cache the query result: {e}")
         return df
 
     def list_fields(self, view_name: str = None, names_only: bool = False, show_hidden: bool = False):
@@ -235,4 +489,6 @@ class MetricsLayerConnection:
 
     @staticmethod
     def pretty_sql(sql: str, keyword_case="lower"):
+        import sqlparse
+
         return sqlparse.format(sql, reindent=True, keyword_case=keyword_case)
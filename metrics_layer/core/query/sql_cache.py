@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class SQLCache:
+    # These arguments only change how the compiled query is returned, not the query itself
+    ignored_kwargs = {"pretty", "return_connection", "return_query_kind", "cache"}
+
+    def __init__(self, maxsize: int = 256, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+    def _is_expired(self, entry: tuple):
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
+
+    def key(self, project, connections: list, **query_args):
+        # The project identity covers both the definitions and the user's access attributes
+        args = {k: v for k, v in query_args.items() if k not in self.ignored_kwargs}
+        week_start_days = sorted({str(m.week_start_day).lower() for m in project.models()})
+        relative_dates = self._resolve_relative_dates(
+            [args.get("where"), args.get("having")], week_start_days, project.timezone
+        )
+        canonical = {
+            "project": project.identity_key,
+            "timezone": project.timezone,
+            # Fields can have relative date filters of their own, and those compile to fixed dates too
+            "today": self._today(project.timezone),
+            "connections": connections,
+            "args": args,
+            "relative_dates": relative_dates,
+        }
+        serialized = json.dumps(canonical, sort_keys=True, default=str)
+        return hashlib.md5(serialized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _today(timezone: str):
+        from metrics_layer.core.model.filter import Filter
+
+        return Filter._today(timezone if timezone else "UTC").to_date_string()
+
+    @staticmethod
+    def _resolve_relative_dates(filters, week_start_days: list, timezone: str):
+        # Relative filters like "last 7 days" compile to concrete dates, so the resolved
+        # range has to be part of the key or a cached query would go stale overnight
+        from metrics_layer.core.model.filter import Filter
+
+        resolved = []
+        for value in SQLCache._filter_values(filters):
+            for week_start_day in week_start_days:
+                date_condition = Filter.parse_date_condition_for_week(value, week_start_day, tz=timezone)
+                if date_condition:
+                    resolved.append([value, week_start_day, [[e.value, v] for e, v in date_condition]])
+        return resolved
+
+    @staticmethod
+    def _filter_values(filters):
+        if isinstance(filters, dict):
+            for k, v in filters.items():
+                if k == "value" and isinstance(v, str):
+                    yield v
+                else:
+                    yield from SQLCache._filter_values(v)
+        elif isinstance(filters, list):
+            for f in filters:
+                yield from SQLCache._filter_values(f)
@@ -1,2 +1,11 @@
-from .query_runner import QueryRunner  # noqa
-from .resolve import SQLQueryResolver  # noqa
+def __getattr__(name: str):
+    # The runner and resolver import pandas, pypika and the warehouse drivers, so they're loaded on first use
+    if name == "QueryRunner":
+        from .query_runner import QueryRunner
+
+        return QueryRunner
+    if name == "SQLQueryResolver":
+        from .resolve import SQLQueryResolver
+
+        return SQLQueryResolver
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
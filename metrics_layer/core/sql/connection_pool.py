@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from metrics_layer.core.parse.connections import BaseConnection, MetricsLayerConnectionError
+
+
+class PooledConnection:
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.last_used = time.monotonic()
+        # Statements that have already set up the session (e.g. Snowflake's USE statements)
+        self.session_state = set()
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        max_size: int = 5,
+        idle_timeout: float = 600,
+        health_check_after: float = 30,
+        checkout_timeout: float = 60,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self._idle = defaultdict(list)
+        self._in_use = defaultdict(int)
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def key(connection: BaseConnection, **connect_kwargs):
+        identity = {"connection": connection.identity(), "connect_kwargs": connect_kwargs}
+        serialized = json.dumps(identity, sort_keys=True, default=str)
+        return hashlib.md5(serialized.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def connection(self, key: str, connect, is_healthy=None):
+        pooled = self._checkout(key, connect, is_healthy)
+        # Released whatever happens (KeyboardInterrupt included), or the slot would be lost for good
+        reuse = False
+        try:
+            yield pooled
+            reuse = True
+        finally:
+            # After an error the connection may be in an unknown state, so it isn't handed out again
+            self._release(key, pooled, reuse=reuse)
+
+    def size(self, key: str):
+        with self._condition:
+            return len(self._idle[key]) + self._in_use[key]
+
+    def idle_size(self, key: str):
+        with self._condition:
+            return len(self._idle[key])
+
+    def close_all(self):
+        with self._condition:
+            idle = [pooled for pooled_list in self._idle.values() for pooled in pooled_list]
+            self._idle.clear()
+        for pooled in idle:
+            pooled.close()
+
+    def _checkout(self, key: str, connect, is_healthy):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._condition:
+            while True:
+                expired = self._remove_expired(key)
+                if self._idle[key]:
+                    pooled = self._idle[key].pop()
+                    break
+                if self._in_use[key] < self.max_size:
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MetricsLayerConnectionError(
+                        f"Timed out after {self.checkout_timeout} seconds waiting for a free connection "
+                        f"in the connection pool (max size {self.max_size})"
+                    )
+                self._condition.wait(remaining)
+            self._in_use[key] += 1
+
+        for stale in expired:
+            stale.close()
+
+        try:
+            if pooled is not None and self._needs_health_check(pooled) and is_healthy is not None:
+                if not is_healthy(pooled.connection):
+                    pooled.close()
+                    pooled = None
+            if pooled is None:
+                pooled = PooledConnection(connect())
+        except BaseException:
+            self._release(key, None, reuse=False)
+            raise
+        return pooled
+
+    def _release(self, key: str, pooled: PooledConnection, reuse: bool):
+        with self._condition:
+            self._in_use[key] -= 1
+            if reuse:
+                pooled.last_used = time.monotonic()
+                self._idle[key].append(pooled)
+            self._condition.notify()
+        if pooled is not None and not reuse:
+            pooled.close()
+
+    def _remove_expired(self, key: str):
+        now = time.monotonic()
+        expired = [p for p in self._idle[key] if now - p.last_used > self.idle_timeout]
+        if expired:
+            self._idle[key] = [p for p in self._idle[key] if now - p.last_used <= self.idle_timeout]
+        return expired
+
+    def _needs_health_check(self, pooled: PooledConnection):
+        return time.monotonic() - pooled.last_used > self.health_check_after
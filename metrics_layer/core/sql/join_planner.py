@@ -0,0 +1,142 @@
+import heapq
+import math
+from collections import defaultdict
+
+import networkx
+
+# Up to this many views the cheapest tree is found exactly, past it a shortest path heuristic is used
+STEINER_EXACT_MAX_VIEWS = 5
+
+
+class SteinerJoinPlanner:
+    """
+    Finds the cheapest tree of joins that connects all the views in a query
+    """
+
+    def __init__(self, graph, table_sizes: dict = {}) -> None:
+        self.graph = graph
+        self.table_sizes = table_sizes
+
+    def cost(self, base_view_name: str, join_view_name: str):
+        # Joining a bigger table costs more in the warehouse, so its row count (when known) is added
+        weight = self.graph[base_view_name][join_view_name]["weight"]
+        row_count = self.table_sizes.get(join_view_name)
+        if row_count and row_count > 1:
+            return weight + math.log10(row_count)
+        return weight
+
+    def plan(self, required_views: list):
+        views = sorted(set(required_views))
+        if len(views) == 1:
+            return []
+        if any(v not in self.graph for v in views):
+            raise networkx.exception.NetworkXNoPath
+
+        if len(views) <= STEINER_EXACT_MAX_VIEWS:
+            root, edges = self._exact_tree(views)
+        else:
+            root, edges = self._approximate_tree(views)
+        return self._ordered_view_pairs(root, edges)
+
+    def _exact_tree(self, views: list):
+        # Dreyfus-Wagner: the cheapest tree rooted at a view that reaches a set of views either joins
+        # another view first, or splits at the view into two trees that reach parts of the set
+        all_views = (1 << len(views)) - 1
+        costs, steps = {}, {}
+        for subset in sorted(range(1, all_views + 1), key=lambda s: bin(s).count("1")):
+            start_costs, start_steps = {}, {}
+            if subset & (subset - 1) == 0:
+                view_name = views[subset.bit_length() - 1]
+                start_costs[view_name], start_steps[view_name] = 0, None
+            else:
+                lowest = subset & -subset
+                part = (subset - 1) & subset
+                while part:
+                    # Every split is checked once, from the side that has the lowest view in it
+                    if part & lowest:
+                        other_costs = costs[subset ^ part]
+                        for view_name, cost in costs[part].items():
+                            if view_name in other_costs:
+                                total = cost + other_costs[view_name]
+                                if total < start_costs.get(view_name, math.inf):
+                                    start_costs[view_name], start_steps[view_name] = total, ("split", part)
+                    part = (part - 1) & subset
+            costs[subset], steps[subset] = self._extend_backwards(start_costs, start_steps)
+
+        root_cost, root = min((costs[all_views].get(v, math.inf), v) for v in views)
+        if root_cost == math.inf:
+            raise networkx.exception.NetworkXNoPath
+
+        edges, to_visit = [], [(all_views, root)]
+        while to_visit:
+            subset, view_name = to_visit.pop()
+            step = steps[subset][view_name]
+            if step is None:
+                continue
+            elif step[0] == "split":
+                to_visit.extend([(step[1], view_name), (subset ^ step[1], view_name)])
+            else:
+                edges.append((view_name, step[1]))
+                to_visit.append((subset, step[1]))
+        return root, edges
+
+    def _extend_backwards(self, start_costs: dict, start_steps: dict):
+        # Dijkstra against the direction of the joins, so every view gets the cost of the cheapest
+        # tree rooted at it, and the view it should join next to get there
+        costs, steps = dict(start_costs), dict(start_steps)
+        heap = [(cost, view_name) for view_name, cost in start_costs.items()]
+        heapq.heapify(heap)
+        done = set()
+        while heap:
+            cost, view_name = heapq.heappop(heap)
+            if view_name in done:
+                continue
+            done.add(view_name)
+            for base_view_name in self.graph.predecessors(view_name):
+                new_cost = cost + self.cost(base_view_name, view_name)
+                if new_cost < costs.get(base_view_name, math.inf):
+                    costs[base_view_name], steps[base_view_name] = new_cost, ("join", view_name)
+                    heapq.heappush(heap, (new_cost, base_view_name))
+        return costs, steps
+
+    def _approximate_tree(self, views: list):
+        # Grow the tree from each view in turn, always adding the cheapest path to a view it's missing
+        best = None
+        for root in views:
+            tree, edges, total = {root}, [], 0
+            missing = set(views) - tree
+            while missing:
+                distances, paths = networkx.multi_source_dijkstra(
+                    self.graph, tree, weight=lambda u, v, _: self.cost(u, v)
+                )
+                reachable = [(distances[v], v) for v in missing if v in distances]
+                if not reachable:
+                    break
+                distance, view_name = min(reachable)
+                path = paths[view_name]
+                edges.extend(zip(path, path[1:]))
+                tree.update(path)
+                missing -= set(path)
+                total += distance
+
+            if not missing and (best is None or total < best[0]):
+                best = (total, root, edges)
+
+        if best is None:
+            raise networkx.exception.NetworkXNoPath
+        return best[1], best[2]
+
+    @staticmethod
+    def _ordered_view_pairs(root: str, edges: list):
+        joins_from = defaultdict(set)
+        for base_view_name, join_view_name in edges:
+            joins_from[base_view_name].add(join_view_name)
+
+        view_pairs, joined, to_join = [], {root}, [root]
+        for base_view_name in to_join:
+            for join_view_name in sorted(joins_from[base_view_name]):
+                if join_view_name not in joined:
+                    view_pairs.append((base_view_name, join_view_name))
+                    joined.add(join_view_name)
+                    to_join.append(join_view_name)
+        return view_pairs
@@ -306,7 +306,7 @@ class CumulativeMetricsQuery(MetricsLayerQueryBase):
                 and field.dimension_group != dimension_group
                 and cumulative_metric.update_where_timeframe
             ):
-                field.dimension_group = dimension_group
+                field = self.design.get_field(f"{field.view.name}.{field.name}_{dimension_group}")
 
             sql = field.sql_query(query_type=self.query_type, alias_only=True)
             replaced_where = replaced_where.replace("${" + ref + "}", f"{cte_prefix}.{sql}")
@@ -4,21 +4,37 @@ import functools
 import itertools
 
 import networkx
-from metrics_layer.core.exceptions import JoinError
+from metrics_layer.core.exceptions import JoinError, QueryError
 from metrics_layer.core.model.base import MetricsLayerBase
 from metrics_layer.core.model.definitions import Definitions
 from metrics_layer.core.model.filter import Filter
+from metrics_layer.core.sql.join_planner import SteinerJoinPlanner
 
 
 class MetricsLayerDesign:
     """ """
 
-    def __init__(self, no_group_by: bool, query_type: str, field_lookup: dict, model, project) -> None:
+    join_planners = ["greedy", "steiner"]
+
+    def __init__(
+        self,
+        no_group_by: bool,
+        query_type: str,
+        field_lookup: dict,
+        model,
+        project,
+        join_planner: str = "greedy",
+    ) -> None:
+        if join_planner not in self.join_planners:
+            raise QueryError(
+                f"The join planner {join_planner} is not valid. Please use one of {self.join_planners}"
+            )
         self.no_group_by = no_group_by
         self.query_type = query_type
         self.field_lookup = field_lookup
         self.project = project
         self.model = model
+        self.join_planner = join_planner
         self.date_spine_cte_name = "date_spine"
         self.base_cte_name = "base"
         self._joins = None
@@ -37,10 +53,20 @@ class MetricsLayerDesign:
     @functools.lru_cache(maxsize=1)
     def joins(self) -> List[MetricsLayerBase]:
         required_views = self.required_views()
+        plan = self.project.join_graph.join_plan(self.model.name, required_views, self.join_planner)
+        if "joins" not in plan:
+            plan["joins"] = self._determine_joins(required_views)
+        return plan["joins"]
 
+    def _determine_joins(self, required_views: list):
         self._join_subgraph = self.project.join_graph.subgraph(required_views)
         try:
-            ordered_view_pairs = self.determine_join_order(required_views)
+            if self.join_planner == "steiner":
+                join_graph = self.project.join_graph
+                planner = SteinerJoinPlanner(join_graph.graph, join_graph.table_sizes)
+                ordered_view_pairs = planner.plan(required_views)
+            else:
+                ordered_view_pairs = self.determine_join_order(required_views)
         except networkx.exception.NetworkXNoPath:
             raise JoinError(
                 f"There was no join path between the views: {list(sorted(required_views))}. "
@@ -69,23 +95,24 @@ class MetricsLayerDesign:
                 except networkx.exception.NetworkXNoPath:
                     pass
 
+            # The nodes of a line graph are the edges of the graph, so the edges are used directly
+            # instead of building the line graph of the whole project
             g = self.project.join_graph.graph
-            raw_edges = networkx.line_graph(g).nodes
             bridge_views = self._bridge_views(required_views)
-            sub_line_graph_nodes = networkx.line_graph(self._join_subgraph).nodes
-            edges = [e for e in raw_edges if e[0] in required_views or e[1] in required_views]
+            subgraph_edges = set(self._join_subgraph.edges())
+            edges = set(g.in_edges(required_views)) | set(g.out_edges(required_views))
             sorted_edges = sorted(
                 edges,
                 key=lambda x: (
                     int(any(i in bridge_views for i in x)) * -1,
-                    int(x in sub_line_graph_nodes) * -1,
+                    int(x in subgraph_edges) * -1,
                     x,
                 ),
             )
             # Sorting puts the bridge views first, edges in the subgraph next, then sorts alphabetically
             for view_pair in sorted_edges:
                 try:
-                    return self._greedy_build_join(g, view_pair, required_views)
+                    return self._greedy_build_join(view_pair, required_views)
                 except ValueError:
                     pass
 
@@ -111,18 +138,15 @@ class MetricsLayerDesign:
 
         return any(v not in added_views for v in required_views)
 
-    def _greedy_build_join(self, graph, starting_pair: tuple, required_views: list):
-        _, paths = networkx.single_source_dijkstra(networkx.line_graph(graph), source=starting_pair)
-        for pairs in paths.values():
-            pairs = self._clean_view_pairs(pairs)
-            unique_joined_views = set(v for p in pairs for v in p)
+    def _greedy_build_join(self, starting_pair: tuple, required_views: list):
+        # Start from the pair and add the shortest path to each view that's still missing
+        pairs = [starting_pair]
+        unique_joined_views = set(starting_pair)
 
-            missing_views = [v for v in required_views if v not in unique_joined_views]
-            if len(missing_views) == 0:
-                return pairs
-            else:
-                pairs = self._add_missing_views(missing_views, pairs, len(missing_views))
-                return pairs
+        missing_views = [v for v in required_views if v not in unique_joined_views]
+        if len(missing_views) == 0:
+            return pairs
+        return self._add_missing_views(missing_views, pairs, len(missing_views))
 
     def _add_missing_views(self, missing_views: str, pairs: list, missing_n: int):
         potential_anchors = [pairs[0][0]] + [p[-1] for p in pairs]
@@ -193,6 +217,12 @@ class MetricsLayerDesign:
 
     @functools.lru_cache(maxsize=1)
     def functional_pk(self):
+        plan = self.project.join_graph.join_plan(self.model.name, self.required_views(), self.join_planner)
+        if "functional_pk" not in plan:
+            plan["functional_pk"] = self._determine_functional_pk()
+        return plan["functional_pk"]
+
+    def _determine_functional_pk(self):
         sorted_joins = self.joins()
 
         if len(sorted_joins) == 0:
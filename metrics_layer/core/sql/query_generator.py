@@ -368,6 +368,7 @@ class MetricsLayerQuery(MetricsLayerQueryBase):
             field_lookup=field_lookup,
             model=self.design.model,
             project=project,
+            join_planner=self.design.join_planner,
         )
 
         config = {
@@ -19,16 +19,30 @@ try:
 except ModuleNotFoundError:
     pass
 
+try:
+    import duckdb
+except ModuleNotFoundError:
+    pass
+
+
+import atexit
+import threading
+from contextlib import contextmanager
 
 import pandas as pd
+from metrics_layer.core.exceptions import QueryError
 from metrics_layer.core.parse.connections import (
     BaseConnection,
     ConnectionType,
     MetricsLayerConnectionError,
 )
+from .connection_pool import ConnectionPool, PooledConnection
 
 
 class QueryRunner:
+    # Shared by every query in the process, only used when use_connection_pool=True
+    connection_pool = ConnectionPool()
+
     def __init__(self, query: str, connection: BaseConnection):
         self.query = query
         self.connection = connection
@@ -37,89 +51,264 @@ class QueryRunner:
             ConnectionType.bigquery: self._run_bigquery_query,
             ConnectionType.redshift: self._run_redshift_query,
             ConnectionType.postgres: self._run_postgres_query,
+            ConnectionType.duck_db: self._run_duck_db_query,
+        }
+        self._cancel_lookup = {
+            ConnectionType.snowflake: self._cancel_snowflake_query,
+            ConnectionType.bigquery: self._cancel_bigquery_query,
+            ConnectionType.redshift: self._cancel_redshift_query,
+            ConnectionType.postgres: self._cancel_postgres_query,
+            ConnectionType.duck_db: self._cancel_duck_db_query,
+        }
+        self._health_check_lookup = {
+            ConnectionType.snowflake: self._snowflake_is_healthy,
+            ConnectionType.redshift: self._redshift_is_healthy,
+            ConnectionType.postgres: self._postgres_is_healthy,
         }
         if self.connection.type not in self._query_runner_lookup:
             supported = list(self._query_runner_lookup.keys())
             raise MetricsLayerConnectionError(
                 f"Connection type {self.connection.type} not supported, supported types are {supported}"
             )
+        # Set to whatever is needed to abort the statement that is currently running
+        self.cancellable = False
+        self._active_handle = None
+        # A cancel can come before there's a statement to abort, so it's remembered until there is one
+        self._cancel_requested = False
+        self._cancel_lock = threading.Lock()
+
+    def cancel(self):
+        with self._cancel_lock:
+            self._cancel_requested = True
+            handle = self._active_handle
+        if handle is None:
+            return False
+        self._cancel_lookup[self.connection.type](handle)
+        return True
+
+    def _set_active_handle(self, handle):
+        with self._cancel_lock:
+            self._active_handle = handle
+            cancel_requested = self._cancel_requested
+        if cancel_requested:
+            self._cancel_lookup[self.connection.type](handle)
+
+    def _raise_if_cancelled(self):
+        # Checked right before the statement starts, so a cancel that came too early still stops it
+        if self._cancel_requested:
+            raise QueryError("The query was cancelled before it started running")
 
     # 3 min timeout default set in seconds (aborts query after timeout)
     def run_query(self, timeout: int = 180, **kwargs):
         query_runner = self._query_runner_lookup[self.connection.type]
-        df = query_runner(
-            timeout=timeout,
-            raw_cursor=kwargs.get("raw_cursor", False),
-            run_pre_queries=kwargs.get("run_pre_queries", True),
-            start_warehouse=kwargs.get("start_warehouse", True),
-        )
+        try:
+            df = query_runner(
+                timeout=timeout,
+                raw_cursor=kwargs.get("raw_cursor", False),
+                run_pre_queries=kwargs.get("run_pre_queries", True),
+                start_warehouse=kwargs.get("start_warehouse", True),
+                use_connection_pool=kwargs.get("use_connection_pool", False),
+            )
+        finally:
+            self._active_handle = None
         return df
 
+    @contextmanager
+    def _checkout_connection(self, get_connection, use_connection_pool: bool, **connect_kwargs):
+        def connect():
+            return get_connection(self.connection, **connect_kwargs)
+
+        if use_connection_pool:
+            key = self.connection_pool.key(self.connection, **connect_kwargs)
+            is_healthy = self._health_check_lookup.get(self.connection.type)
+            with self.connection_pool.connection(key, connect, is_healthy=is_healthy) as pooled:
+                yield pooled
+        else:
+            pooled = PooledConnection(connect())
+            try:
+                yield pooled
+            finally:
+                pooled.close()
+
     def _run_snowflake_query(
-        self, timeout: int, raw_cursor: bool, run_pre_queries: bool, start_warehouse: bool
+        self,
+        timeout: int,
+        raw_cursor: bool,
+        run_pre_queries: bool,
+        start_warehouse: bool,
+        use_connection_pool: bool = False,
     ):
-        snowflake_connection = self._get_snowflake_connection(self.connection)
-        if run_pre_queries:
-            self._run_snowflake_pre_queries(snowflake_connection)
-        elif start_warehouse:
-            self._run_snowflake_pre_queries(snowflake_connection, warehouse_only=True)
-        cursor = snowflake_connection.cursor()
-        cursor.execute(self.query, timeout=timeout)
-
-        snowflake_connection.close()
-        if raw_cursor:
-            return cursor
-        df = cursor.fetch_pandas_all()
+        # A raw cursor is still in use after we return, so it can't share a pooled connection
+        use_connection_pool = use_connection_pool and not raw_cursor
+        with self._checkout_connection(self._get_snowflake_connection, use_connection_pool) as pooled:
+            snowflake_connection = pooled.connection
+            self._set_active_handle(snowflake_connection)
+            if run_pre_queries:
+                self._run_snowflake_pre_queries(snowflake_connection, session_state=pooled.session_state)
+            elif start_warehouse:
+                self._run_snowflake_pre_queries(
+                    snowflake_connection, warehouse_only=True, session_state=pooled.session_state
+                )
+            cursor = snowflake_connection.cursor()
+            self._raise_if_cancelled()
+            cursor.execute(self.query, timeout=timeout)
+            if raw_cursor:
+                return cursor
+            df = cursor.fetch_pandas_all()
         return df
 
     def _run_redshift_query(
-        self, timeout: int, raw_cursor: bool, run_pre_queries: bool, start_warehouse: bool
+        self,
+        timeout: int,
+        raw_cursor: bool,
+        run_pre_queries: bool,
+        start_warehouse: bool,
+        use_connection_pool: bool = False,
     ):
-        redshift_connection = self._get_redshift_connection(self.connection, timeout=timeout)
-        cursor = redshift_connection.cursor()
-        cursor.execute(self.query)
-
-        redshift_connection.close()
-        if raw_cursor:
-            return cursor
-        df = cursor.fetch_dataframe()
+        use_connection_pool = use_connection_pool and not raw_cursor
+        with self._checkout_connection(
+            self._get_redshift_connection, use_connection_pool, timeout=timeout
+        ) as pooled:
+            cursor = pooled.connection.cursor()
+            if self.cancellable:
+                cursor.execute("select pg_backend_pid()")
+                self._set_active_handle(cursor.fetchone()[0])
+            self._raise_if_cancelled()
+            cursor.execute(self.query)
+            if raw_cursor:
+                return cursor
+            df = cursor.fetch_dataframe()
         return df
 
     def _run_postgres_query(
-        self, timeout: int, raw_cursor: bool, run_pre_queries: bool, start_warehouse: bool
+        self,
+        timeout: int,
+        raw_cursor: bool,
+        run_pre_queries: bool,
+        start_warehouse: bool,
+        use_connection_pool: bool = False,
     ):
-        postgres_connection = self._get_postgres_connection(self.connection, timeout=timeout)
-
         if raw_cursor:
+            postgres_connection = self._get_postgres_connection(self.connection, timeout=timeout)
             cursor = postgres_connection.cursor()
             return cursor
 
-        df = pd.read_sql(self.query, postgres_connection)
-        postgres_connection.close()
+        with self._checkout_connection(
+            self._get_postgres_connection, use_connection_pool, timeout=timeout
+        ) as pooled:
+            self._set_active_handle(pooled.connection)
+            self._raise_if_cancelled()
+            df = pd.read_sql(self.query, pooled.connection)
+        return df
+
+    def _run_duck_db_query(
+        self,
+        timeout: int,
+        raw_cursor: bool,
+        run_pre_queries: bool,
+        start_warehouse: bool,
+        use_connection_pool: bool = False,
+    ):
+        if raw_cursor:
+            duck_db_connection = self._get_duck_db_connection(self.connection)
+            self._set_active_handle(duck_db_connection)
+            self._raise_if_cancelled()
+            return duck_db_connection.execute(self.query)
+
+        with self._checkout_connection(self._get_duck_db_connection, use_connection_pool) as pooled:
+            self._set_active_handle(pooled.connection)
+            self._raise_if_cancelled()
+            df = pooled.connection.execute(self.query).fetchdf()
         return df
 
     def _run_bigquery_query(
-        self, timeout: int, raw_cursor: bool, run_pre_queries: bool, start_warehouse: bool
+        self,
+        timeout: int,
+        raw_cursor: bool,
+        run_pre_queries: bool,
+        start_warehouse: bool,
+        use_connection_pool: bool = False,
     ):
         bigquery_connection = self._get_bigquery_connection(self.connection)
+        self._raise_if_cancelled()
         result = bigquery_connection.query(self.query, timeout=timeout, job_retry=None)
+        self._set_active_handle(result)
         bigquery_connection.close()
         if raw_cursor:
             return result
         df = result.to_dataframe()
         return df
 
-    def _run_snowflake_pre_queries(self, snowflake_connection, warehouse_only: bool = False):
-        to_execute = ""
+    def _run_snowflake_pre_queries(
+        self, snowflake_connection, warehouse_only: bool = False, session_state: set = None
+    ):
+        statements = []
         if self.connection.warehouse:
-            to_execute += f"USE WAREHOUSE {self.connection.warehouse};"
+            statements.append(f"USE WAREHOUSE {self.connection.warehouse};")
         if self.connection.database and not warehouse_only:
-            to_execute += f'USE DATABASE "{self.connection.database.upper()}";'
+            statements.append(f'USE DATABASE "{self.connection.database.upper()}";')
         if self.connection.schema and not warehouse_only:
-            to_execute += f'USE SCHEMA "{self.connection.schema.upper()}";'
+            statements.append(f'USE SCHEMA "{self.connection.schema.upper()}";')
+
+        # Pooled connections keep their session, so skip anything that already ran on it
+        if session_state is not None:
+            statements = [s for s in statements if s not in session_state]
+        to_execute = "".join(statements)
 
         if to_execute != "":
             snowflake_connection.execute_string(to_execute)
+            if session_state is not None:
+                session_state.update(statements)
+
+    @staticmethod
+    def _cancel_snowflake_query(snowflake_connection):
+        cursor = snowflake_connection.cursor()
+        cursor.execute(f"SELECT SYSTEM$CANCEL_ALL_QUERIES({snowflake_connection.session_id})")
+
+    @staticmethod
+    def _cancel_bigquery_query(query_job):
+        query_job.cancel()
+
+    def _cancel_redshift_query(self, backend_pid: int):
+        # The running connection is blocked, so the cancel has to come from a second one
+        redshift_connection = self._get_redshift_connection(self.connection)
+        try:
+            cursor = redshift_connection.cursor()
+            cursor.execute(f"select pg_cancel_backend({int(backend_pid)})")
+        finally:
+            redshift_connection.close()
+
+    @staticmethod
+    def _cancel_postgres_query(postgres_connection):
+        postgres_connection.connection.cancel()
+
+    @staticmethod
+    def _cancel_duck_db_query(duck_db_connection):
+        duck_db_connection.interrupt()
+
+    @staticmethod
+    def _snowflake_is_healthy(snowflake_connection):
+        return not snowflake_connection.is_closed()
+
+    @staticmethod
+    def _redshift_is_healthy(redshift_connection):
+        try:
+            cursor = redshift_connection.cursor()
+            cursor.execute("select 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _postgres_is_healthy(postgres_connection):
+        if postgres_connection.closed or postgres_connection.invalidated:
+            return False
+        try:
+            pd.read_sql("select 1", postgres_connection)
+            return True
+        except Exception:
+            return False
 
     @staticmethod
     def _get_snowflake_connection(connection: BaseConnection):
@@ -190,3 +379,16 @@ class QueryRunner:
                 "the [bigquery] option e.g. pip install metrics-layer[bigquery]"
             )
         return connection
+
+    @staticmethod
+    def _get_duck_db_connection(connection: BaseConnection):
+        try:
+            return duckdb.connect(connection.database if connection.database else ":memory:")
+        except (ModuleNotFoundError, NameError):
+            raise ModuleNotFoundError(
+                "MetricsLayer could not find the DuckDB modules it needs to run the query. "
+                "Make sure that you have those modules installed e.g. pip install duckdb"
+            )
+
+
+atexit.register(lambda: QueryRunner.connection_pool.close_all())
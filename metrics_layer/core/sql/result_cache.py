@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from metrics_layer.core.parse.connections import BaseConnection
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class ResultCacheModes:
+    use = "use"
+    refresh = "refresh"
+    bypass = "bypass"
+
+    @classmethod
+    def all(cls):
+        return [cls.use, cls.refresh, cls.bypass]
+
+
+class ResultCache:
+    def __init__(self, ttl: float = None, connection_ttls: dict = {}, max_bytes: int = 512 * 1024**2):
+        self.ttl = ttl
+        self.connection_ttls = connection_ttls
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (created, size in bytes), ordered from least to most recently used
+        self._entries = OrderedDict()
+        # Kept as entries come and go, so eviction doesn't add up every entry on each pass
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    def key(self, query: str, connection: BaseConnection):
+        identity = {"query": query, "connection": connection.identity()}
+        serialized = json.dumps(identity, sort_keys=True, default=str)
+        return hashlib.md5(serialized.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, connection: BaseConnection):
+        return self.connection_ttls.get(connection.name, self.ttl)
+
+    def get(self, query: str, connection: BaseConnection):
+        key = self.key(query, connection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, self.ttl_for(connection)):
+                self._remove(key)
+                entry = None
+
+            df = None if entry is None else self._read(key)
+            if df is None:
+                self._pop_entry(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._touch(key, entry)
+            self.hits += 1
+            return df
+
+    def set(self, query: str, connection: BaseConnection, df: "pd.DataFrame"):
+        key = self.key(query, connection)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            size = self._write(key, df)
+            self._add_entry(key, (time.time(), size))
+            while self.size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+    @staticmethod
+    def _is_expired(entry: tuple, ttl: float):
+        return ttl is not None and time.time() - entry[0] > ttl
+
+    def _add_entry(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._size += entry[1]
+
+    def _pop_entry(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def _remove(self, key: str):
+        self._pop_entry(key)
+        self._delete(key)
+
+    def _touch(self, key: str, entry: tuple):
+        pass
+
+    def _read(self, key: str):
+        raise NotImplementedError()
+
+    def _write(self, key: str, df: "pd.DataFrame"):
+        raise NotImplementedError()
+
+    def _delete(self, key: str):
+        raise NotImplementedError()
+
+
+class MemoryResultCache(ResultCache):
+    def __init__(self, ttl: float = None, connection_ttls: dict = {}, max_bytes: int = 512 * 1024**2):
+        super().__init__(ttl=ttl, connection_ttls=connection_ttls, max_bytes=max_bytes)
+        self._frames = {}
+
+    def _read(self, key: str):
+        df = self._frames.get(key)
+        # Hand out copies so callers can't modify the cached result
+        return None if df is None else df.copy()
+
+    def _write(self, key: str, df: "pd.DataFrame"):
+        self._frames[key] = df.copy()
+        return int(df.memory_usage(deep=True).sum())
+
+    def _delete(self, key: str):
+        self._frames.pop(key, None)
+
+
+class DiskResultCache(ResultCache):
+    extension = ".parquet"
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = None,
+        connection_ttls: dict = {},
+        max_bytes: int = 2 * 1024**3,
+    ):
+        super().__init__(ttl=ttl, connection_ttls=connection_ttls, max_bytes=max_bytes)
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self._load_entries()
+
+    def _load_entries(self):
+        # Results written by other processes are picked up, with the access time
+        # recording recency and the modified time recording when they were cached
+        files = []
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(self.extension):
+                stat = os.stat(os.path.join(self.path, file_name))
+                files.append((stat.st_atime, file_name[: -len(self.extension)], stat))
+        for _, key, stat in sorted(files):
+            self._add_entry(key, (stat.st_mtime, stat.st_size))
+
+    def _file_path(self, key: str):
+        return os.path.join(self.path, f"{key}{self.extension}")
+
+    def _touch(self, key: str, entry: tuple):
+        os.utime(self._file_path(key), (time.time(), entry[0]))
+
+    def _read(self, key: str):
+        import pandas as pd
+
+        try:
+            return pd.read_parquet(self._file_path(key))
+        except FileNotFoundError:
+            return None
+        except ImportError:
+            raise self._missing_arrow()
+
+    def _write(self, key: str, df: "pd.DataFrame"):
+        # Write to a temporary file first so concurrent readers never see a partial result
+        temp_path = f"{self._file_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(temp_path)
+            os.replace(temp_path, self._file_path(key))
+        except ImportError:
+            raise self._missing_arrow()
+        finally:
+            # Only left behind when the write failed, for example on a column pyarrow can't convert
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return os.path.getsize(self._file_path(key))
+
+    def _delete(self, key: str):
+        try:
+            os.remove(self._file_path(key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _missing_arrow():
+        return ModuleNotFoundError(
+            "MetricsLayer could not find the pyarrow module it needs to cache query results on disk. "
+            "Make sure that you have pyarrow installed or use the in-memory result cache instead."
+        )
@@ -29,6 +29,7 @@ class SingleSQLQueryResolver:
         self.limit = kwargs.get("limit")
         self.return_pypika_query = kwargs.get("return_pypika_query")
         self.force_group_by = kwargs.get("force_group_by", False)
+        self.join_planner = kwargs.get("join_planner", "greedy")
         self.project = project
         self.metrics = metrics
         self.dimensions = dimensions
@@ -51,6 +52,7 @@ class SingleSQLQueryResolver:
             field_lookup=self.field_lookup,
             model=self.model,
             project=self.project,
+            join_planner=self.join_planner,
         )
 
         query_definition = {
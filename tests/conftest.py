@@ -1,4 +1,5 @@
 import os
+import shutil
 
 import pandas as pd
 import pytest
@@ -378,6 +379,23 @@ def fresh_dashboards():
     return dashboards
 
 
+@pytest.fixture(scope="function")
+def project_repo(tmp_path):
+    repo_path = tmp_path / "project_repo"
+    for folder, paths in [("models", model_paths), ("views", view_paths), ("dashboards", dashboard_paths)]:
+        os.makedirs(repo_path / folder)
+        for path in paths:
+            shutil.copy(path, repo_path / folder)
+    with open(repo_path / "zenlytic_project.yml", "w") as f:
+        f.write(
+            "name: project_repo\n"
+            "model-paths: ['models']\n"
+            "view-paths: ['views']\n"
+            "dashboard-paths: ['dashboards']\n"
+        )
+    return str(repo_path)
+
+
 @pytest.fixture(scope="module")
 def models():
     models = [ProjectReaderBase.read_yaml_file(p) for p in model_paths]
@@ -99,3 +99,49 @@ def test_access_grants_dashboard_visible(connection):
     assert exc_info.value
     assert exc_info.value.object_name == "sales_dashboard_v2"
     assert exc_info.value.object_type == "dashboard"
+
+
+def test_access_grants_shared_access_scope(fresh_project, monkeypatch):
+    fresh_project.set_user({"department": "sales", "email": "first@example.com"})
+    view = fresh_project.get_view("orders")
+    identity_key = fresh_project.identity_key
+
+    # Only the attributes access grants check decide what a user can see
+    monkeypatch.setattr(type(fresh_project), "models", lambda self: pytest.fail("models were rebuilt"))
+    fresh_project.set_user({"department": "sales", "email": "second@example.com"})
+    assert fresh_project.get_view("orders") is view
+    assert fresh_project.identity_key != identity_key
+
+    fresh_project.set_user({"department": "marketing", "email": "first@example.com"})
+    with pytest.raises(AccessDeniedOrDoesNotExistException):
+        fresh_project.get_view("orders")
+
+
+def test_access_grants_access_scope_eviction(fresh_project, monkeypatch):
+    monkeypatch.setattr("metrics_layer.core.model.project.ACCESS_SCOPE_CACHE_SIZE", 2)
+
+    fresh_project.set_user({"department": "sales"})
+    sales_view = fresh_project.get_view("orders")
+    fresh_project.set_user({"department": "finance"})
+    fresh_project.get_view("orders")
+    fresh_project.set_user({"department": "executive"})
+    fresh_project.get_view("orders")
+
+    assert len(fresh_project._access_decisions) == 2
+    assert len(fresh_project._view_registry) == 2
+    fresh_project.set_user({"department": "sales"})
+    assert fresh_project.get_view("orders") is not sales_view
+
+
+def test_access_grants_fields_cache_per_scope(fresh_project):
+    model = fresh_project.get_model("test_model")
+    for i in range(200):
+        # None of these attributes are checked by an access grant, so all the users share one scope
+        fresh_project.set_user({"email": f"user_{i}@example.com"})
+        fresh_project.fields(model=fresh_project.get_model("test_model"))
+        fresh_project.fields(view_name="orders", model=model)
+        fresh_project.get_field("orders.total_revenue")
+
+    assert len(fresh_project._access_decisions) == 1
+    assert len({k[1] for k in fresh_project._fields_cache}) == 1
+    assert len(fresh_project._fields_cache) == 4
@@ -79,8 +79,18 @@ def test_cli_seed_metrics_layer(
         elif query_type == Definitions.snowflake and ".TABLES" in query:
             return pd.DataFrame(
                 [
-                    {"TABLE_SCHEMA": "ANALYTICS", "TABLE_NAME": "ORDERS", "COMMENT": "orders table, bro"},
-                    {"TABLE_SCHEMA": "ANALYTICS", "TABLE_NAME": "SESSIONS", "COMMENT": None},
+                    {
+                        "TABLE_SCHEMA": "ANALYTICS",
+                        "TABLE_NAME": "ORDERS",
+                        "COMMENT": "orders table, bro",
+                        "TABLE_ROW_COUNT": 5400,
+                    },
+                    {
+                        "TABLE_SCHEMA": "ANALYTICS",
+                        "TABLE_NAME": "SESSIONS",
+                        "COMMENT": None,
+                        "TABLE_ROW_COUNT": None,
+                    },
                 ]
             )
         elif query_type == Definitions.databricks and ".TABLES" in query:
@@ -120,6 +130,10 @@ def test_cli_seed_metrics_layer(
             assert data["model_name"] == "base_model"
             if query_type in {Definitions.snowflake, Definitions.databricks}:
                 assert data["description"] == "orders table, bro"
+            if query_type == Definitions.snowflake:
+                assert data["row_count"] == 5400
+            else:
+                assert "row_count" not in data
             if query_type in {Definitions.snowflake, Definitions.redshift}:
                 assert data["sql_table_name"] == "ANALYTICS.ORDERS"
             if query_type in {Definitions.druid}:
@@ -237,6 +251,7 @@ def test_cli_seed_metrics_layer(
             ):
                 assert data["sql_table_name"] == "segment_events.analytics.sessions"
             assert "row_label" not in data
+            assert "row_count" not in data
 
             date = next((f for f in data["fields"] if f["name"] == "session_date"))
             pk = next((f for f in data["fields"] if f["name"] == "session_id"))
@@ -474,6 +489,26 @@ def test_cli_validate_access_grants_setup(connection, fresh_project, mocker):
     )
 
 
+@pytest.mark.cli
+def test_cli_validate_row_count(connection, fresh_project, mocker):
+    # Break something so validation fails
+    project = fresh_project
+    project._views[1]["row_count"] = "lots"
+
+    conn = MetricsLayerConnection(project=project, connections=connection._raw_connections[0])
+    mocker.patch("metrics_layer.cli.seeding.SeedMetricsLayer._init_profile", lambda profile, target: conn)
+    mocker.patch("metrics_layer.cli.seeding.SeedMetricsLayer.get_profile", lambda *args: "demo")
+
+    runner = CliRunner()
+    result = runner.invoke(validate)
+
+    assert result.exit_code == 0
+    assert result.output == (
+        "Found 1 error in the project:\n\n"
+        "\nThe view orders has a row_count of lots, the row_count must be a whole number of rows that is not negative\n\n"  # noqa
+    )
+
+
 @pytest.mark.cli
 def test_cli_validate_warnings_for_no_date_on_metrics(connection, fresh_project, mocker):
     # Tests removing the default date and raising a warning for the normal
@@ -1,8 +1,11 @@
 import os
+import sys
 
 import pytest
 
-from metrics_layer.core.parse.github_repo import BaseRepo
+from metrics_layer.core.exceptions import QueryError
+from metrics_layer.core.parse.github_repo import BaseRepo, LocalRepo
+from metrics_layer.core.parse.manifest import Manifest
 from metrics_layer.core.query.query import MetricsLayerConnection
 from metrics_layer.core.parse import MetricsLayerProjectReader, ProjectLoader, MetricflowProjectReader
 
@@ -162,3 +165,61 @@ def test_config_load_metricflow():
     assert not median_revenue_metric["hidden"]
 
     assert len(dashboards) == 0
+
+
+def test_config_load_yaml_parallel(project_repo):
+    serial_reader = MetricsLayerProjectReader(LocalRepo(project_repo))
+    serial = serial_reader.load()
+
+    parallel_reader = MetricsLayerProjectReader(LocalRepo(project_repo))
+    parallel = parallel_reader.load(workers=2)
+
+    # The same definitions come back in the same order
+    assert parallel == serial
+    assert [v["name"] for v in parallel[1]] == [v["name"] for v in serial[1]]
+    assert len(parallel_reader.file_timings) == 22
+    assert all(seconds >= 0 for seconds in parallel_reader.file_timings.values())
+    assert parallel_reader.file_timings.keys() == serial_reader.file_timings.keys()
+
+
+def test_config_load_yaml_interns_strings(project_repo):
+    _, views, _ = MetricsLayerProjectReader(LocalRepo(project_repo)).load()
+
+    first_field, second_field = views[0]["fields"][0], views[1]["fields"][0]
+    first_key = next(k for k in first_field if k == "field_type")
+    second_key = next(k for k in second_field if k == "field_type")
+    assert first_key is second_key
+    assert first_field["name"] is sys.intern(first_field["name"])
+    long_sql = next(f["sql"] for v in views for f in v["fields"] if len(f.get("sql", "")) > 64)
+    assert long_sql is not sys.intern("".join(long_sql))
+
+
+def _manifest_node(resource_type: str, schema: str, alias: str):
+    return {"resource_type": resource_type, "database": "db", "schema": schema, "alias": alias}
+
+
+def test_config_manifest_index():
+    manifest = Manifest(
+        {
+            "nodes": {
+                "model.project.orders": _manifest_node("model", "analytics", "orders"),
+                "model.project.staging_orders": _manifest_node("model", "staging", "orders"),
+                "seed.project.countries": _manifest_node("seed", "analytics", "countries"),
+                "model.other_project.orders": _manifest_node("model", "other", "orders"),
+            }
+        }
+    )
+    assert manifest.resolve_name("orders") == "analytics.orders"
+    assert manifest.resolve_name("countries") == "analytics.countries"
+    assert manifest.resolve_name("staging_orders", schema_override="dev") == "dev.orders"
+    with pytest.raises(QueryError) as exc_info:
+        manifest.resolve_name("missing")
+    assert "Could not find the ref missing" in str(exc_info.value)
+
+    assert manifest.get_model("orders")["schema"] == "analytics"
+    assert manifest.get_model("countries") is None
+    assert manifest.models() == ["analytics.orders", "staging.orders", "other.orders"]
+    assert manifest.models(schema="analytics") == ["analytics.orders"]
+    assert manifest.models(table="orders") == ["analytics.orders", "staging.orders", "other.orders"]
+    assert manifest.models(schema="staging", table="orders") == ["staging.orders"]
+    assert manifest.models(schema="staging", table="countries") == []
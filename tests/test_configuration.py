@@ -1,9 +1,20 @@
+import os
 import pickle
+import subprocess
+import time
 
+import git
 import pytest
+import yaml
 
 from metrics_layer import MetricsLayerConnection
-from metrics_layer.core.parse import ProjectLoader
+from metrics_layer.core.parse import (
+    GithubRepo,
+    MetricsLayerProjectReader,
+    ProjectLoader,
+    ProjectSnapshotCache,
+)
+from metrics_layer.core.exceptions import QueryError
 from metrics_layer.core.parse import ConfigError
 from metrics_layer.core.parse.connections import connection_class_lookup
 from metrics_layer.core.parse.connections import (
@@ -148,3 +159,238 @@ def test_config_does_not_exist():
         ProjectLoader(None)
 
     assert exc_info.value
+
+
+def _counting_yaml_reads(monkeypatch):
+    read_yaml_file = MetricsLayerProjectReader.read_yaml_file
+    reads = []
+
+    def counting_read_yaml_file(path):
+        reads.append(os.path.basename(path))
+        return read_yaml_file(path)
+
+    monkeypatch.setattr(MetricsLayerProjectReader, "read_yaml_file", staticmethod(counting_read_yaml_file))
+    return reads
+
+
+def _git(repo_path: str, *args):
+    identity = ["-c", "user.name=metrics_layer", "-c", "user.email=metrics_layer@example.com"]
+    subprocess.run(["git", *identity, *args], cwd=repo_path, check=True, capture_output=True)
+
+
+def test_config_snapshot_cache_local(monkeypatch, project_repo, tmp_path):
+    snapshot_cache = ProjectSnapshotCache(str(tmp_path / "snapshots"))
+    reads = _counting_yaml_reads(monkeypatch)
+
+    project = ProjectLoader(project_repo, snapshot_cache=snapshot_cache).load()
+    assert len(reads) == 22
+    assert os.path.exists(snapshot_cache.snapshot_path(ProjectLoader(project_repo).repo))
+
+    reads.clear()
+    cached_project = ProjectLoader(project_repo, snapshot_cache=snapshot_cache).load()
+    assert reads == []
+    assert cached_project.content_digest == project.content_digest
+
+    # Only the edited file is parsed again
+    view_path = os.path.join(project_repo, "views", "test_orders.yml")
+    with open(view_path, "a") as f:
+        f.write("\ndescription: Edited description\n")
+    reads.clear()
+    edited_project = ProjectLoader(project_repo, snapshot_cache=snapshot_cache).load()
+    assert reads == ["test_orders.yml"]
+    assert edited_project.get_view("orders").description == "Edited description"
+
+
+def test_config_snapshot_cache_remote(monkeypatch, project_repo, tmp_path):
+    _git(project_repo, "init", "-b", "master")
+    _git(project_repo, "add", "-A")
+    _git(project_repo, "commit", "-m", "Initial commit")
+
+    snapshot_cache = ProjectSnapshotCache(str(tmp_path / "snapshots"))
+    reads = _counting_yaml_reads(monkeypatch)
+
+    def load_remote():
+        loader = ProjectLoader("https://github.com", snapshot_cache=snapshot_cache)
+        loader.repo = GithubRepo(repo_url=f"file://{project_repo}", branch="master")
+        return loader.load()
+
+    project = load_remote()
+    assert len(reads) == 22
+
+    # The remote head didn't move, so the project comes from the snapshot without a clone
+    fetch = GithubRepo.fetch
+    monkeypatch.setattr(GithubRepo, "fetch", lambda *args, **kwargs: pytest.fail("Repo was fetched"))
+    reads.clear()
+    assert load_remote().content_digest == project.content_digest
+    assert reads == []
+
+    # After a new commit only the changed file is parsed, even though the clone is fresh
+    monkeypatch.setattr(GithubRepo, "fetch", fetch)
+    with open(os.path.join(project_repo, "views", "test_orders.yml"), "a") as f:
+        f.write("\ndescription: Edited description\n")
+    _git(project_repo, "commit", "-am", "Edit orders")
+    edited_project = load_remote()
+    assert reads == ["test_orders.yml"]
+    assert edited_project.get_view("orders").description == "Edited description"
+
+
+def _edit_yaml(path: str, edit):
+    with open(path) as f:
+        yaml_dict = yaml.safe_load(f)
+    edit(yaml_dict)
+    MetricsLayerProjectReader.dump_yaml_file(yaml_dict, path)
+
+
+def test_config_reload_changed(monkeypatch, project_repo):
+    reads = _counting_yaml_reads(monkeypatch)
+    conn = MetricsLayerConnection(location=project_repo)
+    conn.load()
+    project = conn.project
+    project.get_field("orders.total_revenue")
+    graph = project.join_graph.graph
+
+    reads.clear()
+    assert not conn.reload_changed()
+    assert reads == []
+    assert conn.project is project
+
+    # Dashboards don't feed into views or joins, so every cache is kept
+    dashboard_path = os.path.join(project_repo, "dashboards", "sales_dashboard.yml")
+    _edit_yaml(dashboard_path, lambda d: d.update({"description": "Edited description"}))
+    assert conn.reload_changed()
+    assert reads == ["sales_dashboard.yml"]
+    dashboard_project = conn.project
+    assert dashboard_project is not project
+    assert dashboard_project.get_dashboard("sales_dashboard").description == "Edited description"
+    assert project.get_dashboard("sales_dashboard").description != "Edited description"
+    assert dashboard_project.join_graph.graph is graph
+    assert dashboard_project.get_field("orders.total_revenue").view.project is dashboard_project
+
+    # A new field keeps the join graph but the field indexes are rebuilt
+    new_field = {"name": "new_dimension", "field_type": "dimension", "type": "string", "sql": "${TABLE}.new"}
+    view_path = os.path.join(project_repo, "views", "test_orders.yml")
+    _edit_yaml(view_path, lambda v: v["fields"].append(new_field))
+    reads.clear()
+    assert conn.reload_changed()
+    assert reads == ["test_orders.yml"]
+    field_project = conn.project
+    assert field_project._field_indexes == {}
+    assert field_project.join_graph.graph is graph
+    assert field_project.get_field("orders.new_dimension").sql == "${TABLE}.new"
+    assert not dashboard_project.does_field_exist("orders.new_dimension")
+
+    # Changing an identifier means the join graph has to be rebuilt
+    _edit_yaml(view_path, lambda v: v["identifiers"].pop())
+    assert conn.reload_changed()
+    assert conn.project._join_graph is None
+    assert conn.project.join_graph.graph is not graph
+
+
+def test_config_reload_changed_timezone(project_repo):
+    conn = MetricsLayerConnection(location=project_repo)
+    conn.load()
+    project = conn.project
+    project.get_field("orders.order_date")
+    project.join_graph.build()
+
+    dashboard_path = os.path.join(project_repo, "dashboards", "sales_dashboard.yml")
+    _edit_yaml(dashboard_path, lambda d: d.update({"description": "Edited description"}))
+    assert conn.reload_changed()
+
+    # The settings of the reloaded project have to reach its fields, not the ones of the project before it
+    conn.project.set_timezone("America/New_York")
+    conn.project.set_connection_schema("analytics_dev")
+    field = conn.project.get_field("orders.order_date")
+    assert field.view.project is conn.project
+    assert project.timezone is None
+    assert "America/New_York" in field.sql_query("SNOWFLAKE")
+
+    # A timezone set at runtime is kept through the next reload
+    _edit_yaml(dashboard_path, lambda d: d.update({"description": "Edited again"}))
+    assert conn.reload_changed()
+    assert conn.project.timezone == "America/New_York"
+    assert conn.project._connection_schema == "analytics_dev"
+    assert "America/New_York" in conn.project.get_field("orders.order_date").sql_query("SNOWFLAKE")
+
+
+def test_config_reload_changed_watcher(project_repo):
+    conn = MetricsLayerConnection(location=project_repo)
+    with pytest.raises(QueryError) as exc_info:
+        conn.watch()
+    assert "load()" in str(exc_info.value)
+
+    conn.load()
+    project = conn.project
+    watcher = conn.watch(interval=0.01)
+    assert watcher.running
+    try:
+        # A half written file is skipped and the current project is kept
+        view_path = os.path.join(project_repo, "views", "test_orders.yml")
+        with open(view_path) as f:
+            original = f.read()
+        with open(view_path, "w") as f:
+            f.write(original + "\nfields: [")
+        assert not watcher.poll()
+        assert watcher.last_error is not None
+        assert conn.project is project
+
+        with open(view_path, "w") as f:
+            f.write(original + "\ndescription: Edited description\n")
+        deadline = time.monotonic() + 10
+        while conn.project is project and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert conn.project.get_view("orders").description == "Edited description"
+        assert watcher.reloads >= 1
+    finally:
+        conn.stop_watching()
+    assert not watcher.running
+
+
+def test_config_github_repo_mirror(monkeypatch, project_repo, tmp_path):
+    os.makedirs(os.path.join(project_repo, "analysis"))
+    with open(os.path.join(project_repo, "analysis", "notes.yml"), "w") as f:
+        f.write("type: view\nname: not_in_the_project\n")
+    _git(project_repo, "init", "-b", "master")
+    _git(project_repo, "add", "-A")
+    _git(project_repo, "commit", "-m", "Initial commit")
+    _git(project_repo, "branch", "dev")
+
+    clone_from = git.Repo.clone_from
+    bare_clones = []
+
+    def counting_clone_from(url, to_path, **kwargs):
+        if kwargs.get("bare"):
+            bare_clones.append(url)
+        return clone_from(url, to_path, **kwargs)
+
+    monkeypatch.setattr(git.Repo, "clone_from", counting_clone_from)
+    mirror_dir = str(tmp_path / "mirrors")
+    repo_url = f"file://{project_repo}"
+
+    # Only the project's folders are checked out
+    repo = GithubRepo(repo_url=repo_url, branch="master", mirror_dir=mirror_dir)
+    repo.fetch()
+    try:
+        assert os.path.isdir(os.path.join(repo.folder, "views"))
+        assert os.path.exists(os.path.join(repo.folder, "zenlytic_project.yml"))
+        assert not os.path.exists(os.path.join(repo.folder, "analysis"))
+        assert repo.git_repo.remote().url == repo_url
+        assert sorted(repo.branch_options) == ["dev", "master"]
+    finally:
+        repo.delete()
+    assert bare_clones == [repo_url]
+    assert os.path.isdir(repo.mirror_path())
+
+    # New commits are fetched into the existing mirror instead of cloning again
+    with open(os.path.join(project_repo, "views", "test_orders.yml"), "a") as f:
+        f.write("\ndescription: Edited description\n")
+    _git(project_repo, "commit", "-am", "Edit orders")
+    loader = ProjectLoader(repo_url, branch="master", mirror_dir=mirror_dir)
+    assert isinstance(loader.repo, GithubRepo)
+    project = loader.load()
+    assert project.get_view("orders").description == "Edited description"
+    assert not os.path.exists(loader.repo.folder)
+
+    dev_project = ProjectLoader(repo_url, branch="dev", mirror_dir=mirror_dir).load()
+    assert dev_project.get_view("orders").description != "Edited description"
+    assert bare_clones == [repo_url]
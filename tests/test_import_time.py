@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+# These are only imported once a query is compiled or run, a project is dumped or a repo is cloned
+HEAVY_MODULES = ["pandas", "networkx", "pypika", "pendulum", "sqlparse", "git", "ruamel", "yaml"]
+
+# Generous so slow machines pass, importing pandas alone takes longer than this on most machines
+IMPORT_TIME_BUDGET_SECONDS = 0.75
+
+
+def _import_times(statement: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    # Each line looks like "import time: self [us] | cumulative | imported package"
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import metrics_layer",
+        "from metrics_layer import MetricsLayerConnection",
+        "from metrics_layer import cli_group",
+    ],
+)
+def test_import_time(statement):
+    times = _import_times(statement)
+
+    heavy_imports = sorted({m.split(".")[0] for m in times} & set(HEAVY_MODULES))
+    assert heavy_imports == []
+    assert times["metrics_layer"] < IMPORT_TIME_BUDGET_SECONDS
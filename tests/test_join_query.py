@@ -942,3 +942,127 @@ def test_join_as_label(connection):
     view = connection.project.get_view("parent_account")
     assert view.name == "parent_account"
     assert view.fields()[0].label == "Parent Account Id"
+
+
+@pytest.mark.query
+def test_join_plan_cache(fresh_project, connections, monkeypatch):
+    from metrics_layer.core import MetricsLayerConnection
+    from metrics_layer.core.sql.query_design import MetricsLayerDesign
+
+    conn = MetricsLayerConnection(project=fresh_project, connections=connections)
+    query = conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["region", "new_vs_repeat"])
+
+    planned = []
+    original_determine_joins = MetricsLayerDesign._determine_joins
+    monkeypatch.setattr(
+        MetricsLayerDesign,
+        "_determine_joins",
+        lambda self, views: planned.append(views) or original_determine_joins(self, views),
+    )
+    assert conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["region", "new_vs_repeat"]) == query
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["new_vs_repeat", "region"])
+    assert planned == []
+
+    # Other views have their own plan, and rebuilding the join graph drops the plans
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["region"])
+    assert len(planned) == 1
+    fresh_project.refresh_cache()
+    assert conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["region", "new_vs_repeat"]) == query
+    assert len(planned) == 2
+
+
+@pytest.mark.query
+def test_join_plan_cache_across_threads(fresh_project, monkeypatch):
+    import threading
+    import time
+    from collections import OrderedDict
+    from concurrent.futures import ThreadPoolExecutor
+
+    moving = threading.Event()
+
+    class SlowOrderedDict(OrderedDict):
+        def move_to_end(self, key, last=True):
+            # Gives the other thread time to evict the plan before it's moved
+            moving.set()
+            time.sleep(0.2)
+            super().move_to_end(key, last=last)
+
+    monkeypatch.setattr("metrics_layer.core.model.join_graph.JOIN_PLAN_CACHE_SIZE", 1)
+    join_graph = fresh_project.join_graph
+    join_graph._join_plans = SlowOrderedDict()
+    plan = join_graph.join_plan("test_model", ["orders", "customers"])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cached_plan = executor.submit(join_graph.join_plan, "test_model", ["orders", "customers"])
+        moving.wait(timeout=5)
+        other_plan = join_graph.join_plan("test_model", ["orders", "order_lines"])
+
+    assert cached_plan.result() is plan
+    assert other_plan is not plan
+    assert len(join_graph._join_plans) == 1
+
+
+@pytest.mark.query
+def test_query_join_planner_steiner(connection):
+    kwargs = {"metrics": ["total_item_revenue"], "dimensions": ["region", "new_vs_repeat"]}
+    greedy_query = connection.get_sql_query(**kwargs)
+    steiner_query = connection.get_sql_query(**kwargs, join_planner="steiner")
+
+    def join_clauses(query):
+        return set(query.split(" GROUP BY ")[0].split(" LEFT JOIN ")[1:])
+
+    assert steiner_query.startswith("SELECT customers.region as customers_region")
+    assert "FROM analytics.order_line_items order_lines LEFT JOIN" in steiner_query
+    assert join_clauses(steiner_query) == join_clauses(greedy_query)
+
+    with pytest.raises(QueryError) as exc_info:
+        connection.get_sql_query(**kwargs, join_planner="fastest")
+
+    assert exc_info.value
+
+
+@pytest.mark.query
+def test_steiner_join_planner_costs():
+    import networkx
+
+    from metrics_layer.core.sql import join_planner
+    from metrics_layer.core.sql.join_planner import SteinerJoinPlanner
+
+    graph = networkx.DiGraph()
+    # Joining a and b through the hub is cheaper than the chain that joins them one by one
+    for view_name in ["a", "b", "c"]:
+        graph.add_edge("hub", view_name, weight=2)
+        graph.add_edge(view_name, "hub", weight=2)
+    graph.add_edge("a", "chain", weight=1)
+    graph.add_edge("chain", "b", weight=4)
+    graph.add_edge("a", "small_bridge", weight=3)
+    graph.add_edge("small_bridge", "b", weight=3)
+
+    planner = SteinerJoinPlanner(graph)
+    assert planner.plan(["a", "b"]) == [("a", "hub"), ("hub", "b")]
+    assert planner.plan(["a", "b", "c"]) == [("a", "hub"), ("hub", "b"), ("hub", "c")]
+    assert planner.plan(["a"]) == []
+
+    # Once the hub and the chain are known to be big tables, the bridge is used instead
+    table_sizes = {"hub": 10_000_000, "chain": 10_000_000, "small_bridge": 10}
+    planner = SteinerJoinPlanner(graph, table_sizes=table_sizes)
+    assert planner.plan(["a", "b"]) == [("a", "small_bridge"), ("small_bridge", "b")]
+
+    with pytest.raises(networkx.exception.NetworkXNoPath):
+        SteinerJoinPlanner(graph).plan(["a", "does_not_exist"])
+
+    # The approximate tree for many views is a valid tree, and as cheap as the exact one here
+    views = ["a", "b", "c", "chain"]
+    exact = SteinerJoinPlanner(graph).plan(views)
+    join_planner.STEINER_EXACT_MAX_VIEWS, max_views = 1, join_planner.STEINER_EXACT_MAX_VIEWS
+    try:
+        approximate = SteinerJoinPlanner(graph).plan(views)
+    finally:
+        join_planner.STEINER_EXACT_MAX_VIEWS = max_views
+
+    def tree_cost(pairs):
+        return sum(graph[base][join]["weight"] for base, join in pairs)
+
+    assert tree_cost(approximate) == tree_cost(exact)
+    assert set(views) <= set(v for pair in approximate for v in pair)
+    assert len(set(join for _, join in approximate)) == len(approximate)
@@ -1,6 +1,11 @@
+import gc
+from copy import deepcopy
+
 import pytest
 
-from metrics_layer.core.exceptions import AccessDeniedOrDoesNotExistException
+from metrics_layer.core.exceptions import AccessDeniedOrDoesNotExistException, QueryError
+from metrics_layer.core.model.project import Project
+from metrics_layer.core.model.project_registry import ProjectRegistry
 
 
 @pytest.mark.project
@@ -79,6 +84,20 @@ def test_add_with_join_graphs_field_cache(connection):
     connection.project.remove_field("rps", view_name="order_lines")
 
 
+@pytest.mark.project
+def test_remove_field_mixed_case_name(fresh_project):
+    fresh_project.add_field(
+        {"name": "Total_New_Revenue", "type": "sum", "field_type": "measure", "sql": "${TABLE}.revenue"},
+        view_name="orders",
+    )
+    assert fresh_project.get_field("orders.total_new_revenue").name == "total_new_revenue"
+
+    fresh_project.remove_field("total_new_revenue", view_name="orders")
+    assert not fresh_project.does_field_exist("orders.total_new_revenue")
+    orders_view = next(v for v in fresh_project._views if v["name"] == "orders")
+    assert all(f["name"].lower() != "total_new_revenue" for f in orders_view["fields"])
+
+
 @pytest.mark.project
 def test_add_field_personal_fields_are_warnings(connection):
     connection.project.add_field(
@@ -97,3 +116,241 @@ def test_add_field_personal_fields_are_warnings(connection):
     assert all("Warning:" in e for e in errors)
 
     connection.project.remove_field("total_new_revenue", view_name="orders")
+
+
+@pytest.mark.project
+def test_field_index_lookups(connection):
+    revenue_field = connection.project.get_field("orders.total_revenue")
+
+    assert connection.project.get_field("total_revenue") is revenue_field
+    assert connection.project.get_field("total_revenue", view_name="orders") is revenue_field
+    by_name_field = connection.project.get_field_by_name("total_revenue", view_name="orders")
+    assert by_name_field.id() == revenue_field.id()
+
+    customer_field = connection.project.get_field_by_tag("customers")
+    assert customer_field.id() == "customers.customer_id"
+    assert connection.project.get_field_by_tag("customer", view_name="customers") is customer_field
+
+    with pytest.raises(AccessDeniedOrDoesNotExistException) as exc_info:
+        connection.project.get_field("total_revenue", view_name="orders_does_not_exist")
+
+    assert exc_info.value.object_name == "orders_does_not_exist"
+    assert exc_info.value.object_type == "view"
+
+
+@pytest.mark.project
+def test_field_index_user_scope(connection):
+    connection.project.set_user({"department": "engineering"})
+    with pytest.raises(AccessDeniedOrDoesNotExistException):
+        connection.project.get_field("orders.total_revenue")
+
+    connection.project.set_user(None)
+    assert connection.project.get_field("orders.total_revenue").id() == "orders.total_revenue"
+
+
+@pytest.mark.project
+def test_view_registry(connection):
+    view = connection.project.get_view("orders")
+
+    assert connection.project.get_view("orders") is view
+    assert next(v for v in connection.project.views() if v.name == "orders") is view
+
+    expanded_names = [f.alias() for f in view.fields(expand_dimension_groups=True)]
+    assert "order_date" in expanded_names
+    assert "order_date" not in [f.alias() for f in view.fields()]
+
+    connection.project.add_field(
+        {"name": "total_new_revenue", "type": "sum", "field_type": "measure", "sql": "${TABLE}.revenue"},
+        view_name="orders",
+    )
+    assert connection.project.get_view("orders") is not view
+
+    connection.project.remove_field("total_new_revenue", view_name="orders")
+
+
+@pytest.mark.project
+def test_project_identity_key(fresh_project, monkeypatch):
+    identity_key = fresh_project.identity_key
+    project_hash = hash(fresh_project)
+
+    digests = []
+    original_digest = Project._digest
+    monkeypatch.setattr(Project, "_digest", staticmethod(lambda v: digests.append(v) or original_digest(v)))
+
+    field = fresh_project.get_field("orders.total_revenue")
+    for _ in range(10):
+        assert hash(fresh_project) == project_hash
+        assert hash(field) == hash(field)
+    assert digests == []
+
+    fresh_project.set_user({"department": "sales"})
+    assert fresh_project.identity_key[0] == identity_key[0]
+    assert fresh_project.identity_key[1] != identity_key[1]
+    assert hash(fresh_project) != project_hash
+
+    fresh_project.add_field(
+        {"name": "total_new_revenue", "type": "sum", "field_type": "measure", "sql": "${TABLE}.revenue"},
+        view_name="orders",
+    )
+    assert fresh_project.identity_key[0] != identity_key[0]
+    # Only the user and the added field are digested, never the whole project
+    assert len(digests) == 2
+
+
+@pytest.mark.project
+def test_model_hash_and_equality(fresh_project):
+    model, same_model = fresh_project.get_model("test_model"), fresh_project.get_model("test_model")
+
+    assert model is not same_model
+    assert model == same_model
+    assert hash(model) == hash(same_model)
+    assert model != fresh_project.get_model("new_model")
+
+
+@pytest.mark.project
+def test_project_shares_definitions_without_changing_them(fresh_models, fresh_views, fresh_dashboards):
+    original_views = deepcopy(fresh_views)
+    project = Project(models=fresh_models, views=fresh_views, dashboards=fresh_dashboards)
+    other_project = Project(models=fresh_models, views=fresh_views, dashboards=fresh_dashboards)
+
+    for field in project.fields(expand_dimension_groups=True):
+        field.sql
+    project.join_graph.build()
+    project.get_model("test_model").mappings
+    project.add_field(
+        {"name": "total_new_revenue", "type": "sum", "field_type": "measure", "sql": "${TABLE}.revenue"},
+        view_name="orders",
+    )
+
+    assert fresh_views == original_views
+    assert project.get_field("parent_account.account_id").label == "Parent Account Id"
+    assert project.get_field("accounts.account_id").label == "Account Id"
+    assert project.get_field("total_new_revenue").view.name == "orders"
+    with pytest.raises(AccessDeniedOrDoesNotExistException):
+        other_project.get_field("total_new_revenue")
+
+
+@pytest.mark.project
+def test_project_registry_shares_definitions(fresh_models, fresh_views, fresh_dashboards):
+    registry = ProjectRegistry()
+    main = registry.build_project(fresh_models, fresh_views, fresh_dashboards, looker_env="prod")
+    n_definitions = registry.definition_count
+
+    branch_views = deepcopy(fresh_views)
+    orders_view = next(v for v in branch_views if v["name"] == "orders")
+    orders_view["fields"][-1] = {**orders_view["fields"][-1], "description": "Changed on the branch"}
+    branch = registry.build_project(fresh_models, branch_views, fresh_dashboards, looker_env="prod")
+
+    # Only the changed field and the view holding it are new
+    assert registry.definition_count == n_definitions + 2
+    main_views = {v["name"]: v for v in main._views}
+    for view in branch._views:
+        main_fields = main_views[view["name"]]["fields"]
+        if view["name"] == "orders":
+            assert view["fields"][:-1] == main_fields[:-1]
+            assert all(f is main_f for f, main_f in zip(view["fields"][:-1], main_fields[:-1]))
+            assert view["fields"][-1] is not main_fields[-1]
+        else:
+            assert view["fields"] is main_fields
+
+    assert branch.join_graph.graph is main.join_graph.graph
+    assert branch.join_graph.project is branch
+    field_name = orders_view["fields"][-1]["name"]
+    assert branch.get_field(f"orders.{field_name}").description == "Changed on the branch"
+    assert main.get_field(f"orders.{field_name}").description != "Changed on the branch"
+
+    del branch
+    gc.collect()
+    assert registry.definition_count == n_definitions
+
+
+@pytest.mark.project
+def test_field_records_are_compact(connection):
+    field = connection.project.get_field("orders.order_date")
+    other_field = connection.project.get_field("orders.total_revenue")
+
+    assert field.defaults is other_field.defaults
+    assert field.default_intervals is other_field.default_intervals
+    assert field.name == "order"
+    assert field.dimension_group == "date"
+    assert field.sql_query("SNOWFLAKE") == "DATE_TRUNC('DAY', orders.order_date)"
+    assert other_field.missing_attribute is None
+
+    with pytest.raises(AttributeError):
+        field.unknown_attribute = True
+
+
+@pytest.mark.project
+def test_join_graph_hash_maps(fresh_project):
+    import networkx
+
+    join_graph = fresh_project.join_graph
+    graph = join_graph.graph
+    components = join_graph._strongly_connected_components(graph)
+
+    assert join_graph.list_join_graphs() == [f"subquery_{i}" for i in range(len(components))]
+    for view_name in graph.nodes:
+        strong_hash = next(f"subquery_{i}" for i, c in enumerate(components) if view_name in c)
+        # A view is in every join graph it can be reached from
+        weak_hashes = [
+            f"subquery_{i}"
+            for i, c in enumerate(components)
+            if view_name in set(c).union(*(networkx.descendants(graph, v) for v in c))
+        ]
+        assert join_graph.join_graph_hash_map[view_name] == strong_hash
+        assert join_graph.join_graph_hash(view_name) == strong_hash
+        assert join_graph.weak_join_graph_hashes_map[view_name] == weak_hashes
+        assert join_graph.weak_join_graph_hashes(view_name) == weak_hashes
+
+    assert join_graph.weak_join_graph_hashes("does_not_exist") == []
+    with pytest.raises(QueryError):
+        join_graph.join_graph_hash("does_not_exist")
+
+
+@pytest.mark.project
+def test_field_join_graphs_map(fresh_project):
+    model = fresh_project.get_model("test_model")
+    join_graph = fresh_project.join_graph
+    field_join_graphs = join_graph.field_join_graphs(model)
+
+    fields = fresh_project.fields(expand_dimension_groups=True) + fresh_project.fields()
+    for field in fields:
+        field_id = field.id()
+        assert list(field_join_graphs[field_id]) == field._build_join_graphs()
+        assert field.join_graphs() == field._build_join_graphs()
+
+    revenue_field = fresh_project.get_field("order_lines.total_item_revenue")
+    joinable = fresh_project.joinable_fields([revenue_field], expand_dimension_groups=True)
+    expected = [
+        f
+        for f in fresh_project.fields(expand_dimension_groups=True)
+        if set(f.join_graphs()) & set(revenue_field.join_graphs())
+    ]
+    assert [f.id() for f in joinable] == [f.id() for f in expected]
+    assert fresh_project.joinable_fields([]) == []
+
+
+@pytest.mark.project
+def test_merged_results_graph_pair_roots(fresh_project):
+    model = fresh_project.get_model("test_model")
+    join_graph = fresh_project.join_graph
+    graph = join_graph.merged_results_graph(model)
+
+    canon_dates = join_graph._canon_dates_by_join_graph(
+        [f for f in fresh_project.fields(model=model) if f.canon_date and f.field_type == "measure"]
+    )
+    hash_1, hash_2 = sorted(canon_dates)[:2]
+    shared_fields = {
+        f.id()
+        for v in fresh_project.views(model=model)
+        if {hash_1, hash_2} <= set(join_graph.weak_join_graph_hashes(v.name))
+        for f in fresh_project.fields(view_name=v.name, model=model, expand_dimension_groups=True)
+    }
+    pair_measures = {m for h in (hash_1, hash_2) for _, m, _ in canon_dates[h]}
+    pair_roots = [n for n in graph.nodes if n.startswith(f"{hash_1}_{hash_2}_")]
+
+    assert pair_roots
+    for root in pair_roots:
+        successors = set(graph.successors(root))
+        assert shared_fields <= successors
+        assert pair_measures & successors
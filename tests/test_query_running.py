@@ -1,10 +1,16 @@
+import asyncio
+import time
+
 import pandas as pd
 import pytest
 
 from metrics_layer.core import MetricsLayerConnection
 from metrics_layer.core.model.project import Project
 from metrics_layer.core.exceptions import QueryError
+from metrics_layer.core.parse.connections import MetricsLayerConnectionError
 from metrics_layer.core.sql import QueryRunner
+from metrics_layer.core.sql.connection_pool import ConnectionPool
+from metrics_layer.core.sql.result_cache import DiskResultCache, MemoryResultCache
 
 
 @pytest.mark.running
@@ -72,3 +78,564 @@ def test_run_query_no_connection_error(project):
         conn.query(metrics=["total_item_revenue"], dimensions=["channel"])
 
     assert exc_info.value
+
+
+@pytest.fixture(scope="function")
+def counting_snowflake_connection(monkeypatch, models, views):
+    connections = [
+        {
+            "type": "SNOWFLAKE",
+            "name": "sf_name",
+            "account": "sf_account",
+            "username": "sf_username",
+            "password": "sf_password",
+        }
+    ]
+    sf_models = [{**m, "connection": "sf_name"} for m in models]
+    project = Project(models=sf_models, views=views)
+
+    calls = []
+
+    def run_snowflake_query(*args, **kwargs):
+        calls.append(args)
+        return pd.DataFrame({"channel": ["cat1", "cat2"], "total_item_revenue": [12.5, 21.0]})
+
+    monkeypatch.setattr(QueryRunner, "_run_snowflake_query", run_snowflake_query)
+    return project, connections, calls
+
+
+@pytest.mark.running
+@pytest.mark.parametrize("cache_type", ["memory", "disk"])
+def test_run_query_result_cache_modes(counting_snowflake_connection, tmp_path, cache_type):
+    project, connections, calls = counting_snowflake_connection
+    if cache_type == "memory":
+        result_cache = MemoryResultCache()
+    else:
+        result_cache = DiskResultCache(str(tmp_path))
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=result_cache)
+    args = {"metrics": ["total_item_revenue"], "dimensions": ["channel"]}
+
+    df = conn.query(**args)
+    cached_df = conn.query(**args)
+    assert len(calls) == 1
+    assert cached_df.equals(df)
+    assert result_cache.info()["hits"] == 1
+
+    # Changing the cached frame must not change the cached result
+    cached_df["channel"] = "changed"
+    assert conn.query(**args).equals(df)
+
+    conn.query(**args, cache="bypass")
+    assert len(calls) == 2
+    conn.query(**args, cache="refresh")
+    assert len(calls) == 3
+    conn.query(**args, cache="use")
+    assert len(calls) == 3
+    assert len(result_cache) == 1
+
+    conn.query(metrics=["total_item_revenue"], dimensions=["new_vs_repeat"])
+    assert len(calls) == 4
+    assert len(result_cache) == 2
+
+    with pytest.raises(QueryError) as exc_info:
+        conn.query(**args, cache="sometimes")
+
+    assert "Unknown cache option sometimes" in exc_info.value.message
+
+
+@pytest.mark.running
+def test_run_query_result_cache_ttl_and_eviction(counting_snowflake_connection, monkeypatch):
+    project, connections, calls = counting_snowflake_connection
+    now = 1000.0
+    monkeypatch.setattr("metrics_layer.core.sql.result_cache.time.time", lambda: now)
+
+    result_cache = MemoryResultCache(ttl=3600, connection_ttls={"sf_name": 60})
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=result_cache)
+    args = {"metrics": ["total_item_revenue"], "dimensions": ["channel"]}
+
+    conn.query(**args)
+    now = 1059.0
+    conn.query(**args)
+    assert len(calls) == 1
+
+    # The connection specific ttl takes precedence over the default
+    now = 1061.0
+    conn.query(**args)
+    assert len(calls) == 2
+
+    entry_size = result_cache.size
+    result_cache.max_bytes = entry_size + 1
+    conn.query(metrics=["total_item_revenue"], dimensions=["new_vs_repeat"])
+    assert len(result_cache) == 1
+    assert result_cache.info()["evictions"] == 1
+    conn.query(**args)
+    assert len(calls) == 4
+
+
+@pytest.mark.running
+def test_run_query_disk_result_cache_persists(counting_snowflake_connection, tmp_path):
+    project, connections, calls = counting_snowflake_connection
+    args = {"metrics": ["total_item_revenue"], "dimensions": ["channel"]}
+
+    conn = MetricsLayerConnection(
+        project=project, connections=connections, result_cache=DiskResultCache(str(tmp_path))
+    )
+    df = conn.query(**args)
+
+    # A new cache over the same directory picks up results written by another process
+    result_cache = DiskResultCache(str(tmp_path))
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=result_cache)
+    assert conn.query(**args).equals(df)
+    assert len(calls) == 1
+
+    result_cache.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.running
+def test_run_query_disk_result_cache_write_fails(
+    counting_snowflake_connection, tmp_path, monkeypatch, capsys
+):
+    project, connections, calls = counting_snowflake_connection
+    # pyarrow can't write an object column that mixes types
+    mixed_df = pd.DataFrame({"channel": [1, "cat2"], "total_item_revenue": [12.5, 21.0]})
+    monkeypatch.setattr(QueryRunner, "_run_snowflake_query", lambda *args, **kwargs: mixed_df)
+
+    result_cache = DiskResultCache(str(tmp_path))
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=result_cache)
+    df = conn.query(metrics=["total_item_revenue"], dimensions=["channel"])
+
+    assert df.equals(mixed_df)
+    assert "WARNING: could not cache the query result" in capsys.readouterr().out
+    assert len(result_cache) == 0
+    assert result_cache.size == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.running
+def test_result_cache_size_running_total(counting_snowflake_connection):
+    project, connections, _ = counting_snowflake_connection
+    result_cache = MemoryResultCache()
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=result_cache)
+
+    for dimension in ["channel", "new_vs_repeat", "order_lines.order_id"]:
+        conn.query(metrics=["total_item_revenue"], dimensions=[dimension])
+    entry_sizes = [size for _, size in result_cache._entries.values()]
+    assert result_cache.size == sum(entry_sizes)
+
+    result_cache.max_bytes = sum(entry_sizes[1:])
+    conn.query(metrics=["total_item_revenue"], dimensions=["channel"], cache="refresh")
+    assert result_cache.size == sum(size for _, size in result_cache._entries.values())
+    assert result_cache.size <= result_cache.max_bytes
+
+    result_cache.clear()
+    assert result_cache.size == 0
+
+
+class FakeSnowflakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, timeout=None):
+        if self.connection.closed:
+            raise RuntimeError("Connection is closed")
+        self.connection.queries.append(query)
+
+    def fetch_pandas_all(self):
+        return pd.DataFrame({"channel": ["cat1"], "total_item_revenue": [12.5]})
+
+
+class FakeSnowflakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.queries = []
+        self.pre_queries = []
+
+    def cursor(self):
+        return FakeSnowflakeCursor(self)
+
+    def execute_string(self, to_execute):
+        self.pre_queries.append(to_execute)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(scope="function")
+def fake_snowflake_connection(monkeypatch, models, views):
+    connections = [
+        {
+            "type": "SNOWFLAKE",
+            "name": "sf_name",
+            "account": "sf_account",
+            "username": "sf_username",
+            "password": "sf_password",
+            "warehouse": "compute_wh",
+            "database": "analytics",
+            "schema": "marts",
+        }
+    ]
+    sf_models = [{**m, "connection": "sf_name"} for m in models]
+    project = Project(models=sf_models, views=views)
+
+    opened = []
+
+    def get_snowflake_connection(connection):
+        opened.append(FakeSnowflakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(QueryRunner, "_get_snowflake_connection", staticmethod(get_snowflake_connection))
+    monkeypatch.setattr(QueryRunner, "connection_pool", ConnectionPool(max_size=2, health_check_after=0))
+    return MetricsLayerConnection(project=project, connections=connections), opened
+
+
+@pytest.mark.running
+def test_run_query_without_connection_pool(fake_snowflake_connection):
+    conn, opened = fake_snowflake_connection
+    conn.query(metrics=["total_item_revenue"], dimensions=["channel"])
+    conn.query(metrics=["total_item_revenue"], dimensions=["channel"])
+
+    assert len(opened) == 2
+    assert all(c.closed for c in opened)
+    assert all(len(c.pre_queries) == 1 for c in opened)
+
+
+@pytest.mark.running
+def test_run_query_with_connection_pool(fake_snowflake_connection):
+    conn, opened = fake_snowflake_connection
+    df = conn.query(metrics=["total_item_revenue"], dimensions=["channel"], use_connection_pool=True)
+    conn.query(metrics=["total_item_revenue"], dimensions=["channel"], use_connection_pool=True)
+
+    assert df.equals(pd.DataFrame({"channel": ["cat1"], "total_item_revenue": [12.5]}))
+    assert len(opened) == 1
+    assert not opened[0].closed
+    assert len(opened[0].queries) == 2
+    # The session keeps the warehouse, database and schema, so they're only set once
+    assert opened[0].pre_queries == ['USE WAREHOUSE compute_wh;USE DATABASE "ANALYTICS";USE SCHEMA "MARTS";']
+
+    # A connection that fails its health check is replaced
+    opened[0].close()
+    conn.query(metrics=["total_item_revenue"], dimensions=["channel"], use_connection_pool=True)
+    assert len(opened) == 2
+    assert len(opened[1].queries) == 1
+
+    QueryRunner.connection_pool.close_all()
+    assert opened[1].closed
+
+
+@pytest.mark.running
+def test_connection_pool_limits():
+    pool = ConnectionPool(max_size=1, idle_timeout=60, checkout_timeout=0.01)
+    opened = []
+
+    def connect():
+        opened.append(FakeSnowflakeConnection())
+        return opened[-1]
+
+    with pool.connection("key", connect) as pooled:
+        with pytest.raises(MetricsLayerConnectionError) as exc_info:
+            with pool.connection("key", connect):
+                pass
+        assert "Timed out" in str(exc_info.value)
+        assert pool.size("key") == 1
+    assert pool.idle_size("key") == 1
+
+    # Errors while the connection is checked out discard it
+    with pytest.raises(RuntimeError):
+        with pool.connection("key", connect):
+            raise RuntimeError("query failed")
+    assert pooled.connection.closed
+    assert pool.size("key") == 0
+
+    with pool.connection("key", connect) as pooled:
+        pass
+    pooled.last_used -= 61
+    with pool.connection("key", connect):
+        pass
+    assert len(opened) == 3
+    assert opened[1].closed
+
+
+@pytest.mark.running
+def test_connection_pool_releases_on_base_exception():
+    pool = ConnectionPool(max_size=1, checkout_timeout=0.01)
+    opened = []
+
+    def connect():
+        opened.append(FakeSnowflakeConnection())
+        return opened[-1]
+
+    # An interrupt while the connection is checked out still frees its slot
+    with pytest.raises(KeyboardInterrupt):
+        with pool.connection("key", connect):
+            raise KeyboardInterrupt()
+    assert pool.size("key") == 0
+    assert opened[0].closed
+
+    def interrupted_connect():
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        with pool.connection("key", interrupted_connect):
+            pass
+    assert pool.size("key") == 0
+
+    with pool.connection("key", connect):
+        pass
+    assert pool.idle_size("key") == 1
+
+
+@pytest.fixture(scope="function")
+def duck_db_connection(tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    database = str(tmp_path / "local.duckdb")
+    duck_db_connection = duckdb.connect(database)
+    duck_db_connection.execute("create table orders (id integer, channel varchar, revenue double)")
+    duck_db_connection.execute(
+        "insert into orders values (1, 'web', 10.0), (2, 'web', 5.5), (3, 'store', 7.0)"
+    )
+    duck_db_connection.close()
+
+    models = [{"version": 1, "type": "model", "name": "local", "connection": "local_duck_db"}]
+    views = [
+        {
+            "version": 1,
+            "type": "view",
+            "name": "orders",
+            "model_name": "local",
+            "sql_table_name": "orders",
+            "fields": [
+                {"name": "id", "field_type": "dimension", "primary_key": "yes", "sql": "${TABLE}.id"},
+                {"name": "channel", "field_type": "dimension", "type": "string", "sql": "${TABLE}.channel"},
+                {"name": "revenue", "field_type": "measure", "type": "sum", "sql": "${TABLE}.revenue"},
+                {"name": "number_of_orders", "field_type": "measure", "type": "count", "sql": "${TABLE}.id"},
+                {"name": "smallest_order", "field_type": "measure", "type": "min", "sql": "${TABLE}.revenue"},
+            ],
+        }
+    ]
+    dashboards = [
+        {
+            "version": 1,
+            "type": "dashboard",
+            "name": "local_dashboard",
+            "filters": [{"field": "orders.channel", "value": "-online"}],
+            "elements": [
+                {"model": "local", "metric": "orders.revenue", "slice_by": ["orders.channel"]},
+                {"model": "local", "metric": "orders.revenue"},
+                {"model": "local", "metrics": ["orders.number_of_orders"], "slice_by": ["orders.channel"]},
+                {
+                    "model": "local",
+                    "metrics": ["orders.number_of_orders", "orders.revenue"],
+                    "slice_by": ["orders.channel"],
+                    "filters": [{"field": "orders.channel", "value": "web"}],
+                },
+            ],
+        },
+        {
+            "version": 1,
+            "type": "dashboard",
+            "name": "sorted_dashboard",
+            "elements": [
+                {"model": "local", "metric": "orders.revenue", "slice_by": ["orders.channel"]},
+                {"model": "local", "metric": "orders.smallest_order", "slice_by": ["orders.channel"]},
+            ],
+        },
+        {
+            "version": 1,
+            "type": "dashboard",
+            "name": "broken_dashboard",
+            "elements": [
+                {"model": "local", "metric": "orders.revenue", "slice_by": ["orders.channel"]},
+                {"model": "local", "metric": "orders.does_not_exist"},
+                {"model": "local", "metric": "orders.revenue", "filters": [{"field": "orders.channel"}]},
+            ],
+        },
+    ]
+    project = Project(models=models, views=views, dashboards=dashboards)
+    connections = [{"type": "DUCK_DB", "name": "local_duck_db", "database": database}]
+    return MetricsLayerConnection(project=project, connections=connections)
+
+
+@pytest.mark.running
+def test_run_query_duck_db(duck_db_connection):
+    order_by = [{"field": "channel"}]
+    df = duck_db_connection.query(metrics=["revenue"], dimensions=["channel"], order_by=order_by)
+
+    assert list(df.columns) == ["orders_channel", "orders_revenue"]
+    assert df["orders_channel"].tolist() == ["store", "web"]
+    assert df["orders_revenue"].tolist() == [7.0, 15.5]
+
+
+@pytest.mark.running
+def test_async_query_duck_db(duck_db_connection):
+    args = {"metrics": ["revenue"], "dimensions": ["channel"], "order_by": [{"field": "channel"}]}
+
+    async def run_queries():
+        query = await duck_db_connection.aget_sql_query(**args)
+        results = await asyncio.gather(*[duck_db_connection.aquery(**args) for _ in range(3)])
+        return query, results
+
+    query, results = asyncio.run(run_queries())
+    assert query == duck_db_connection.get_sql_query(**args)
+    assert all(df.equals(duck_db_connection.query(**args)) for df in results)
+
+
+@pytest.mark.running
+def test_async_query_timeout_aborts_statement(duck_db_connection):
+    duck_db_connection.max_workers = 1
+    connection = duck_db_connection.get_connection("local_duck_db")
+    slow_query = "select count(*) from range(100000000) a, range(100000000) b where a.range + b.range = 1"
+
+    start = time.time()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(duck_db_connection.arun_query(slow_query, connection, timeout=0.5))
+
+    # The only worker is free again, so the warehouse statement was interrupted instead of left running
+    duck_db_connection.executor.submit(lambda: None).result(timeout=30)
+    assert time.time() - start < 30
+
+
+@pytest.mark.running
+def test_async_query_timeout_before_statement_starts(duck_db_connection, monkeypatch):
+    duck_db_connection.max_workers = 1
+    connection = duck_db_connection.get_connection("local_duck_db")
+    slow_query = "select count(*) from range(100000000) a, range(100000000) b where a.range + b.range = 1"
+
+    # The timeout comes while the connection is still opening, before there's a statement to interrupt
+    get_connection = QueryRunner._get_duck_db_connection
+    monkeypatch.setattr(
+        QueryRunner, "_get_duck_db_connection", staticmethod(lambda c: time.sleep(1) or get_connection(c))
+    )
+    errors = []
+    run_query = QueryRunner.run_query
+
+    def recording_run_query(self, *args, **kwargs):
+        try:
+            return run_query(self, *args, **kwargs)
+        except Exception as e:
+            errors.append(e)
+            raise
+
+    monkeypatch.setattr(QueryRunner, "run_query", recording_run_query)
+
+    start = time.time()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(duck_db_connection.arun_query(slow_query, connection, timeout=0.2))
+
+    # The statement never starts, so the only worker is free again once the connection opens
+    duck_db_connection.executor.submit(lambda: None).result(timeout=30)
+    assert time.time() - start < 30
+    assert isinstance(errors[0], QueryError)
+    assert "cancelled before it started" in str(errors[0])
+
+
+@pytest.mark.running
+def test_query_many(duck_db_connection, monkeypatch):
+    monkeypatch.setattr(QueryRunner, "connection_pool", ConnectionPool())
+    run_query = QueryRunner.run_query
+    ran = []
+
+    def counting_run_query(self, *args, **kwargs):
+        ran.append(self.query)
+        return run_query(self, *args, **kwargs)
+
+    monkeypatch.setattr(QueryRunner, "run_query", counting_run_query)
+
+    requests = [
+        {"metrics": ["revenue"], "dimensions": ["channel"], "order_by": [{"field": "channel"}]},
+        {"metrics": ["revenue"]},
+        {"metrics": ["does_not_exist"]},
+        {"metrics": ["revenue"], "dimensions": ["channel"], "order_by": [{"field": "channel"}]},
+    ]
+    results = duck_db_connection.query_many(requests, max_concurrency=2)
+    QueryRunner.connection_pool.close_all()
+
+    assert [r.request for r in results] == requests
+    assert [r.ok for r in results] == [True, True, False, True]
+    assert results[0].df["orders_revenue"].tolist() == [7.0, 15.5]
+    assert results[1].df["orders_revenue"].tolist() == [22.5]
+    assert "does_not_exist" in str(results[2].error)
+    assert results[2].df is None
+
+    # The duplicate request shares the warehouse query but not the DataFrame
+    assert len(ran) == 2
+    assert results[3].query == results[0].query
+    assert results[3].df.equals(results[0].df)
+    assert results[3].df is not results[0].df
+
+
+@pytest.mark.running
+def test_query_many_run_options(counting_snowflake_connection):
+    project, connections, calls = counting_snowflake_connection
+    conn = MetricsLayerConnection(project=project, connections=connections, result_cache=MemoryResultCache())
+    args = {"metrics": ["total_item_revenue"], "dimensions": ["channel"]}
+    conn.query(**args)
+    assert len(calls) == 1
+
+    # The same query with another cache mode runs on its own, with its own options
+    requests = [args, {**args, "cache": "refresh"}, args]
+    results = conn.query_many(requests)
+
+    assert all(r.ok for r in results)
+    assert len({r.query for r in results}) == 1
+    assert len(calls) == 2
+    assert conn.result_cache.info()["hits"] == 1
+    assert results[2].df.equals(results[0].df) and results[2].df is not results[0].df
+
+
+@pytest.mark.running
+def test_query_dashboard_merges_compatible_elements(duck_db_connection, monkeypatch):
+    monkeypatch.setattr(QueryRunner, "connection_pool", ConnectionPool())
+    results = duck_db_connection.query_dashboard("local_dashboard")
+    QueryRunner.connection_pool.close_all()
+
+    assert all(r.ok for r in results)
+    # The first and third elements only differ by metric, so they share one query
+    assert results[0].query == results[2].query
+    assert len({r.query for r in results}) == 3
+
+    first, second, third, fourth = [r.df for r in results]
+    first, third = first.sort_values("orders_channel"), third.sort_values("orders_channel")
+    assert list(first.columns) == ["orders_channel", "orders_revenue"]
+    assert first["orders_revenue"].tolist() == [7.0, 15.5]
+    assert second["orders_revenue"].tolist() == [22.5]
+    assert list(third.columns) == ["orders_channel", "orders_number_of_orders"]
+    assert third["orders_number_of_orders"].tolist() == [1, 2]
+    assert list(fourth.columns) == ["orders_channel", "orders_number_of_orders", "orders_revenue"]
+    assert fourth.values.tolist() == [["web", 2, 15.5]]
+
+    # Each element gets the same data it would get from running its own query
+    element_df = duck_db_connection.query(**results[0].request).sort_values("orders_channel")
+    assert element_df.reset_index(drop=True).equals(first.reset_index(drop=True))
+
+
+@pytest.mark.running
+def test_query_dashboard_broken_element(duck_db_connection, monkeypatch):
+    monkeypatch.setattr(QueryRunner, "connection_pool", ConnectionPool())
+    results = duck_db_connection.query_dashboard("broken_dashboard")
+    QueryRunner.connection_pool.close_all()
+
+    # Only the broken elements fail, and they fail with their own errors
+    assert [r.ok for r in results] == [True, False, False]
+    assert results[0].df.sort_values("orders_channel")["orders_revenue"].tolist() == [7.0, 15.5]
+    assert "does_not_exist" in str(results[1].error)
+    assert results[1].request["metrics"] == ["orders.does_not_exist"]
+    assert "missing required key 'value'" in str(results[2].error)
+    assert results[2].df is None and results[2].query is None
+
+
+@pytest.mark.running
+def test_query_dashboard_keeps_element_order(duck_db_connection, monkeypatch):
+    monkeypatch.setattr(QueryRunner, "connection_pool", ConnectionPool())
+    results = duck_db_connection.query_dashboard("sorted_dashboard")
+    QueryRunner.connection_pool.close_all()
+
+    assert results[0].query == results[1].query
+    # Web has the most revenue but store has the largest smallest order
+    assert results[0].df["orders_channel"].tolist() == ["web", "store"]
+    assert results[1].df["orders_channel"].tolist() == ["store", "web"]
+    for result in results:
+        assert result.df.equals(duck_db_connection.query(**result.request))
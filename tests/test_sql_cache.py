@@ -0,0 +1,151 @@
+import time
+
+import pendulum
+import pytest
+
+from metrics_layer.core import MetricsLayerConnection
+from metrics_layer.core.query.sql_cache import SQLCache
+
+
+@pytest.mark.query
+def test_sql_cache_hits_and_misses(project, connections):
+    uncached = MetricsLayerConnection(project=project, connections=connections)
+    conn = MetricsLayerConnection(project=project, connections=connections, sql_cache=SQLCache())
+
+    query = conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+    assert conn.sql_cache.info()["misses"] == 1
+    assert conn.sql_cache.info()["hits"] == 0
+
+    cached_query = conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+    assert conn.sql_cache.info()["hits"] == 1
+    assert cached_query == query
+    assert query == uncached.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+
+    # Options that only change how the query is returned share the cached entry
+    _, connection = conn.get_sql_query(
+        metrics=["total_item_revenue"], dimensions=["channel"], return_connection=True, pretty=True
+    )
+    assert connection.name == "testing_snowflake"
+    assert conn.sql_cache.info()["hits"] == 2
+
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"], limit=10)
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["new_vs_repeat"])
+    assert conn.sql_cache.info()["misses"] == 3
+    assert len(conn.sql_cache) == 3
+
+
+@pytest.mark.query
+def test_sql_cache_invalidated_by_project_and_user(fresh_project, connections):
+    conn = MetricsLayerConnection(project=fresh_project, connections=connections, sql_cache=SQLCache())
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+
+    conn.set_user({"department": "executive"})
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+    assert conn.sql_cache.info()["misses"] == 2
+
+    conn.set_user(None)
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+    assert conn.sql_cache.info()["hits"] == 1
+
+    field = {"name": "new_dimension", "field_type": "dimension", "type": "string", "sql": "${TABLE}.new"}
+    fresh_project.add_field(field, "order_lines")
+    conn.get_sql_query(metrics=["total_item_revenue"], dimensions=["channel"])
+    assert conn.sql_cache.info()["misses"] == 3
+
+
+@pytest.mark.query
+def test_sql_cache_relative_date_filters(project, connections):
+    conn = MetricsLayerConnection(project=project, connections=connections, sql_cache=SQLCache())
+    where = [{"field": "orders.order_date", "expression": "matches", "value": "last 7 days"}]
+
+    try:
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 8, 12))
+        first = conn.get_sql_query(metrics=["total_item_revenue"], where=where)
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 8, 18))
+        assert conn.get_sql_query(metrics=["total_item_revenue"], where=where) == first
+        assert conn.sql_cache.info()["hits"] == 1
+
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 9, 12))
+        second = conn.get_sql_query(metrics=["total_item_revenue"], where=where)
+    finally:
+        pendulum.set_test_now()
+
+    assert conn.sql_cache.info()["misses"] == 2
+    assert "2023-03-02T00:00:00" in first
+    assert "2023-03-03T00:00:00" in second
+
+
+@pytest.mark.query
+def test_sql_cache_relative_date_field_filters(fresh_project, connections):
+    fresh_project.add_field(
+        {
+            "name": "revenue_last_30_days",
+            "type": "sum",
+            "field_type": "measure",
+            "sql": "${TABLE}.revenue",
+            "filters": [{"field": "order_date", "value": "last 30 days"}],
+        },
+        view_name="orders",
+    )
+    conn = MetricsLayerConnection(project=fresh_project, connections=connections, sql_cache=SQLCache())
+
+    try:
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 8, 12))
+        first = conn.get_sql_query(metrics=["revenue_last_30_days"])
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 8, 18))
+        assert conn.get_sql_query(metrics=["revenue_last_30_days"]) == first
+        assert conn.sql_cache.info()["hits"] == 1
+
+        pendulum.set_test_now(pendulum.datetime(2023, 3, 9, 12))
+        second = conn.get_sql_query(metrics=["revenue_last_30_days"])
+    finally:
+        pendulum.set_test_now()
+
+    assert conn.sql_cache.info()["misses"] == 2
+    assert "2023-02-07T00:00:00" in first
+    assert "2023-02-08T00:00:00" in second
+
+
+@pytest.mark.query
+def test_sql_cache_eviction_and_ttl(monkeypatch):
+    cache = SQLCache(maxsize=2, ttl=60)
+    now = 1000.0
+    monkeypatch.setattr("metrics_layer.core.query.sql_cache.time.monotonic", lambda: now)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.info()["evictions"] == 1
+
+    now = 1061.0
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 2, "ttl": 60}
+
+
+@pytest.mark.query
+def test_sql_cache_relative_dates_across_threads(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from metrics_layer.core.model.filter import Filter
+
+    filters = [{"field": "order_date", "value": "this week"}]
+    expected = {d: SQLCache._resolve_relative_dates(filters, [d], None) for d in ["sunday", "wednesday"]}
+
+    # Slow down parsing, so another thread gets to change the week start day in the middle of it
+    today = Filter._today
+    monkeypatch.setattr(Filter, "_today", staticmethod(lambda tz: time.sleep(0.001) or today(tz)))
+
+    def resolve(week_start_day):
+        return week_start_day, SQLCache._resolve_relative_dates(filters, [week_start_day], None)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(resolve, ["sunday", "wednesday"] * 20))
+
+    assert all(resolved == expected[week_start_day] for week_start_day, resolved in results)
+    assert pendulum.now().start_of("week").day_of_week == pendulum.MONDAY